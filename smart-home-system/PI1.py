@@ -5,14 +5,17 @@ import time
 import paho.mqtt.client as mqtt
 import json
 
-from components.sensors.button import Button, run_button_loop
-from components.sensors.pir import PIR, run_motion_loop
-from components.sensors.uds import UDS, run_ultrasonic_loop
-from components.sensors.membrane_switch import MembraneSwitch, run_membrane_loop
+from components.sensors.button import Button, button_step, run_button_edge_loop
+from components.sensors.pir import PIR, motion_step, run_motion_edge_loop
+from components.sensors.change_reporter import ChangeReporter
+from components.sensors.uds import UDS, ultrasonic_step
+from components.sensors.membrane_switch import MembraneSwitch, membrane_step, run_membrane_edge_loop
 from components.actuators.led import LED
 from components.actuators.buzzer import Buzzer
+from components.sensors.validity import ReadingValidator, QUALITY_GOOD
 from config.config import Config
 from mqtt_batch_sender import MQTTBatchSender
+from sensor_scheduler import SensorScheduler
 
 try:
     import RPi.GPIO as GPIO
@@ -58,7 +61,13 @@ class PI1_Controller:
 
         self.door_sensor = Button(ds1_pin, self.config.is_simulated('DS1'))
         self.motion_sensor = PIR(dpir1_pin, self.config.is_simulated('DPIR1'))
-        self.ultrasonic = UDS(dus1_trigger, dus1_echo, self.config.is_simulated('DUS1'))
+        self.ultrasonic = UDS(
+            dus1_trigger, dus1_echo, self.config.is_simulated('DUS1'),
+            burst=self.config.get_value("SENSOR_CONFIG", "UDS_BURST", 1, int),
+            aggregate=self.config.get_value("SENSOR_CONFIG", "UDS_AGGREGATE", "median").strip().lower(),
+            trim=self.config.get_value("SENSOR_CONFIG", "UDS_TRIM", 0.2, float),
+            ping_spacing=self.config.get_value("SENSOR_CONFIG", "UDS_PING_SPACING", UDS.PING_SPACING, float),
+        )
         self.membrane_switch = MembraneSwitch(row_pins, col_pins, simulate=self.config.is_simulated("DMS"))
 
         self.door_light = LED(dl_pin, self.config.is_simulated('DL'))
@@ -71,7 +80,18 @@ class PI1_Controller:
             mqtt_cfg["port"],
             mqtt_cfg["base_topic"],
             mqtt_cfg["batch_size"],
-            mqtt_cfg["send_interval"]
+            mqtt_cfg["send_interval"],
+            batch_mode=mqtt_cfg["batch_mode"],
+            batch_topic=mqtt_cfg["batch_topic"],
+            payload_format=mqtt_cfg["payload_format"],
+            priorities=mqtt_cfg["priorities"],
+            low_latency_interval=mqtt_cfg["low_latency_interval"],
+            capacity=mqtt_cfg["capacity"],
+            drop_policies=mqtt_cfg["drop_policies"],
+            diagnostics_interval=mqtt_cfg["diagnostics_interval"],
+            store_path=mqtt_cfg["store_path"],
+            store_max_rows=mqtt_cfg["store_max_rows"],
+            drain_rate=mqtt_cfg["drain_rate"],
         )
         
         self.cmd_client = mqtt.Client(client_id=f"{self.device_info['pi_id']}_cmd")
@@ -84,7 +104,7 @@ class PI1_Controller:
         self.stop_event = threading.Event()
         self.threads = []
 
-    def _send_measurement(self, sensor_type, value, sensor_config_code):
+    def _send_measurement(self, sensor_type, value, sensor_config_code, timestamp=None, quality=QUALITY_GOOD, spread=None):
         payload = {
             "pi_id": self.device_info["pi_id"],
             "device_name": self.device_info["device_name"],
@@ -92,26 +112,68 @@ class PI1_Controller:
             "simulated": self.config.is_simulated(sensor_config_code),
             "value": value
         }
+        if timestamp is not None:
+            # Edge-mode readings carry their interrupt time; the server stores it as the point time
+            payload["ts"] = timestamp
+        if quality != QUALITY_GOOD:
+            # Absent means good; "held" repeats the last good value after a failed read
+            payload["quality"] = quality
+        if spread is not None:
+            payload["spread"] = spread
         self.mqtt_sender.enqueue(payload)
 
-    def _door_callback(self, value):
-        self._send_measurement("door_button", value, "DS1")
+    def _door_callback(self, value, timestamp=None):
+        self._send_measurement("door_button", value, "DS1", timestamp)
 
-    def _motion_callback(self, value):
-        self._send_measurement("door_motion", value, "DPIR1")
+    def _motion_callback(self, value, timestamp=None):
+        self._send_measurement("door_motion", value, "DPIR1", timestamp)
 
-    def _ultrasonic_callback(self, value):
-        self._send_measurement("door_distance", value, "DUS1")
+    def _ultrasonic_callback(self, value, quality=QUALITY_GOOD):
+        # Burst spread goes along as a confidence value; a held value has none
+        spread = self.ultrasonic.last_spread if quality == QUALITY_GOOD else None
+        self._send_measurement("door_distance", value, "DUS1", quality=quality, spread=spread)
 
-    def _membrane_callback(self, value):
-        self._send_measurement("door_membrane", value, "DMS")
+    def _membrane_callback(self, value, timestamp=None):
+        self._send_measurement("door_membrane", value, "DMS", timestamp)
 
-    def start_sensors(self):
-        self.threads.append(threading.Thread(target=run_button_loop, args=(self.door_sensor, self.config.get_value("SENSOR_CONFIG", "BTN_DELAY", 0.5, float), self._door_callback, self.stop_event), daemon=True))
-        self.threads.append(threading.Thread(target=run_motion_loop, args=(self.motion_sensor, self.config.get_value("SENSOR_CONFIG", "PIR_TIMEOUT", 30, float), self._motion_callback, self.stop_event), daemon=True))
-        self.threads.append(threading.Thread(target=run_ultrasonic_loop, args=(self.ultrasonic, self.config.get_value("SENSOR_CONFIG", "ULTRASONIC_DELAY", 0.5, float), self._ultrasonic_callback, self.stop_event), daemon=True))
-        self.threads.append(threading.Thread(target=run_membrane_loop, args=(self.membrane_switch, self.config.get_value("SENSOR_CONFIG", "DMS_DELAY", 0.2, float), self._membrane_callback, self.stop_event), daemon=True))
+    def _add_digital_input(self, name, sensor, step, edge_loop, period, callback, debounce_key):
+        """Schedule a poll, or start an interrupt-driven thread when [SENSOR_CONFIG] INPUT_MODE = edge.
+
+        Edge mode needs a real GPIO pin, so simulated sensors always poll.
+        """
+        cfg = self.config
+        if cfg.get_value("SENSOR_CONFIG", "INPUT_MODE", "poll").strip().lower() == "edge" and not sensor.simulate:
+            args = (sensor, cfg.get_value("SENSOR_CONFIG", "EDGE_DEBOUNCE_MS", 30, float) / 1000.0,
+                    cfg.get_value("SENSOR_CONFIG", "HEARTBEAT_INTERVAL", 60.0, float), callback, self.stop_event)
+            self.threads.append(threading.Thread(target=edge_loop, args=args, daemon=True))
+            return
+        reporter = ChangeReporter.from_config(cfg, debounce_key)
+        self.scheduler.add(name, period, lambda: step(sensor, callback, reporter))
 
+    def start_sensors(self):
+        cfg = self.config
+        # Every polled sensor runs on one scheduler thread; DHT/UDS reads go to IO_WORKERS threads
+        self.scheduler = SensorScheduler(self.stop_event, workers=cfg.get_value("SENSOR_CONFIG", "IO_WORKERS", 2, int))
+        self.mqtt_sender.add_diagnostics("scheduler", self.scheduler.get_stats)
+        self.validators = {
+            "DUS1": ReadingValidator.from_config(cfg, "DUS1", "UDS_INVALID_MODE", "suppress"),
+        }
+        self.mqtt_sender.add_diagnostics("validity", lambda: {name: v.get_stats() for name, v in self.validators.items()})
+        self.mqtt_sender.add_diagnostics("DUS1", self.ultrasonic.get_stats)
+
+        self._add_digital_input("DS1", self.door_sensor, button_step, run_button_edge_loop,
+                                cfg.get_value("SENSOR_CONFIG", "BTN_DELAY", 0.5, float), self._door_callback, "BTN_DEBOUNCE_READS")
+        self._add_digital_input("DPIR1", self.motion_sensor, motion_step, run_motion_edge_loop,
+                                cfg.get_value("SENSOR_CONFIG", "PIR_TIMEOUT", 30, float), self._motion_callback, "PIR_DEBOUNCE_READS")
+        self.scheduler.add("DUS1", cfg.get_value("SENSOR_CONFIG", "ULTRASONIC_DELAY", 0.5, float),
+                           lambda: ultrasonic_step(self.ultrasonic, self._ultrasonic_callback, self.validators["DUS1"]), blocking=True)
+        if cfg.get_value("SENSOR_CONFIG", "INPUT_MODE", "poll").strip().lower() == "edge" and not self.membrane_switch.simulate:
+            self.threads.append(threading.Thread(target=run_membrane_edge_loop, args=(self.membrane_switch, cfg.get_value("SENSOR_CONFIG", "EDGE_DEBOUNCE_MS", 30, float) / 1000.0, self._membrane_callback, self.stop_event), daemon=True))
+        else:
+            self.scheduler.add("DMS", cfg.get_value("SENSOR_CONFIG", "DMS_DELAY", 0.2, float),
+                               lambda: membrane_step(self.membrane_switch, self._membrane_callback))
+
+        self.threads.append(threading.Thread(target=self.scheduler.run, daemon=True))
         for t in self.threads:
             t.start()
 
@@ -174,6 +236,7 @@ class PI1_Controller:
         self.buzzer.off()
         for t in self.threads:
             t.join(timeout=1.0)
+        self.mqtt_sender.close()
         GPIO.cleanup()
         print("Kraj programa.")
 
@@ -4,14 +4,18 @@ import threading
 import paho.mqtt.client as mqtt
 import json
 
-from components.sensors.button import Button, run_button_loop
-from components.sensors.pir import PIR, run_motion_loop
-from components.sensors.uds import UDS, run_ultrasonic_loop
-from components.sensors.dht import DHT, run_dht_loop
-from components.sensors.gyroscope import Gyroscope, run_gyro_loop
+from components.sensors.button import Button, button_step, run_button_edge_loop
+from components.sensors.pir import PIR, motion_step, run_motion_edge_loop
+from components.sensors.change_reporter import ChangeReporter
+from components.sensors.uds import UDS, ultrasonic_step
+from components.sensors.dht import DHT, dht_step
+from components.sensors.gyroscope import Gyroscope, GyroAggregator, DMPStream, gyro_step, flush_gyro, run_dmp_loop
+from components.sensors.MPU6050_cal import load_offsets
 from components.actuators.display_4sd import Display4SD
+from components.sensors.validity import ReadingValidator, QUALITY_GOOD
 from config.config import Config
 from mqtt_batch_sender import MQTTBatchSender
+from sensor_scheduler import SensorScheduler
 
 import time
 
@@ -60,17 +64,26 @@ class PI2_Controller:
 
         self.door_sensor = Button(ds2_pin, self.config.is_simulated("DS2"))
         self.motion_sensor = PIR(dpir2_pin, self.config.is_simulated("DPIR2"))
-        self.ultrasonic = UDS(dus2_trigger, dus2_echo, self.config.is_simulated("DUS2"))
+        self.ultrasonic = UDS(
+            dus2_trigger, dus2_echo, self.config.is_simulated("DUS2"),
+            burst=self.config.get_value("SENSOR_CONFIG", "UDS_BURST", 1, int),
+            aggregate=self.config.get_value("SENSOR_CONFIG", "UDS_AGGREGATE", "median").strip().lower(),
+            trim=self.config.get_value("SENSOR_CONFIG", "UDS_TRIM", 0.2, float),
+            ping_spacing=self.config.get_value("SENSOR_CONFIG", "UDS_PING_SPACING", UDS.PING_SPACING, float),
+        )
         self.button = Button(btn_pin, self.config.is_simulated("BTN"))
-        self.dht_sensor = DHT(dht3_pin, self.config.is_simulated("DHT3"))
-        self.gyroscope = Gyroscope(self.config.is_simulated("GSG"))
+        self.dht_sensor = DHT(dht3_pin, self.config.is_simulated("DHT3"),
+                              retries=self.config.get_value("SENSOR_CONFIG", "DHT_RETRIES", 2, int),
+                              retry_backoff=self.config.get_value("SENSOR_CONFIG", "DHT_RETRY_BACKOFF", 0.1, float))
+        self.gyroscope = Gyroscope(self.config.is_simulated("GSG"), offsets=load_offsets(self.config))
 
         self.display = Display4SD(
             segment_pins,
             digit_pins,
             simulate=self.config.is_simulated("4SD"),
             brightness=self.config.get_value("DISPLAY_CONFIG", "DISPLAY_BRIGHTNESS", 7, int),
-            update_interval=self.config.get_value("DISPLAY_CONFIG", "DISPLAY_UPDATE_INTERVAL", 0.002, float)
+            update_interval=self.config.get_value("DISPLAY_CONFIG", "DISPLAY_UPDATE_INTERVAL", 0.002, float),
+            blink_period=self.config.get_value("DISPLAY_CONFIG", "DISPLAY_BLINK_PERIOD", 0.5, float),
         )
 
         self.device_info = self.config.get_device_info()
@@ -80,7 +93,18 @@ class PI2_Controller:
             mqtt_cfg["port"],
             mqtt_cfg["base_topic"],
             mqtt_cfg["batch_size"],
-            mqtt_cfg["send_interval"]
+            mqtt_cfg["send_interval"],
+            batch_mode=mqtt_cfg["batch_mode"],
+            batch_topic=mqtt_cfg["batch_topic"],
+            payload_format=mqtt_cfg["payload_format"],
+            priorities=mqtt_cfg["priorities"],
+            low_latency_interval=mqtt_cfg["low_latency_interval"],
+            capacity=mqtt_cfg["capacity"],
+            drop_policies=mqtt_cfg["drop_policies"],
+            diagnostics_interval=mqtt_cfg["diagnostics_interval"],
+            store_path=mqtt_cfg["store_path"],
+            store_max_rows=mqtt_cfg["store_max_rows"],
+            drain_rate=mqtt_cfg["drain_rate"],
         )
 
         self.cmd_client = mqtt.Client(client_id=f"{self.device_info['pi_id']}_cmd")
@@ -93,7 +117,7 @@ class PI2_Controller:
         self.stop_event = threading.Event()
         self.threads = []
 
-    def _send_measurement(self, sensor_type, value, sensor_config_code):
+    def _send_measurement(self, sensor_type, value, sensor_config_code, timestamp=None, quality=QUALITY_GOOD, spread=None):
         payload = {
             "pi_id": self.device_info["pi_id"],
             "device_name": self.device_info["device_name"],
@@ -101,61 +125,112 @@ class PI2_Controller:
             "simulated": self.config.is_simulated(sensor_config_code),
             "value": value
         }
+        if timestamp is not None:
+            # Edge-mode readings carry their interrupt time; the server stores it as the point time
+            payload["ts"] = timestamp
+        if quality != QUALITY_GOOD:
+            # Absent means good; "held" repeats the last good value after a failed read
+            payload["quality"] = quality
+        if spread is not None:
+            payload["spread"] = spread
         self.mqtt_sender.enqueue(payload)
 
-    def _door_callback(self, value):
-        self._send_measurement("door_button", value, "DS2")
+    def _door_callback(self, value, timestamp=None):
+        self._send_measurement("door_button", value, "DS2", timestamp)
 
-    def _motion_callback(self, value):
-        self._send_measurement("door_motion", value, "DPIR2")
+    def _motion_callback(self, value, timestamp=None):
+        self._send_measurement("door_motion", value, "DPIR2", timestamp)
 
-    def _ultrasonic_callback(self, value):
-        self._send_measurement("door_distance", value, "DUS2")
+    def _ultrasonic_callback(self, value, quality=QUALITY_GOOD):
+        # Burst spread goes along as a confidence value; a held value has none
+        spread = self.ultrasonic.last_spread if quality == QUALITY_GOOD else None
+        self._send_measurement("door_distance", value, "DUS2", quality=quality, spread=spread)
 
-    def _btn_callback(self, value):
-        self._send_measurement("kitchen_button", value, "BTN")
+    def _btn_callback(self, value, timestamp=None):
+        self._send_measurement("kitchen_button", value, "BTN", timestamp)
 
-    def _dht_callback(self, humidity, temperature, code):
-        self._send_measurement("kitchen_dht_humidity", humidity, "DHT3")
-        self._send_measurement("kitchen_dht_temperature", temperature, "DHT3")
+    def _dht_callback(self, humidity, temperature, code, quality=QUALITY_GOOD):
+        self._send_measurement("kitchen_dht_humidity", humidity, "DHT3", quality=quality)
+        self._send_measurement("kitchen_dht_temperature", temperature, "DHT3", quality=quality)
 
     def _gyro_callback(self, payload):
         self._send_measurement("gyroscope", payload, "GSG")
 
+    def _gyro_summary_callback(self, summary):
+        self._send_measurement("gyroscope_window", summary, "GSG")
+
+    def _add_digital_input(self, name, sensor, step, edge_loop, period, callback, debounce_key):
+        """Schedule a poll, or start an interrupt-driven thread when [SENSOR_CONFIG] INPUT_MODE = edge.
+
+        Edge mode needs a real GPIO pin, so simulated sensors always poll.
+        """
+        cfg = self.config
+        if cfg.get_value("SENSOR_CONFIG", "INPUT_MODE", "poll").strip().lower() == "edge" and not sensor.simulate:
+            args = (sensor, cfg.get_value("SENSOR_CONFIG", "EDGE_DEBOUNCE_MS", 30, float) / 1000.0,
+                    cfg.get_value("SENSOR_CONFIG", "HEARTBEAT_INTERVAL", 60.0, float), callback, self.stop_event)
+            self.threads.append(threading.Thread(target=edge_loop, args=args, daemon=True))
+            return
+        reporter = ChangeReporter.from_config(cfg, debounce_key)
+        self.scheduler.add(name, period, lambda: step(sensor, callback, reporter))
+
     def start_sensors(self):
         # return
         cfg = self.config
-        self.threads.append(threading.Thread(
-            target=run_button_loop,
-            args=(self.door_sensor, cfg.get_value("SENSOR_CONFIG", "BTN_DELAY", 0.5, float), self._door_callback, self.stop_event),
-            daemon=True
-        ))
-        self.threads.append(threading.Thread(
-            target=run_motion_loop,
-            args=(self.motion_sensor, cfg.get_value("SENSOR_CONFIG", "PIR_TIMEOUT", 30, float), self._motion_callback, self.stop_event),
-            daemon=True
-        ))
-        self.threads.append(threading.Thread(
-            target=run_ultrasonic_loop,
-            args=(self.ultrasonic, cfg.get_value("SENSOR_CONFIG", "ULTRASONIC_DELAY", 0.5, float), self._ultrasonic_callback, self.stop_event),
-            daemon=True
-        ))
-        self.threads.append(threading.Thread(
-            target=run_button_loop,
-            args=(self.button, cfg.get_value("SENSOR_CONFIG", "BTN_DELAY", 0.5, float), self._btn_callback, self.stop_event),
-            daemon=True
-        ))
-        self.threads.append(threading.Thread(
-            target=run_dht_loop,
-            args=(self.dht_sensor, cfg.get_value("SENSOR_CONFIG", "DHT_DELAY", 2.0, float), self._dht_callback, self.stop_event),
-            daemon=True
-        ))
-        self.threads.append(threading.Thread(
-            target=run_gyro_loop,
-            args=(self.gyroscope, cfg.get_value("SENSOR_CONFIG", "GSG_DELAY", 0.1, float), self._gyro_callback, self.stop_event),
-            daemon=True
-        ))
-
+        # Every polled sensor runs on one scheduler thread; DHT/UDS reads go to IO_WORKERS threads
+        self.scheduler = SensorScheduler(self.stop_event, workers=cfg.get_value("SENSOR_CONFIG", "IO_WORKERS", 2, int))
+        self.mqtt_sender.add_diagnostics("scheduler", self.scheduler.get_stats)
+        self.validators = {
+            "DUS2": ReadingValidator.from_config(cfg, "DUS2", "UDS_INVALID_MODE", "suppress"),
+            "DHT3": ReadingValidator.from_config(cfg, "DHT3", "DHT_INVALID_MODE", "hold"),
+        }
+        self.mqtt_sender.add_diagnostics("validity", lambda: {name: v.get_stats() for name, v in self.validators.items()})
+        self.mqtt_sender.add_diagnostics("DUS2", self.ultrasonic.get_stats)
+        self.mqtt_sender.add_diagnostics("DHT3", self.dht_sensor.get_stats)
+        self._add_digital_input("DS2", self.door_sensor, button_step, run_button_edge_loop,
+                                cfg.get_value("SENSOR_CONFIG", "BTN_DELAY", 0.5, float), self._door_callback, "BTN_DEBOUNCE_READS")
+        self._add_digital_input("DPIR2", self.motion_sensor, motion_step, run_motion_edge_loop,
+                                cfg.get_value("SENSOR_CONFIG", "PIR_TIMEOUT", 30, float), self._motion_callback, "PIR_DEBOUNCE_READS")
+        self.scheduler.add("DUS2", cfg.get_value("SENSOR_CONFIG", "ULTRASONIC_DELAY", 0.5, float),
+                           lambda: ultrasonic_step(self.ultrasonic, self._ultrasonic_callback, self.validators["DUS2"]), blocking=True)
+        self._add_digital_input("BTN", self.button, button_step, run_button_edge_loop,
+                                cfg.get_value("SENSOR_CONFIG", "BTN_DELAY", 0.5, float), self._btn_callback, "BTN_DEBOUNCE_READS")
+        self.scheduler.add("DHT3", cfg.get_value("SENSOR_CONFIG", "DHT_DELAY", 2.0, float),
+                           lambda: dht_step(self.dht_sensor, self._dht_callback, self.validators["DHT3"]), blocking=True)
+
+        gsg_window = cfg.get_value("SENSOR_CONFIG", "GSG_WINDOW", 0.0, float)
+        gyro_aggregator = None
+        if gsg_window > 0:
+            gyro_aggregator = GyroAggregator(
+                gsg_window,
+                tamper_low=cfg.get_value("SENSOR_CONFIG", "GSG_TAMPER_LOW", 0.5, float),
+                tamper_high=cfg.get_value("SENSOR_CONFIG", "GSG_TAMPER_HIGH", 1.5, float),
+            )
+        if cfg.get_value("SENSOR_CONFIG", "GSG_MODE", "poll").strip().lower() == "dmp" and not self.gyroscope.simulate:
+            # DMP streaming woken by the chip's motion interrupt; needs the MPU6050 INT line wired
+            gyro_stream = DMPStream(
+                self.gyroscope, cfg.get_pin("GSG_INT_PIN"),
+                motion_threshold=cfg.get_value("SENSOR_CONFIG", "GSG_MOTION_THRESHOLD", 20, int),
+                motion_duration=cfg.get_value("SENSOR_CONFIG", "GSG_MOTION_DURATION", 5, int),
+                active_hold=cfg.get_value("SENSOR_CONFIG", "GSG_ACTIVE_HOLD", 2.0, float),
+                heartbeat=cfg.get_value("SENSOR_CONFIG", "GSG_IDLE_INTERVAL", 1.0, float),
+            )
+            self.mqtt_sender.add_diagnostics("GSG", gyro_stream.get_stats)
+            self.threads.append(threading.Thread(
+                target=run_dmp_loop,
+                args=(gyro_stream, self._gyro_callback, self.stop_event, gyro_aggregator, self._gyro_summary_callback),
+                daemon=True
+            ))
+        else:
+            self.scheduler.add(
+                "GSG", cfg.get_value("SENSOR_CONFIG", "GSG_DELAY", 0.1, float),
+                lambda: gyro_step(self.gyroscope, self._gyro_callback, gyro_aggregator, self._gyro_summary_callback),
+                on_stop=lambda: flush_gyro(gyro_aggregator, self._gyro_summary_callback),
+            )
+
+        self.threads.append(threading.Thread(target=self.scheduler.run, daemon=True))
+        # The 4SD is multiplexed in software, so it needs its own refresh thread
+        self.mqtt_sender.add_diagnostics("4SD", self.display.get_stats)
+        self.threads.append(threading.Thread(target=self.display.run_loop, args=(self.stop_event,), daemon=True))
         for t in self.threads:
             t.start()
 
@@ -214,6 +289,7 @@ class PI2_Controller:
         self.stop_event.set()
         for t in self.threads:
             t.join(timeout=1.0)
+        self.mqtt_sender.close()
         self.display.cleanup()
         GPIO.cleanup()
         print("Kraj programa.")
@@ -249,17 +325,18 @@ class PI2_Controller:
         self._send_measurement("door_button", 0.0, "DS2")
 
     def test_gsg_movement_alarm(self):
-        """Tačka 6: veliki pomeraj GSG."""
-        payload = {
-            "accel_x": 3.0,
-            "accel_y": 0.1,
-            "accel_z": 0.0,
-            "gyro_x": 0.0,
-            "gyro_y": 0.0,
-            "gyro_z": 0.0,
-        }
-        print("[TEST] GSG movement payload:", payload)
-        self._send_measurement("gyroscope", payload, "GSG")
+        """Tačka 6: veliki pomeraj GSG (nekoliko uzastopnih merenja, jedno se ne računa kao pomeraj)."""
+        for accel_x in (3.0, -2.5, 3.0, -2.5, 3.0):
+            payload = {
+                "accel_x": accel_x,
+                "accel_y": 0.1,
+                "accel_z": 0.0,
+                "gyro_x": 0.0,
+                "gyro_y": 0.0,
+                "gyro_z": 0.0,
+            }
+            print("[TEST] GSG movement payload:", payload)
+            self._send_measurement("gyroscope", payload, "GSG")
 
     def test_gsg_normal(self):
         """Normalno stanje gyroscope."""
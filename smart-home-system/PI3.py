@@ -5,13 +5,16 @@ import time
 import paho.mqtt.client as mqtt
 import json
 
-from components.sensors.dht import DHT, run_dht_loop
-from components.sensors.pir import PIR, run_motion_loop
+from components.sensors.dht import DHT, dht_step
+from components.sensors.pir import PIR, motion_step, run_motion_edge_loop
+from components.sensors.change_reporter import ChangeReporter
 from components.sensors.infrared import IRReceiver, run_ir_loop
 from components.actuators.rgb_led import RGBLed
 from components.actuators.lcd import LCD
+from components.sensors.validity import ReadingValidator, QUALITY_GOOD
 from config.config import Config
 from mqtt_batch_sender import MQTTBatchSender
+from sensor_scheduler import SensorScheduler
 
 try:
     import RPi.GPIO as GPIO
@@ -41,8 +44,12 @@ class PI3_Controller:
         dht2_pin = self.config.get_pin("DHT2_PIN")
         dpir3_pin = self.config.get_pin("DPIR3_PIN")
 
-        self.dht1 = DHT(dht1_pin, self.config.is_simulated("DHT1"))
-        self.dht2 = DHT(dht2_pin, self.config.is_simulated("DHT2"))
+        self.dht1 = DHT(dht1_pin, self.config.is_simulated("DHT1"),
+                        retries=self.config.get_value("SENSOR_CONFIG", "DHT_RETRIES", 2, int),
+                        retry_backoff=self.config.get_value("SENSOR_CONFIG", "DHT_RETRY_BACKOFF", 0.1, float))
+        self.dht2 = DHT(dht2_pin, self.config.is_simulated("DHT2"),
+                        retries=self.config.get_value("SENSOR_CONFIG", "DHT_RETRIES", 2, int),
+                        retry_backoff=self.config.get_value("SENSOR_CONFIG", "DHT_RETRY_BACKOFF", 0.1, float))
         self.dpir3 = PIR(dpir3_pin, self.config.is_simulated("DPIR3"))
         self.ir_sensor = IRReceiver(ir_pin, self.config.is_simulated("IR"))
 
@@ -56,7 +63,18 @@ class PI3_Controller:
             mqtt_cfg["port"],
             mqtt_cfg["base_topic"],
             mqtt_cfg["batch_size"],
-            mqtt_cfg["send_interval"]
+            mqtt_cfg["send_interval"],
+            batch_mode=mqtt_cfg["batch_mode"],
+            batch_topic=mqtt_cfg["batch_topic"],
+            payload_format=mqtt_cfg["payload_format"],
+            priorities=mqtt_cfg["priorities"],
+            low_latency_interval=mqtt_cfg["low_latency_interval"],
+            capacity=mqtt_cfg["capacity"],
+            drop_policies=mqtt_cfg["drop_policies"],
+            diagnostics_interval=mqtt_cfg["diagnostics_interval"],
+            store_path=mqtt_cfg["store_path"],
+            store_max_rows=mqtt_cfg["store_max_rows"],
+            drain_rate=mqtt_cfg["drain_rate"],
         )
 
         self.cmd_client = mqtt.Client(client_id=f"{self.device_info['pi_id']}_cmd")
@@ -69,7 +87,7 @@ class PI3_Controller:
         self.stop_event = threading.Event()
         self.threads = []
 
-    def _send_measurement(self, sensor_type, value, sensor_config_code):
+    def _send_measurement(self, sensor_type, value, sensor_config_code, timestamp=None, quality=QUALITY_GOOD):
         payload = {
             "pi_id": self.device_info["pi_id"],
             "device_name": self.device_info["device_name"],
@@ -77,50 +95,72 @@ class PI3_Controller:
             "simulated": self.config.is_simulated(sensor_config_code),
             "value": value
         }
+        if timestamp is not None:
+            # Edge-mode readings carry their interrupt time; the server stores it as the point time
+            payload["ts"] = timestamp
+        if quality != QUALITY_GOOD:
+            # Absent means good; "held" repeats the last good value after a failed read
+            payload["quality"] = quality
         self.mqtt_sender.enqueue(payload)
 
-    def _dht1_callback(self, humidity, temperature, code):
-        self._send_measurement("bedroom_dht_humidity", humidity, "DHT1")
-        self._send_measurement("bedroom_dht_temperature", temperature, "DHT1")
+    def _dht1_callback(self, humidity, temperature, code, quality=QUALITY_GOOD):
+        self._send_measurement("bedroom_dht_humidity", humidity, "DHT1", quality=quality)
+        self._send_measurement("bedroom_dht_temperature", temperature, "DHT1", quality=quality)
 
-    def _dht2_callback(self, humidity, temperature, code):
-        self._send_measurement("master_dht_humidity", humidity, "DHT2")
-        self._send_measurement("master_dht_temperature", temperature, "DHT2")
+    def _dht2_callback(self, humidity, temperature, code, quality=QUALITY_GOOD):
+        self._send_measurement("master_dht_humidity", humidity, "DHT2", quality=quality)
+        self._send_measurement("master_dht_temperature", temperature, "DHT2", quality=quality)
 
-    def _motion_callback(self, value):
-        self._send_measurement("door_motion", value, "DPIR3")
+    def _motion_callback(self, value, timestamp=None):
+        self._send_measurement("door_motion", value, "DPIR3", timestamp)
 
     def _ir_callback(self, value):
         self._send_measurement("bedroom_ir", value, "IR")
 
+    def _add_digital_input(self, name, sensor, step, edge_loop, period, callback, debounce_key):
+        """Schedule a poll, or start an interrupt-driven thread when [SENSOR_CONFIG] INPUT_MODE = edge.
+
+        Edge mode needs a real GPIO pin, so simulated sensors always poll.
+        """
+        cfg = self.config
+        if cfg.get_value("SENSOR_CONFIG", "INPUT_MODE", "poll").strip().lower() == "edge" and not sensor.simulate:
+            args = (sensor, cfg.get_value("SENSOR_CONFIG", "EDGE_DEBOUNCE_MS", 30, float) / 1000.0,
+                    cfg.get_value("SENSOR_CONFIG", "HEARTBEAT_INTERVAL", 60.0, float), callback, self.stop_event)
+            self.threads.append(threading.Thread(target=edge_loop, args=args, daemon=True))
+            return
+        reporter = ChangeReporter.from_config(cfg, debounce_key)
+        self.scheduler.add(name, period, lambda: step(sensor, callback, reporter))
+
     def start_sensors(self):
         # return
         cfg = self.config
-
-        self.threads.append(threading.Thread(
-            target=run_dht_loop,
-            args=(self.dht1, cfg.get_value("SENSOR_CONFIG", "DHT_DELAY", 2.0, float), self._dht1_callback, self.stop_event),
-            daemon=True
-        ))
-
-        self.threads.append(threading.Thread(
-            target=run_dht_loop,
-            args=(self.dht2, cfg.get_value("SENSOR_CONFIG", "DHT_DELAY", 2.0, float), self._dht2_callback, self.stop_event),
-            daemon=True
-        ))
-
-        self.threads.append(threading.Thread(
-            target=run_motion_loop,
-            args=(self.dpir3, cfg.get_value("SENSOR_CONFIG", "PIR_TIMEOUT", 30, float), self._motion_callback, self.stop_event),
-            daemon=True
-        ))
-
+        # Every polled sensor runs on one scheduler thread; DHT/UDS reads go to IO_WORKERS threads
+        self.scheduler = SensorScheduler(self.stop_event, workers=cfg.get_value("SENSOR_CONFIG", "IO_WORKERS", 2, int))
+        self.mqtt_sender.add_diagnostics("scheduler", self.scheduler.get_stats)
+        self.validators = {
+            "DHT1": ReadingValidator.from_config(cfg, "DHT1", "DHT_INVALID_MODE", "hold"),
+            "DHT2": ReadingValidator.from_config(cfg, "DHT2", "DHT_INVALID_MODE", "hold"),
+        }
+        self.mqtt_sender.add_diagnostics("validity", lambda: {name: v.get_stats() for name, v in self.validators.items()})
+        self.mqtt_sender.add_diagnostics("DHT1", self.dht1.get_stats)
+        self.mqtt_sender.add_diagnostics("DHT2", self.dht2.get_stats)
+
+        self.scheduler.add("DHT1", cfg.get_value("SENSOR_CONFIG", "DHT_DELAY", 2.0, float),
+                           lambda: dht_step(self.dht1, self._dht1_callback, self.validators["DHT1"]), blocking=True)
+        self.scheduler.add("DHT2", cfg.get_value("SENSOR_CONFIG", "DHT_DELAY", 2.0, float),
+                           lambda: dht_step(self.dht2, self._dht2_callback, self.validators["DHT2"]), blocking=True)
+        self._add_digital_input("DPIR3", self.dpir3, motion_step, run_motion_edge_loop,
+                                cfg.get_value("SENSOR_CONFIG", "PIR_TIMEOUT", 30, float), self._motion_callback, "PIR_DEBOUNCE_READS")
+
+        # IR is decoded from edge callbacks; this thread only waits for decoded keys
+        self.mqtt_sender.add_diagnostics("IR", self.ir_sensor.get_stats)
         self.threads.append(threading.Thread(
             target=run_ir_loop,
             args=(self.ir_sensor, cfg.get_value("SENSOR_CONFIG", "IR_DELAY", 0.2, float), self._ir_callback, self.stop_event),
             daemon=True
         ))
 
+        self.threads.append(threading.Thread(target=self.scheduler.run, daemon=True))
         for t in self.threads:
             t.start()
 
@@ -161,7 +201,7 @@ class PI3_Controller:
                     self._send_measurement("rgb_led", "OFF", "BRGB")
                 elif choice == "6":
                     msg = input("Unesi poruku za LCD: ")
-                    self.lcd.display(msg)
+                    self.lcd.display_message(msg)
                     self._send_measurement("lcd_message", msg, "LCD")
                 elif choice == "7":
                     self.test_dht_bedroom_once()
@@ -186,6 +226,7 @@ class PI3_Controller:
         self.stop_event.set()
         for t in self.threads:
             t.join(timeout=1.0)
+        self.mqtt_sender.close()
         self.rgb_led.cleanup()
         self.lcd.destroy()
         GPIO.cleanup()
@@ -0,0 +1,87 @@
+"""DHT decoder accuracy on synthetic frames with increasing pulse jitter.
+
+Each attempt builds a DHT frame (components.sensors.dht.dht_waveform) with
+per-pulse jitter and decodes it two ways:
+
+  decode  the edges DHT._capture would record, fed straight to DHT._decode
+          (fast, so many frames per jitter level)
+  read    the waveform replayed through the mock GPIO and read with
+          DHT.read(), capture included; the mock runs on a VirtualClock that
+          every pin read advances by 2 us, so host scheduling does not matter
+
+Retries are disabled, so the numbers are per attempt. Reported:
+
+  ok        decoded to the frame that was sent
+  checksum  rejected by the checksum
+  wrong     checksum OK but the bytes differ: two bit errors cancelled out,
+            the reading is passed on as if it were good
+
+Run from the smart-home-system directory:  python bench_dht_decoder.py
+"""
+import contextlib
+import io
+import random
+from unittest import mock
+
+from mock_rpi import GPIO, VirtualClock
+from components.sensors import dht
+from components.sensors.dht import DHT, dht_waveform, waveform_to_edges
+
+PIN = 4
+FRAME = [55, 0, 23, 4, (55 + 0 + 23 + 4) & 0xFF]
+# One GPIO.input() call in the capture loop on a Pi
+INPUT_NS = 2000
+
+
+def decode_stats(attempt, jitter_us, reads, rng):
+    counts = {"ok": 0, "checksum": 0, "timeout": 0, "wrong": 0}
+    for _ in range(reads):
+        code, bits = attempt(dht_waveform(FRAME, jitter_us=jitter_us, rng=rng))
+        if code == DHT.DHTLIB_ERROR_CHECKSUM:
+            counts["checksum"] += 1
+        elif code != DHT.DHTLIB_OK:
+            counts["timeout"] += 1
+        elif bits == FRAME:
+            counts["ok"] += 1
+        else:
+            counts["wrong"] += 1
+    return counts
+
+
+def print_row(path, jitter, counts, reads):
+    print(f"{path:>6s} {jitter:10d} {counts['ok'] / reads:8.2%} {counts['checksum'] / reads:9.2%} "
+          f"{counts['timeout'] / reads:8.2%} {counts['wrong'] / reads:8.2%}")
+
+
+def main(decode_reads=10000, sensor_reads=200):
+    rng = random.Random(0)
+    print(f"{'path':>6s} {'jitter us':>10s} {'ok':>8s} {'checksum':>9s} {'timeout':>8s} {'wrong':>8s}")
+
+    # Only _decode is used; simulate=True keeps the constructor off the GPIO
+    decoder = DHT(PIN, simulate=True)
+
+    def decode(pulses):
+        return decoder._decode(waveform_to_edges(pulses)), decoder.bits
+
+    for jitter in (0, 5, 10, 15, 20, 25, 30):
+        print_row("decode", jitter, decode_stats(decode, jitter, decode_reads, rng), decode_reads)
+
+    clock = VirtualClock(input_ns=INPUT_NS)
+    GPIO.clock = clock
+    # MockGPIO logs every setup/output call; keep the table readable.
+    with mock.patch.object(dht, "time", clock), contextlib.redirect_stdout(io.StringIO()):
+        sensor = DHT(PIN, simulate=False, retries=0)
+
+        def read(pulses):
+            GPIO.load_waveform(PIN, pulses)
+            code = sensor.read()[2]
+            return code, sensor.bits
+
+        results = [(jitter, decode_stats(read, jitter, sensor_reads, rng)) for jitter in (0, 10, 20)]
+    GPIO.clock = None
+    for jitter, counts in results:
+        print_row("read", jitter, counts, sensor_reads)
+
+
+if __name__ == "__main__":
+    main()
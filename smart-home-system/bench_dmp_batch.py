@@ -0,0 +1,83 @@
+"""DMP packet decoding: per-packet Quaternion/XYZVector objects vs one NumPy pass.
+
+Decodes batches of random-orientation DMP packets into quaternion, gravity,
+linear acceleration and roll/pitch/yaw, the way MPU6050IRQHandler does per
+packet, and with components.sensors.dmp_batch.decode_dmp_packets. A full
+1024-byte FIFO holds 24 packets. Needs numpy.
+
+Run from the smart-home-system directory:  python bench_dmp_batch.py
+"""
+import math
+import os
+import random
+import struct
+import sys
+import time
+import types
+
+import numpy as np
+
+# The MPU6050 driver imports smbus and its helper modules by bare name, as on the Pi.
+sys.modules.setdefault("smbus", types.SimpleNamespace(SMBus=lambda bus: None))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "sensors"))
+
+from MPU6050 import MPU6050  # noqa: E402
+from components.sensors.dmp_batch import DMP_PACKET_SIZE, decode_dmp_packets  # noqa: E402
+
+
+def make_packets(n, rng):
+    data = bytearray()
+    for _ in range(n):
+        w, x, y, z = (rng.gauss(0, 1) for _ in range(4))
+        m = math.sqrt(w * w + x * x + y * y + z * z)
+        packet = bytearray(DMP_PACKET_SIZE)
+        struct.pack_into(">hxxhxxhxxh", packet, 0, *(int(v / m * 16383) for v in (w, x, y, z)))
+        struct.pack_into(">hxxhxxh", packet, 16, *(rng.randint(-2000, 2000) for _ in range(3)))
+        struct.pack_into(">hxxhxxh", packet, 28, *(rng.randint(-12000, 12000) for _ in range(3)))
+        data += packet
+    return bytes(data)
+
+
+def per_object(mpu, data):
+    out = []
+    for i in range(0, len(data), DMP_PACKET_SIZE):
+        packet = data[i:i + DMP_PACKET_SIZE]
+        quat = mpu.DMP_get_quaternion(packet)
+        grav = mpu.DMP_get_gravity(quat)
+        accel = mpu.DMP_get_acceleration_int16(packet)
+        out.append((quat, grav, mpu.DMP_get_linear_accel(accel, grav), mpu.DMP_get_euler_roll_pitch_yaw(quat, grav)))
+    return out
+
+
+def best_of(fn, repeat=5):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    mpu = MPU6050.__new__(MPU6050)  # only the packet math is used, no bus
+
+    # Same numbers from both paths
+    data = make_packets(200, rng)
+    batch = decode_dmp_packets(data)
+    for i, (quat, grav, linear, rpy) in enumerate(per_object(mpu, data)):
+        assert np.allclose(batch["quaternion"][i], (quat.w, quat.x, quat.y, quat.z))
+        assert np.allclose(batch["gravity"][i], (grav.x, grav.y, grav.z))
+        assert np.allclose(batch["linear_accel"][i], (linear.x, linear.y, linear.z))
+        assert np.allclose(batch["roll_pitch_yaw"][i], (rpy.x, rpy.y, rpy.z))
+
+    print(f"{'packets':>8s} {'objects us':>11s} {'numpy us':>9s} {'speedup':>8s}")
+    for n in (1, 24, 240, 2400):
+        data = make_packets(n, rng)
+        objects = best_of(lambda: per_object(mpu, data))
+        vectorized = best_of(lambda: decode_dmp_packets(data))
+        print(f"{n:8d} {objects * 1e6:11.1f} {vectorized * 1e6:9.1f} {objects / vectorized:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""LCD1602 transfer cost per update, on a fake SMBus that models a 100 kHz bus.
+
+Replays the backend.start_lcd_cycle rotation (one message per room, values
+drifting a little each round) through three paths:
+
+  full/per-pin  clear() + rewrite all 32 cells, one bus write per pin toggle
+                (the old path, minus its extra 1 ms sleep per byte)
+  full/batched  clear() + rewrite, each command as one burst of port bytes
+  diff/batched  only the changed cells, after a cursor move per run
+
+Run from the smart-home-system directory:  python bench_lcd_update.py
+"""
+import os
+import sys
+import time
+import types
+
+BUS_HZ = 100_000
+
+
+class FakeSMBus:
+    """Counts transactions and bytes; every byte is 9 bits on the wire, plus start/stop."""
+
+    def __init__(self, bus):
+        self.transactions = 0
+        self.bytes = 0
+
+    def _account(self, data_bytes):
+        self.transactions += 1
+        self.bytes += data_bytes
+
+    def write_byte(self, address, value):
+        self._account(1)
+
+    def write_i2c_block_data(self, address, cmd, values):
+        self._account(1 + len(values))
+
+    def bus_seconds(self):
+        return (self.bytes + self.transactions) * 9 / BUS_HZ + self.transactions * 2 / BUS_HZ
+
+
+# The LCD driver imports smbus and its helper modules by bare name, as on the Pi.
+sys.modules.setdefault("smbus", types.SimpleNamespace(SMBus=FakeSMBus))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "actuators"))
+
+from components.actuators.lcd import LCD  # noqa: E402
+
+
+def rotation(rounds):
+    rooms = ["bedroom", "master", "kitchen"]
+    for r in range(rounds):
+        for i, room in enumerate(rooms):
+            temperature = 21.0 + i + (r % 4) * 0.1
+            humidity = 45.0 + i * 3 + (r % 3) * 0.5
+            yield f"{room.capitalize()[:6]} T:{temperature:.1f}C\nH:{humidity:.1f}%"
+
+
+def run(mode, messages):
+    lcd = LCD(simulate=False)
+    bus = lcd.mcp.chip.bus
+    lcd.lcd.batched = mode != "full/per-pin"
+    bus.transactions = bus.bytes = 0
+
+    start = time.perf_counter()
+    for message in messages:
+        if mode == "diff/batched":
+            lcd.display_message(message)
+        else:
+            lcd.lcd.clear()
+            lcd.lcd.setCursor(0, 0)
+            lcd.lcd.message(message)
+    wall = time.perf_counter() - start
+    return bus, wall
+
+
+def main(rounds=10):
+    messages = list(rotation(rounds))
+    print(f"{'path':>13s} {'i2c txn':>8s} {'bytes':>6s} {'bus ms':>7s} {'wall ms':>8s}   (per update)")
+    for mode in ("full/per-pin", "full/batched", "diff/batched"):
+        bus, wall = run(mode, messages)
+        n = len(messages)
+        print(f"{mode:>13s} {bus.transactions / n:8.1f} {bus.bytes / n:6.1f} "
+              f"{bus.bus_seconds() / n * 1000:7.2f} {wall / n * 1000:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
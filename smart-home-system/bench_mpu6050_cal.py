@@ -0,0 +1,108 @@
+"""MPU6050 calibration: per-axis PI loop vs buffered six-axis Newton steps.
+
+A simulated MPU6050 has a per-device bias on every axis, a register gain a
+few percent off the datasheet scale and Gaussian noise. The baseline is
+what MPU6050_cal.py used to do: one PI controller per axis (kp = 0.03125,
+ki = 0.25, updated at 100 Hz) fed one reading per update, done when the
+100-update average is within tolerance. components.sensors.MPU6050_cal
+.calibrate averages a buffer of samples and corrects all axes at once.
+Counted are sensor reads and offset writes; with NumPy installed the buffer
+is averaged with it.
+
+Run from the smart-home-system directory:  python bench_mpu6050_cal.py
+"""
+import random
+import time
+
+from components.sensors import MPU6050_cal as cal
+
+NOISE = (40, 40, 40, 4, 4, 4)  # reading LSB, one sigma
+PI_RATE = 100.0
+PI_KP = 0.03125
+PI_KI = 0.25
+PI_WINDOW = 100
+
+
+class SimulatedMPU:
+    def __init__(self, seed):
+        rng = random.Random(seed)
+        self.rng = rng
+        self.factory = [rng.randint(-3000, 3000) for _ in range(3)] + [0, 0, 0]
+        # Reading at offset 0; the factory accel trim nearly cancels all but a residual bias
+        self.base = [target - factory * scale + rng.uniform(-600, 600)
+                     for target, factory, scale in zip(cal.TARGET, self.factory, cal.OFFSET_SCALE)]
+        self.base[3:] = [rng.uniform(-300, 300) for _ in range(3)]
+        self.gain = [scale * rng.uniform(0.95, 1.05) for scale in cal.OFFSET_SCALE]
+        self.offsets = list(self.factory)
+        self.reads = 0
+        self.writes = 0
+
+    def _axis(self, k):
+        value = self.base[k] + self.offsets[k] * self.gain[k] + self.rng.gauss(0.0, NOISE[k])
+        return int(min(32767, max(-32768, round(value))))
+
+    def get_motion_raw(self):
+        self.reads += 1
+        ax, ay, az, gx, gy, gz = (self._axis(k) for k in range(6))
+        return ax, ay, az, 0, gx, gy, gz
+
+    def get_accel_offsets(self):
+        return self.offsets[:3]
+
+    def get_gyro_offsets(self):
+        return self.offsets[3:]
+
+    def set_accel_offsets(self, x, y, z):
+        self.writes += 1
+        self.offsets[:3] = [x, y, z]
+
+    def set_gyro_offsets(self, x, y, z):
+        self.writes += 1
+        self.offsets[3:] = [x, y, z]
+
+    def error(self):
+        """Noise-free distance of every axis from its target, in reading LSB."""
+        return [abs(self.base[k] + self.offsets[k] * self.gain[k] - cal.TARGET[k]) for k in range(6)]
+
+
+def pi_loop(mpu, max_updates=200000):
+    start = list(mpu.offsets)
+    integral = [0.0] * 6
+    window = []
+    dt = 1.0 / PI_RATE
+    for update in range(1, max_updates + 1):
+        reading = mpu.get_motion_raw()
+        errors = [reading[column] - target for column, target in zip(cal._COLUMNS, cal.TARGET)]
+        for k in range(6):
+            integral[k] += errors[k] * dt
+            mpu.offsets[k] = round(start[k] - (PI_KP * errors[k] + PI_KI * integral[k]))
+        mpu.writes += 2
+        window.append(errors)
+        if len(window) > PI_WINDOW:
+            window.pop(0)
+        if len(window) == PI_WINDOW and all(
+                abs(sum(row[k] for row in window) / PI_WINDOW) <= cal.TOLERANCE[k] for k in range(6)):
+            return update
+    return None
+
+
+def main():
+    print(f"{'device':>6} {'method':>8} {'reads':>8} {'writes':>7} {'time at 1 kHz':>14} {'max error':>10}")
+    for seed in range(5):
+        mpu = SimulatedMPU(seed)
+        updates = pi_loop(mpu)
+        pi_time = f"{updates / PI_RATE:.1f} s" if updates else "no conv."
+        print(f"{seed:>6} {'PI':>8} {mpu.reads:>8} {mpu.writes:>7} {pi_time:>14} {max(mpu.error()):>10.1f}")
+
+        mpu = SimulatedMPU(seed)
+        start = time.perf_counter()
+        offsets, iterations, converged = cal.calibrate(mpu)
+        elapsed = time.perf_counter() - start
+        label = f"{iterations} it" + ("" if converged else "!")
+        print(f"{'':>6} {label:>8} {mpu.reads:>8} {mpu.writes:>7} {mpu.reads / 1000.0:>12.1f} s {max(mpu.error()):>10.1f}"
+              f"   (host {elapsed * 1000:.0f} ms)")
+    print("numpy:", "yes" if cal.np is not None else "no (pure Python averaging)")
+
+
+if __name__ == "__main__":
+    main()
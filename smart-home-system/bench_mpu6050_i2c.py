@@ -0,0 +1,130 @@
+"""SMBus transactions per gyroscope sample and per DMP packet, on a fake bus.
+
+The fake bus keeps a register file and a FIFO filled with 42-byte DMP
+packets, counts transactions and models their time on a 400 kHz bus (9 bits
+per byte plus address/register overhead). The "before" rows replay the old
+access pattern (two 6-byte reads per sample, one read_byte_data per FIFO
+byte, two single-register reads for FIFO_COUNT) on the same bus.
+
+Run from the smart-home-system directory:  python bench_mpu6050_i2c.py
+"""
+import os
+import random
+import sys
+import time
+import types
+
+BUS_HZ = 400_000
+PACKET_SIZE = 42
+
+
+class FakeSMBus:
+    """MPU6050 stand-in: registers auto-increment, FIFO_R_W pops the FIFO."""
+
+    FIFO_COUNTH = 0x72
+    FIFO_R_W = 0x74
+
+    def __init__(self, bus=1):
+        self.regs = bytearray(128)
+        self.fifo = bytearray()
+        self.rng = random.Random(0)
+        self.transactions = 0
+        self.bytes = 0
+
+    def _account(self, data_bytes):
+        self.transactions += 1
+        self.bytes += data_bytes
+
+    def fill_fifo(self, packets):
+        for _ in range(packets):
+            self.fifo += bytes(self.rng.randrange(256) for _ in range(PACKET_SIZE))
+
+    def _read(self, register):
+        if register == self.FIFO_R_W:
+            if not self.fifo:
+                return 0
+            value = self.fifo[0]
+            del self.fifo[0]
+            return value
+        if register == self.FIFO_COUNTH:
+            return len(self.fifo) >> 8
+        if register == self.FIFO_COUNTH + 1:
+            return len(self.fifo) & 0xFF
+        if 0x3B <= register < 0x49:
+            self.regs[register] = self.rng.randrange(256)
+        return self.regs[register]
+
+    def read_byte_data(self, address, register):
+        self._account(1)
+        return self._read(register)
+
+    def read_i2c_block_data(self, address, register, length):
+        self._account(length)
+        if register == self.FIFO_R_W:
+            return [self._read(register) for _ in range(length)]
+        return [self._read(register + i) for i in range(length)]
+
+    def write_byte_data(self, address, register, value):
+        self._account(1)
+        self.regs[register] = value & 0xFF
+
+    def bus_seconds(self):
+        # start + address + register, repeated start + address, data bytes, stop
+        return (self.bytes + 3 * self.transactions) * 9 / BUS_HZ
+
+
+# The MPU6050 driver imports smbus and its helper modules by bare name, as on the Pi.
+sys.modules.setdefault("smbus", types.SimpleNamespace(SMBus=FakeSMBus))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "sensors"))
+
+import MPU6050  # noqa: E402
+
+
+def old_sample(mpu, bus):
+    return mpu.get_acceleration(), mpu.get_rotation()
+
+
+def old_packet(mpu, bus):
+    count = bus.read_byte_data(0x68, 0x72) << 8 | bus.read_byte_data(0x68, 0x73)
+    if count >= PACKET_SIZE:
+        return [bus.read_byte_data(0x68, 0x74) for _ in range(PACKET_SIZE)]
+
+
+def new_sample(mpu, bus):
+    return mpu.get_motion_raw()
+
+
+def new_packet(mpu, bus):
+    if mpu.get_FIFO_count() >= PACKET_SIZE:
+        packet = mpu.get_FIFO_bytes(PACKET_SIZE)
+        return mpu.DMP_get_quaternion_int16(packet), mpu.DMP_get_acceleration_int16(packet)
+
+
+def measure(mpu, bus, fn, n, fifo=False):
+    if fifo:
+        bus.fill_fifo(n)
+    bus.transactions = bus.bytes = 0
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(mpu, bus)
+    wall = time.perf_counter() - start
+    return bus.transactions / n, bus.bus_seconds() / n, wall / n
+
+
+def main(n=2000):
+    mpu = MPU6050.MPU6050()
+    bus = mpu._MPU6050__bus
+
+    print(f"{'':>18s} {'txn':>6s} {'bus us':>8s} {'python us':>10s}")
+    for label, fn, fifo in (
+        ("sample before", old_sample, False),
+        ("sample after", new_sample, False),
+        ("DMP packet before", old_packet, True),
+        ("DMP packet after", new_packet, True),
+    ):
+        txn, bus_s, wall = measure(mpu, bus, fn, n, fifo)
+        print(f"{label:>18s} {txn:6.1f} {bus_s * 1e6:8.1f} {wall * 1e6:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Bytes per reading and encode/decode cost: JSON vs. payload_codec binary frames.
+
+Run from the smart-home-system directory:  python bench_payload_codec.py
+"""
+import json
+import random
+import timeit
+
+import payload_codec
+
+
+def gyro_reading():
+    return {
+        "pi_id": "PI2",
+        "device_name": "KitchenController",
+        "sensor_type": "gyroscope",
+        "simulated": True,
+        "value": {
+            "accel_x": round(random.uniform(-1, 1), 2),
+            "accel_y": round(random.uniform(-1, 1), 2),
+            "accel_z": round(random.uniform(-1, 1), 2),
+            "gyro_x": round(random.uniform(-250, 250), 2),
+            "gyro_y": round(random.uniform(-250, 250), 2),
+            "gyro_z": round(random.uniform(-250, 250), 2),
+        },
+    }
+
+
+def mixed_reading(i):
+    kinds = [
+        ("door_button", random.choice([0, 1])),
+        ("door_distance", round(random.uniform(5.0, 200.0), 2)),
+        ("kitchen_dht_temperature", round(random.uniform(20.0, 30.0), 1)),
+        ("display_4sd", "0130"),
+    ]
+    sensor_type, value = kinds[i % len(kinds)]
+    return {
+        "pi_id": "PI2",
+        "device_name": "KitchenController",
+        "sensor_type": sensor_type,
+        "simulated": True,
+        "value": value,
+    }
+
+
+CASES = [
+    ("gyro single", gyro_reading()),
+    ("gyro batch x10", [gyro_reading() for _ in range(10)]),
+    ("mixed batch x10", [mixed_reading(i) for i in range(10)]),
+]
+
+
+def readings_in(obj):
+    return len(obj) if isinstance(obj, list) else 1
+
+
+def main(number=20000):
+    print(f"{'case':16s} {'fmt':6s} {'B/reading':>10s} {'enc us':>8s} {'dec us':>8s}")
+    for name, obj in CASES:
+        n = readings_in(obj)
+        assert payload_codec.loads(payload_codec.encode(obj)) == obj, name
+        for fmt in (payload_codec.FORMAT_JSON, payload_codec.FORMAT_BINARY):
+            raw = payload_codec.dumps(obj, fmt)
+            raw = raw.encode() if isinstance(raw, str) else raw
+            enc = timeit.timeit(lambda: payload_codec.dumps(obj, fmt), number=number) / number * 1e6
+            dec = timeit.timeit(lambda: payload_codec.loads(raw), number=number) / number * 1e6
+            print(f"{name:16s} {fmt:6s} {len(raw) / n:10.1f} {enc / n:8.2f} {dec / n:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
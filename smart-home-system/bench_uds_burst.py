@@ -0,0 +1,70 @@
+"""UDS read time versus accuracy for single pings and bursts.
+
+Every ping is answered by components.sensors.uds.EchoModel through the mock
+GPIO: a target at 100 cm with 0.5 cm noise, 10 % stray echoes and 5 % lost
+echoes. Reads go through the real UDS.read and _ping, with the module's
+`time` replaced by a mock_rpi.VirtualClock: sleeps take no real time and
+every pin read costs 5 us. The echo timing, the ping spacing and the burst
+filter all come from the production code, and every configuration replays
+the same seeded echoes, so the table only changes when the code does.
+"read ms" is the virtual time one read takes. "bad" counts reads more than
+5 cm off, i.e. a third of the 15 cm step backend.detect_direction treats as
+someone walking through the door.
+
+Run from the smart-home-system directory:  python bench_uds_burst.py
+"""
+import contextlib
+import io
+import random
+import statistics
+from unittest import mock
+
+from mock_rpi import GPIO, VirtualClock
+from components.sensors import uds
+from components.sensors.uds import UDS, EchoModel
+
+TRIGGER, ECHO = 23, 24
+DISTANCE = 100.0
+BAD_ERROR = 5.0
+# One GPIO.input() call in the echo loop on a Pi; 5 us is 0.09 cm of range
+INPUT_NS = 5000
+
+
+def measure(sensor, clock, reads):
+    durations, errors, invalid = [], [], 0
+    for _ in range(reads):
+        start = clock.perf_counter_ns()
+        distance = sensor.read()
+        durations.append(clock.perf_counter_ns() - start)
+        if distance == UDS.INVALID_DISTANCE:
+            invalid += 1
+        else:
+            errors.append(abs(distance - DISTANCE))
+    return durations, errors, invalid
+
+
+def main(reads=200):
+    configs = [(1, "median")] + [(burst, aggregate) for burst in (3, 5, 7) for aggregate in UDS.AGGREGATES]
+    clock = VirtualClock(input_ns=INPUT_NS)
+    GPIO.clock = clock
+
+    results = []
+    # MockGPIO logs every setup/output call; keep the table readable.
+    with mock.patch.object(uds, "time", clock), contextlib.redirect_stdout(io.StringIO()):
+        for burst, aggregate in configs:
+            model = EchoModel(DISTANCE, noise_cm=0.5, outlier_rate=0.1, dropout_rate=0.05, rng=random.Random(0))
+            GPIO.attach_echo(TRIGGER, ECHO, model)
+            sensor = UDS(TRIGGER, ECHO, burst=burst, aggregate=aggregate)
+            results.append((burst, aggregate) + measure(sensor, clock, reads))
+    GPIO.clock = None
+
+    print(f"{'burst':>5s} {'aggregate':>13s} {'read ms':>8s} {'mean err':>9s} {'max err':>8s} {'bad':>6s} {'invalid':>8s}")
+    for burst, aggregate, durations, errors, invalid in results:
+        bad = sum(1 for e in errors if e > BAD_ERROR)
+        print(f"{burst:5d} {aggregate:>13s} {statistics.fmean(durations) / 1e6:8.1f} "
+              f"{statistics.fmean(errors) if errors else 0.0:9.2f} {max(errors, default=0.0):8.2f} "
+              f"{bad / reads:6.1%} {invalid / reads:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
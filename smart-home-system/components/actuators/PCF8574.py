@@ -19,6 +19,18 @@ class PCF8574_I2C(object):
 		self.currentValue = value
 		self.bus.write_byte(self.address,value)
 
+	def writeBytes(self,values):#Write several successive port values in one I2C transaction
+		# The PCF8574 latches every byte of a write, so the SMBus "command" byte is just the first value.
+		# One block carries at most 32 data bytes.
+		for i in range(0,len(values),33):
+			chunk = values[i:i+33]
+			if len(chunk) == 1:
+				self.bus.write_byte(self.address,chunk[0])
+			else:
+				self.bus.write_i2c_block_data(self.address,chunk[0],list(chunk[1:]))
+		if values:
+			self.currentValue = values[-1]
+
 	def digitalRead(self,pin):#Read PCF8574 one port of the data
 		value = readByte()	
 		return (value&(1<<pin)==(1<<pin)) and 1 or 0
@@ -59,6 +71,10 @@ class PCF8574_GPIO(object):#Standardization function interface
 		return self.chip.digitalRead(pin)
 	def output(self,pin,value):#Write data to PCF8574 one port
 		self.chip.digitalWrite(pin,value)
+	def read_port(self):#Current value of all 8 ports
+		return self.chip.readByte()
+	def write_bytes(self,values):#Write a sequence of whole-port values in one I2C transaction
+		self.chip.writeBytes(values)
 		
 def destroy():
 	bus.close()
@@ -1,7 +1,5 @@
 import time
 
-import time
-
 try:
     import RPi.GPIO as GPIO # type: ignore
     RUNNING_ON_PI = True
@@ -9,15 +7,37 @@ except ImportError:
     from mock_rpi import GPIO
     RUNNING_ON_PI = False
 
+
+class _DigitSlot:
+    """What the refresh loop writes for one digit of one frame."""
+
+    __slots__ = ("lit", "full", "diff")
+
+    def __init__(self, lit, full, diff):
+        self.lit = lit    # any segment on; a dark digit is not enabled at all
+        self.full = full  # (pin, level) for all seven segments
+        self.diff = diff  # only the segments that differ from the previous digit
+
+
 class Display4SD:
-    def __init__(self, segment_pins, digit_pins, simulate=False, brightness=7, update_interval=0.002):
+    """4-digit 7-segment display, multiplexed by run_loop on its own thread.
+
+    update() renders the value into a frame table once; the loop only walks
+    that table. Each frame is one (pin, level) plan per digit, and a blinking
+    value simply has a second, dark frame that the loop switches to every
+    `blink_period` s. Between neighbouring digits of the same frame only the
+    segment pins that differ are written.
+    """
+
+    def __init__(self, segment_pins, digit_pins, simulate=False, brightness=7, update_interval=0.002,
+                 blink_period=0.5):
         self.segment_pins = segment_pins
         self.digit_pins = digit_pins
         self.simulate = simulate
         self.brightness = brightness
         self.update_interval = update_interval
+        self.blink_period = blink_period
         self.blink = False
-        self._blink_state = True
         self.value = "    "
         self._stop_event = None
 
@@ -34,6 +54,14 @@ class Display4SD:
             '8': (1,1,1,1,1,1,1),
             '9': (1,1,1,1,0,1,1),
         }
+        self.frames = self._render(self.value, False)
+        self._rendered = (self.value, False)
+
+        self.slots = 0
+        self.late_slots = 0   # slots that started after the next one was already due
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+        self.renders = 0
 
         if not simulate:
             self.GPIO = GPIO
@@ -48,39 +76,102 @@ class Display4SD:
         else:
             self.GPIO = None
 
-    def update(self, value: str):
+    def _render(self, value, blink):
+        blank = self.num_map[' ']
+        digits = [self.num_map.get(ch, blank) for ch in value[:len(self.digit_pins)]]
+        frames = [self._plan(digits)]
+        if blink:
+            frames.append(self._plan([blank] * len(digits)))
+        return tuple(frames)
+
+    def _plan(self, digits):
+        slots = []
+        for idx, segments in enumerate(digits):
+            previous = digits[idx - 1]
+            full = tuple(zip(self.segment_pins, segments))
+            diff = tuple((pin, level) for pin, level, prev in zip(self.segment_pins, segments, previous) if level != prev)
+            slots.append(_DigitSlot(any(segments), full, diff))
+        return tuple(slots)
+
+    def _show(self, value):
         self.value = str(value).rjust(4)
+        state = (self.value, self.blink)
+        if state != self._rendered:
+            # One assignment, so the refresh thread sees the old or the new table, never a mix
+            self.frames = self._render(*state)
+            self._rendered = state
+            self.renders += 1
+
+    def update(self, value: str):
+        self._show(value)
         print("[DISPLAY] " + str(value))
 
     def run_loop(self, stop_event):
+        """Refresh one digit every `update_interval` s (monotonic deadlines) until stop_event."""
         self._stop_event = stop_event
-        blink_timer = time.time()
+        if self.simulate:
+            # Nothing to multiplex; update() already prints the value.
+            stop_event.wait()
+            return
+
+        output = self.GPIO.output
+        digit_count = len(self.digit_pins)
+        start = time.monotonic()
+        next_slot = start
+        digit = 0
+        shown = None  # (frames, frame index) the segment pins currently hold
+        enabled = None
+
         while not stop_event.is_set():
-            if self.blink:
-                if time.time() - blink_timer > 0.5:
-                    self._blink_state = not self._blink_state
-                    blink_timer = time.time()
-            else:
-                self._blink_state = True
-
-            for digit_idx in range(4):
-                for seg_idx in range(7):
-                    seg_val = self.num_map.get(self.value[digit_idx], (0,0,0,0,0,0,0))[seg_idx]
-                    if not self.simulate:
-                        self.GPIO.output(self.segment_pins[seg_idx], seg_val if self._blink_state else 0)
-                if not self.simulate:
-                    self.GPIO.output(self.digit_pins[digit_idx], 0 if self._blink_state else 1)
-                time.sleep(self.update_interval)
-                if not self.simulate:
-                    self.GPIO.output(self.digit_pins[digit_idx], 1)
+            frames = self.frames
+            frame_idx = int((next_slot - start) / self.blink_period) % len(frames)
+            slot = frames[frame_idx][digit]
+
+            if enabled is not None:
+                output(self.digit_pins[enabled], 1)
+                enabled = None
+            writes = slot.diff if shown == (frames, frame_idx) else slot.full
+            for pin, level in writes:
+                output(pin, level)
+            shown = (frames, frame_idx)
+            if slot.lit:
+                output(self.digit_pins[digit], 0)
+                enabled = digit
+
+            next_slot += self.update_interval
+            delay = next_slot - time.monotonic()
+            if delay > 0:
+                stop_event.wait(delay)
+            jitter = time.monotonic() - next_slot
+            self.slots += 1
+            self.jitter_total += jitter
+            if jitter > self.jitter_max:
+                self.jitter_max = jitter
+            if jitter > self.update_interval:
+                # Fell a whole slot behind: restart the grid instead of rushing to catch up
+                self.late_slots += 1
+                next_slot = time.monotonic()
+            digit = (digit + 1) % digit_count
+
+        if enabled is not None:
+            output(self.digit_pins[enabled], 1)
+
+    def get_stats(self):
+        return {
+            "slots": self.slots,
+            "late_slots": self.late_slots,
+            "avg_jitter_ms": self.jitter_total / self.slots * 1000.0 if self.slots else 0.0,
+            "max_jitter_ms": self.jitter_max * 1000.0,
+            "renders": self.renders,
+        }
 
     def turn_off(self):
+        self._show("    ")
         if not self.simulate:
             for pin in self.segment_pins:
                 self.GPIO.output(pin, 0)
             for pin in self.digit_pins:
                 self.GPIO.output(pin, 1)
-        self.value = "    "
 
     def cleanup(self):
         if not self.simulate and self.GPIO:
@@ -1,4 +1,4 @@
-import time
+import threading
 
 try:
     from PCF8574 import PCF8574_GPIO
@@ -9,10 +9,17 @@ except ImportError:
 
 
 class LCD:
+    COLS = 16
+    ROWS = 2
+    ROW_ADDRESSES = (0x00, 0x40)
+
     def __init__(self, simulate):
         self.simulate = simulate
         self.PCF8574_address = 0x27
         self.PCF8574A_address = 0x3F
+        # What the display currently shows, one list of characters per row
+        self.shadow = [[" "] * self.COLS for _ in range(self.ROWS)]
+        self.lock = threading.Lock()
 
         if not self.simulate:
             try:
@@ -34,14 +41,47 @@ class LCD:
             self.mcp.output(3, 1)
             self.lcd.begin(16, 2)
 
+    def _frame(self, message):
+        lines = message.split("\n")[:self.ROWS]
+        lines += [""] * (self.ROWS - len(lines))
+        return [list(line[:self.COLS].ljust(self.COLS)) for line in lines]
+
+    def _diff(self, frame):
+        """(byte, char_mode) writes that turn the shadow into `frame`.
+
+        Changed cells are sent as runs, each after one cursor move. A single
+        unchanged cell between two changes is rewritten rather than skipped,
+        since a cursor move costs as much as a character.
+        """
+        writes = []
+        for row in range(self.ROWS):
+            old, new = self.shadow[row], frame[row]
+            col = 0
+            while col < self.COLS:
+                if old[col] == new[col]:
+                    col += 1
+                    continue
+                end = col + 1
+                while end < self.COLS and (old[end] != new[end] or (end + 1 < self.COLS and old[end + 1] != new[end + 1])):
+                    end += 1
+                writes.append((Adafruit_CharLCD.LCD_SETDDRAMADDR | (self.ROW_ADDRESSES[row] + col), False))
+                writes.extend((ord(ch), True) for ch in new[col:end])
+                col = end
+        return writes
+
     def display_message(self, message: str):
         if not self.simulate:
-            self.lcd.clear()
-            self.lcd.setCursor(0, 0)
-            self.lcd.message(message)
+            with self.lock:
+                frame = self._frame(message)
+                writes = self._diff(frame)
+                if writes:
+                    self.lcd.writeSequence(writes)
+                    self.shadow = frame
         else:
             print("[LCD] " + message)
 
     def destroy(self):
         if not self.simulate:
-            self.lcd.clear()
+            with self.lock:
+                self.lcd.clear()
+                self.shadow = [[" "] * self.COLS for _ in range(self.ROWS)]
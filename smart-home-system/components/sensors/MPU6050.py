@@ -48,6 +48,7 @@ THE SOFTWARE.
 
 import math
 import ctypes
+import struct
 import time
 import smbus
 import csv
@@ -55,6 +56,22 @@ from MPUConstants import MPUConstants as C
 from Quaternion import Quaternion as Q
 from Quaternion import XYZVector as V
 
+# SMBus block transfers carry at most 32 data bytes
+I2C_BLOCK_MAX = 32
+# Big-endian int16 layouts of the register/FIFO blocks
+_MOTION_RAW = struct.Struct('>7h')        # ACCEL_XOUT_H..GYRO_ZOUT_L: ax ay az temp gx gy gz
+_XYZ_RAW = struct.Struct('>3h')
+_DMP_QUAT = struct.Struct('>hxxhxxhxxh')  # w, x, y, z at packet bytes 0, 4, 8, 12
+_DMP_XYZ = struct.Struct('>hxxhxxh')      # x, y, z at packet bytes 16, 20, 24 (gyro) and 28, 32, 36 (accel)
+
+
+def _int16(a_value):
+    return ((int(a_value) + 0x8000) & 0xFFFF) - 0x8000
+
+
+def _as_buffer(a_data):
+    return a_data if isinstance(a_data, (bytes, bytearray)) else bytes(a_data)
+
 
 class MPU6050:
     __buffer = [0] * 14
@@ -132,15 +149,11 @@ class MPU6050:
         if a_length > len(a_data_list):
             print('read_bytes, length of passed list too short')
             return a_data_list
-        # Attempt to use the built in read bytes function in the adafruit lib
-        # a_data_list = self.__bus.read_i2c_block_data(self.__dev_id, a_address,
-        #                                             a_length)
-        # Attempt to bypass adafruit lib
-        #a_data_list = self.__mpu.bus.read_i2c_block_data(0x68, a_address, a_length)
-        #print('data' + str(a_data_list))
-        for x in range(0, a_length):
-            a_data_list[x] = self.__bus.read_byte_data(self.__dev_id,
-                                                       a_address + x)
+        # Registers auto-increment, so consecutive ones come in one block read
+        for start in range(0, a_length, I2C_BLOCK_MAX):
+            count = min(I2C_BLOCK_MAX, a_length - start)
+            a_data_list[start:start + count] = self.__bus.read_i2c_block_data(
+                self.__dev_id, a_address + start, count)
         return a_data_list
 
     def write_memory_block(self, a_data_list, a_data_size, a_bank, a_address,
@@ -318,6 +331,12 @@ class MPU6050:
                         C.MPU6050_CFG_EXT_SYNC_SET_BIT,
                         C.MPU6050_CFG_EXT_SYNC_SET_LENGTH, a_sync)
 
+    def set_DHPF_mode(self, a_mode):
+        # Accelerometer high-pass filter; the motion interrupt compares its output to MOT_THR
+        self.write_bits(C.MPU6050_RA_ACCEL_CONFIG,
+                        C.MPU6050_ACONFIG_ACCEL_HPF_BIT,
+                        C.MPU6050_ACONFIG_ACCEL_HPF_LENGTH, a_mode)
+
     def set_DLF_mode(self, a_mode):
         self.write_bits(C.MPU6050_RA_CONFIG, C.MPU6050_CFG_DLPF_CFG_BIT,
                         C.MPU6050_CFG_DLPF_CFG_LENGTH, a_mode)
@@ -731,24 +750,49 @@ class MPU6050:
         self.__bus.write_byte_data(self.__dev_id, C.MPU6050_RA_ZG_OFFS_USRL,
                                    ctypes.c_int8(a_offset).value)
 
+    # The three accel (XA_OFFS_H..ZA_OFFS_L_TC) and three gyro
+    # (XG_OFFS_USRH..ZG_OFFS_USRL) offset registers are consecutive, so each
+    # triple is one 6-byte block transfer
+    def get_accel_offsets(self):
+        raw_data = self.__bus.read_i2c_block_data(self.__dev_id,
+                                                  C.MPU6050_RA_XA_OFFS_H, 6)
+        return list(_XYZ_RAW.unpack(bytes(raw_data)))
+
+    def set_accel_offsets(self, a_x, a_y, a_z):
+        self.__bus.write_i2c_block_data(
+            self.__dev_id, C.MPU6050_RA_XA_OFFS_H,
+            list(_XYZ_RAW.pack(_int16(a_x), _int16(a_y), _int16(a_z))))
+
+    def get_gyro_offsets(self):
+        raw_data = self.__bus.read_i2c_block_data(self.__dev_id,
+                                                  C.MPU6050_RA_XG_OFFS_USRH, 6)
+        return list(_XYZ_RAW.unpack(bytes(raw_data)))
+
+    def set_gyro_offsets(self, a_x, a_y, a_z):
+        self.__bus.write_i2c_block_data(
+            self.__dev_id, C.MPU6050_RA_XG_OFFS_USRH,
+            list(_XYZ_RAW.pack(_int16(a_x), _int16(a_y), _int16(a_z))))
+
     # Main interfacing functions to get raw data from MPU
     def get_acceleration(self):
         raw_data = self.__bus.read_i2c_block_data(self.__dev_id,
                                                   C.MPU6050_RA_ACCEL_XOUT_H, 6)
-        accel = [0] * 3
-        accel[0] = ctypes.c_int16(raw_data[0] << 8 | raw_data[1]).value
-        accel[1] = ctypes.c_int16(raw_data[2] << 8 | raw_data[3]).value
-        accel[2] = ctypes.c_int16(raw_data[4] << 8 | raw_data[5]).value
-        return accel
+        return list(_XYZ_RAW.unpack(bytes(raw_data)))
 
     def get_rotation(self):
         raw_data = self.__bus.read_i2c_block_data(self.__dev_id,
                                                   C.MPU6050_RA_GYRO_XOUT_H, 6)
-        gyro = [0] * 3
-        gyro[0] = ctypes.c_int16(raw_data[0] << 8 | raw_data[1]).value
-        gyro[1] = ctypes.c_int16(raw_data[2] << 8 | raw_data[3]).value
-        gyro[2] = ctypes.c_int16(raw_data[4] << 8 | raw_data[5]).value
-        return gyro
+        return list(_XYZ_RAW.unpack(bytes(raw_data)))
+
+    def get_motion_raw(self):
+        """Accel, temperature and gyro registers in one 14-byte burst.
+
+        Returns (ax, ay, az, temp, gx, gy, gz) as raw int16 values, all from
+        the same sample (two separate reads can straddle a sensor update).
+        """
+        raw_data = self.__bus.read_i2c_block_data(self.__dev_id,
+                                                  C.MPU6050_RA_ACCEL_XOUT_H, 14)
+        return _MOTION_RAW.unpack(bytes(raw_data))
 
     # Interfacing functions to get data from FIFO buffer
     def DMP_get_FIFO_packet_size(self):
@@ -764,12 +808,13 @@ class MPU6050:
         return (data[0] << 8) | data[1]
 
     def get_FIFO_bytes(self, a_FIFO_count):
-        return_list = list()
-        for index in range(0, a_FIFO_count):
-            return_list.append(
-                self.__bus.read_byte_data(self.__dev_id,
-                                          C.MPU6050_RA_FIFO_R_W))
-        return return_list
+        # FIFO_R_W does not auto-increment: a block read pops successive FIFO bytes
+        return_data = bytearray()
+        while len(return_data) < a_FIFO_count:
+            count = min(I2C_BLOCK_MAX, a_FIFO_count - len(return_data))
+            return_data += bytes(self.__bus.read_i2c_block_data(
+                self.__dev_id, C.MPU6050_RA_FIFO_R_W, count))
+        return return_data
 
     def get_int_status(self):
         return self.__bus.read_byte_data(self.__dev_id,
@@ -777,10 +822,7 @@ class MPU6050:
 
     # Data retrieval from received FIFO buffer
     def DMP_get_quaternion_int16(self, a_FIFO_buffer):
-        w = ctypes.c_int16((a_FIFO_buffer[0] << 8) | a_FIFO_buffer[1]).value
-        x = ctypes.c_int16((a_FIFO_buffer[4] << 8) | a_FIFO_buffer[5]).value
-        y = ctypes.c_int16((a_FIFO_buffer[8] << 8) | a_FIFO_buffer[9]).value
-        z = ctypes.c_int16((a_FIFO_buffer[12] << 8) | a_FIFO_buffer[13]).value
+        w, x, y, z = _DMP_QUAT.unpack_from(_as_buffer(a_FIFO_buffer), 0)
         return Q(w, x, y, z)
 
     def DMP_get_quaternion(self, a_FIFO_buffer):
@@ -792,9 +834,11 @@ class MPU6050:
         return Q(w, x, y, z)
 
     def DMP_get_acceleration_int16(self, a_FIFO_buffer):
-        x = ctypes.c_int16(a_FIFO_buffer[28] << 8 | a_FIFO_buffer[29]).value
-        y = ctypes.c_int16(a_FIFO_buffer[32] << 8 | a_FIFO_buffer[33]).value
-        z = ctypes.c_int16(a_FIFO_buffer[36] << 8 | a_FIFO_buffer[37]).value
+        x, y, z = _DMP_XYZ.unpack_from(_as_buffer(a_FIFO_buffer), 28)
+        return V(x, y, z)
+
+    def DMP_get_gyro_int16(self, a_FIFO_buffer):
+        x, y, z = _DMP_XYZ.unpack_from(_as_buffer(a_FIFO_buffer), 16)
         return V(x, y, z)
 
     def DMP_get_gravity(self, a_quat):
@@ -805,15 +849,15 @@ class MPU6050:
         return V(x, y, z)
 
     def DMP_get_linear_accel_int16(self, a_v_raw, a_grav):
-        x = ctypes.c_int16(a_v_raw.x - (a_grav.x*8192)).value
-        y = ctypes.c_int16(a_v_raw.y - (a_grav.y*8192)).value
-        y = ctypes.c_int16(a_v_raw.y - (a_grav.y*8192)).value
+        x = _int16(a_v_raw.x - (a_grav.x*8192))
+        y = _int16(a_v_raw.y - (a_grav.y*8192))
+        z = _int16(a_v_raw.z - (a_grav.z*8192))
         return V(x, y, z)
 
     def DMP_get_euler(self, a_quat):
         psi = math.atan2(2*a_quat.x*a_quat.y - 2*a_quat.w*a_quat.z,
                          2*a_quat.w*a_quat.w + 2*a_quat.x*a_quat.x - 1)
-        theta = -asin(2*a_quat.x*a_quat.z + 2*a_quat.w*a_quat.y)
+        theta = -math.asin(2*a_quat.x*a_quat.z + 2*a_quat.w*a_quat.y)
         phi = math.atan2(2*a_quat.y*a_quat.z - 2*a_quat.w*a_quat.x,
                          2*a_quat.w*a_quat.w + 2*a_quat.z*a_quat.z - 1)
         return V(psi, theta, phi)
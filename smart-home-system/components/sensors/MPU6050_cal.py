@@ -1,186 +1,140 @@
-from MPU6050 import MPU6050
-from SimplePID import SimplePID
+"""MPU6050 offset calibration.
 
+Put the sensor flat and still (z axis up) and run on the Pi:
 
-def avg_from_array(a_array):
-    sum = 0.0
-    for index in range(0, len(a_array)):
-        sum += a_array[index]
+    python components/sensors/MPU6050_cal.py [config/pi2_config.ini]
 
-    return sum/len(a_array)
+Each iteration reads a buffer of raw samples, averages all six axes at once
+and moves every offset register by its error divided by the register's
+scale. The scales are known from the datasheet, so this is a Newton step
+rather than a PID: it settles in two or three iterations. The result is
+written to [GSG_OFFSETS] of the config, which Gyroscope applies at startup.
 
-
-i2c_bus = 1
-device_address = 0x68
-# The offsets are different for each device and should be changed
-# accordingly using a calibration procedure
-x_accel_offset = 0
-y_accel_offset = 0
-z_accel_offset =0
-x_gyro_offset = 0
-y_gyro_offset = 0
-z_gyro_offset = 0
-enable_debug_output = True
-
-mpu = MPU6050(i2c_bus, device_address, x_accel_offset, y_accel_offset,
-              z_accel_offset, x_gyro_offset, y_gyro_offset, z_gyro_offset,
-              enable_debug_output)
-
-kp = 0.03125
-ki = 0.25
-kd = 0
-
-pidax = SimplePID(0, -15000, 15000, kp, ki, kd, 100, True)
-piday = SimplePID(0, -15000, 15000, kp, ki, kd, 100, True)
-pidaz = SimplePID(0, -15000, 15000, kp, ki, kd, 100, True)
-pidgx = SimplePID(0, -15000, 15000, kp, ki, kd, 100, True)
-pidgy = SimplePID(0, -15000, 15000, kp, ki, kd, 100, True)
-pidgz = SimplePID(0, -15000, 15000, kp, ki, kd, 100, True)
-
-accel_reading = mpu.get_acceleration()
-
-x_accel_reading = accel_reading[0]
-y_accel_reading = accel_reading[1]
-z_accel_reading = accel_reading[2]
-
-x_accel_avg = [0]*100
-y_accel_avg = [0]*100
-z_accel_avg = [0]*100
-
-x_accel_offset_avg = [0]*100
-y_accel_offset_avg = [0]*100
-z_accel_offset_avg = [0]*100
-
-axindex = 0
-ayindex = 0
-azindex = 0
-
-gyro_reading = mpu.get_rotation()
-
-x_gyro_reading = gyro_reading[0]
-y_gyro_reading = gyro_reading[1]
-z_gyro_reading = gyro_reading[2]
-
-x_gyro_avg = [0]*100
-y_gyro_avg = [0]*100
-z_gyro_avg = [0]*100
-
-x_gyro_offset_avg = [0]*100
-y_gyro_offset_avg = [0]*100
-z_gyro_offset_avg = [0]*100
-
-gxindex = 0
-gyindex = 0
-gzindex = 0
+NumPy is optional; without it the same buffer is averaged in pure Python.
+"""
+import sys
+import time
+from array import array
+from pathlib import Path
 
 try:
-    while True:
-        accel_reading = mpu.get_acceleration()
-        x_accel_reading = accel_reading[0]
-        y_accel_reading = accel_reading[1]
-        z_accel_reading = accel_reading[2]
-
-        gyro_reading = mpu.get_rotation()
-        x_gyro_reading = gyro_reading[0]
-        y_gyro_reading = gyro_reading[1]
-        z_gyro_reading = gyro_reading[2]
-
-        if pidax.check_time():
-            x_accel_offset = pidax.get_output_value(x_accel_reading)
-
-            mpu.set_x_accel_offset(int(x_accel_offset))
-
-            x_accel_avg[axindex] = x_accel_reading
-            x_accel_offset_avg[axindex] = x_accel_offset
-
-            axindex += 1
-            if axindex == len(x_accel_avg):
-                axindex = 0
-                print('x_avg_read: ' +
-                      str(avg_from_array(x_accel_avg)) +
-                      ' x_avg_offset: ' +
-                      str(avg_from_array(x_accel_offset_avg)))
-                print('y_avg_read: ' +
-                      str(avg_from_array(y_accel_avg)) +
-                      ' y_avg_offset: ' +
-                      str(avg_from_array(y_accel_offset_avg)))
-                print('z_avg_read: ' +
-                      str(avg_from_array(z_accel_avg)) +
-                      ' z_avg_offset: ' +
-                      str(avg_from_array(z_accel_offset_avg)))
-
-        if piday.check_time():
-            y_accel_offset = piday.get_output_value(y_accel_reading)
-
-            mpu.set_y_accel_offset(int(y_accel_offset))
-
-            y_accel_avg[ayindex] = y_accel_reading
-            y_accel_offset_avg[ayindex] = y_accel_offset
-
-            ayindex += 1
-            if ayindex == len(y_accel_avg):
-                ayindex = 0
-
-        if pidaz.check_time():
-            z_accel_offset = pidaz.get_output_value(z_accel_reading)
-
-            mpu.set_z_accel_offset(int(z_accel_offset))
-
-            z_accel_avg[azindex] = z_accel_reading
-            z_accel_offset_avg[azindex] = z_accel_offset
-
-            azindex += 1
-            if azindex == len(z_accel_avg):
-                azindex = 0
-
-        # Gyro calibration
-        if pidgx.check_time():
-            x_gyro_offset = pidgx.get_output_value(x_gyro_reading)
-
-            mpu.set_x_gyro_offset(int(x_gyro_offset))
-
-            x_gyro_avg[gxindex] = x_gyro_reading
-            x_gyro_offset_avg[gxindex] = x_gyro_offset
-
-            gxindex += 1
-            if gxindex == len(x_gyro_avg):
-                gxindex = 0
-                print('x_avg_read: ' +
-                      str(avg_from_array(x_gyro_avg)) +
-                      ' x_avg_offset: ' +
-                      str(avg_from_array(x_gyro_offset_avg)))
-                print('y_avg_read: ' +
-                      str(avg_from_array(y_gyro_avg)) +
-                      ' y_avg_offset: ' +
-                      str(avg_from_array(y_gyro_offset_avg)))
-                print('z_avg_read: ' +
-                      str(avg_from_array(z_gyro_avg)) +
-                      ' z_avg_offset: ' +
-                      str(avg_from_array(z_gyro_offset_avg)))
-
-        if pidgy.check_time():
-            y_gyro_offset = pidgy.get_output_value(y_gyro_reading)
-
-            mpu.set_y_gyro_offset(int(y_gyro_offset))
-
-            y_gyro_avg[gyindex] = y_gyro_reading
-            y_gyro_offset_avg[gyindex] = y_gyro_offset
-
-            gyindex += 1
-            if gyindex == len(y_gyro_avg):
-                gyindex = 0
-
-        if pidgz.check_time():
-            z_gyro_offset = pidgz.get_output_value(z_gyro_reading)
-
-            mpu.set_z_gyro_offset(int(z_gyro_offset))
-
-            z_gyro_avg[gzindex] = z_gyro_reading
-            z_gyro_offset_avg[gzindex] = z_gyro_offset
-
-            gzindex += 1
-            if gzindex == len(z_gyro_avg):
-                gzindex = 0
-
-except KeyboardInterrupt:
-    pass
+    import numpy as np
+except ImportError:
+    np = None
+
+OFFSETS_SECTION = "GSG_OFFSETS"
+AXES = ("X_ACCEL", "Y_ACCEL", "Z_ACCEL", "X_GYRO", "Y_GYRO", "Z_GYRO")
+# Raw readings at rest (+-2 g, +-250 deg/s): 0 g on x/y, 1 g = 16384 LSB on z, no rotation
+TARGET = (0, 0, 16384, 0, 0, 0)
+# Reading LSB per offset register LSB: accel offsets are in +-16 g units, gyro offsets in +-1000 deg/s units
+OFFSET_SCALE = (8, 8, 8, 4, 4, 4)
+# Done once every axis averages within this many reading LSB of its target (0.5 mg, 0.02 deg/s);
+# one offset LSB moves the reading by OFFSET_SCALE, so a tolerance under half of that is unreachable
+TOLERANCE = (8, 8, 8, 3, 3, 3)
+
+# get_motion_raw columns: ax ay az temp gx gy gz
+_COLUMNS = (0, 1, 2, 4, 5, 6)
+_RAW_WIDTH = 7
+
+
+def collect_samples(mpu, count, settle=50):
+    """`count` raw 14-byte bursts in one flat int16 buffer, `_RAW_WIDTH` values per sample.
+
+    The first `settle` samples are read and dropped, so readings still
+    filtered from before an offset change do not count.
+    """
+    for _ in range(settle):
+        mpu.get_motion_raw()
+    buffer = array('h')
+    for _ in range(count):
+        buffer.extend(mpu.get_motion_raw())
+    return buffer
+
+
+def mean_readings(buffer):
+    """Per-axis means (ax ay az gx gy gz) of a collect_samples buffer."""
+    if np is not None:
+        samples = np.frombuffer(buffer, dtype=np.int16).reshape(-1, _RAW_WIDTH)
+        return samples[:, _COLUMNS].mean(axis=0)
+    count = len(buffer) // _RAW_WIDTH
+    return [sum(buffer[column::_RAW_WIDTH]) / count for column in _COLUMNS]
+
+
+def _step(offsets, means):
+    """(new offsets, converged) for one set of means, all six axes together."""
+    if np is not None:
+        errors = np.asarray(means, dtype=np.float64) - TARGET
+        converged = bool(np.all(np.abs(errors) <= TOLERANCE))
+        updated = np.clip(np.rint(np.asarray(offsets) - errors / OFFSET_SCALE), -32768, 32767)
+        return [int(value) for value in updated], converged
+
+    errors = [mean - target for mean, target in zip(means, TARGET)]
+    converged = all(abs(error) <= tolerance for error, tolerance in zip(errors, TOLERANCE))
+    updated = [min(32767, max(-32768, round(offset - error / scale)))
+               for offset, error, scale in zip(offsets, errors, OFFSET_SCALE)]
+    return updated, converged
+
+
+def apply_offsets(mpu, offsets):
+    mpu.set_accel_offsets(*offsets[:3])
+    mpu.set_gyro_offsets(*offsets[3:])
+
+
+def calibrate(mpu, samples=500, max_iterations=10, settle=50, verbose=False):
+    """Returns (offsets, iterations, converged); offsets are ordered as AXES.
+
+    Starts from the offsets already in the chip (the factory accel trim), so
+    a sensor that is nearly right converges in one iteration.
+    """
+    offsets = mpu.get_accel_offsets() + mpu.get_gyro_offsets()
+    for iteration in range(1, max_iterations + 1):
+        means = mean_readings(collect_samples(mpu, samples, settle))
+        new_offsets, converged = _step(offsets, means)
+        if verbose:
+            print(f"[GSG CAL] iteration {iteration}: means "
+                  + " ".join(f"{mean:.1f}" for mean in means)
+                  + " offsets " + " ".join(str(offset) for offset in offsets))
+        if converged:
+            return offsets, iteration, True
+        offsets = new_offsets
+        apply_offsets(mpu, offsets)
+    return offsets, max_iterations, False
+
+
+def load_offsets(config):
+    """Offsets saved by calibrate, ordered as AXES, or None if the section is incomplete."""
+    offsets = [config.get_value(OFFSETS_SECTION, axis, None, int) for axis in AXES]
+    if any(offset is None for offset in offsets):
+        return None
+    return offsets
+
+
+def save_offsets(config, offsets):
+    config.set_values(OFFSETS_SECTION, dict(zip(AXES, offsets)))
+
+
+def main(argv):
+    config_file = argv[1] if len(argv) > 1 else BASE_DIR / "config" / "pi2_config.ini"
+    config = Config(str(config_file))
+
+    mpu = MPU6050()
+    start = time.monotonic()
+    offsets, iterations, converged = calibrate(mpu, verbose=True)
+    elapsed = time.monotonic() - start
+
+    if not converged:
+        print(f"[GSG CAL] No convergence after {iterations} iterations; is the sensor flat and still?")
+        return 1
+    save_offsets(config, offsets)
+    print(f"[GSG CAL] {iterations} iterations in {elapsed:.1f} s, saved to {config_file}: "
+          + ", ".join(f"{axis}={offset}" for axis, offset in zip(AXES, offsets)))
+    return 0
+
+
+if __name__ == "__main__":
+    # The driver is imported by bare name, as next to this file on the Pi; Config lives in smart-home-system/
+    BASE_DIR = Path(__file__).resolve().parents[2]
+    sys.path.insert(0, str(BASE_DIR))
+    from MPU6050 import MPU6050
+    from config.config import Config
+    sys.exit(main(sys.argv))
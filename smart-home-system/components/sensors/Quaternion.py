@@ -49,10 +49,8 @@ from math import sqrt
 
 
 class Quaternion:
-    w = 0.0
-    x = 0.0
-    y = 0.0
-    z = 0.0
+    # One of these is made per DMP packet; no per-instance __dict__
+    __slots__ = ('w', 'x', 'y', 'z')
 
     def __init__(self, a_w=1.0, a_x=0.0, a_y=0.0, a_z=0.0):
         self.w = a_w
@@ -97,9 +95,7 @@ class Quaternion:
 
 
 class XYZVector:
-    x = 0.0
-    y = 0.0
-    z = 0.0
+    __slots__ = ('x', 'y', 'z')
 
     def __init__(self, a_x=0.0, a_y=0.0, a_z=0.0):
         self.x = a_x
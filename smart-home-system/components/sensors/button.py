@@ -1,6 +1,8 @@
 import random
 import time
 
+from components.sensors.edge_detect import run_level_edge_loop
+
 try:
     import RPi.GPIO as GPIO  # type: ignore
     RUNNING_ON_PI = True
@@ -28,16 +30,27 @@ class Button:
             self.value = GPIO.input(self.gpio_pin)
         return self.value
 
-def run_button_loop(button_sensor, delay, callback, stop_event):
+def button_step(button_sensor, callback, reporter=None):
+    """One poll; with a ChangeReporter only transitions and heartbeats are sent."""
+    value = button_sensor.read()
+
+    if value not in [button_sensor.DOOR_CLOSED, button_sensor.DOOR_OPEN]:
+        value = button_sensor.INVALID_VALUE
+
+    if reporter is None or reporter.update(value):
+        callback(value if reporter is None else reporter.state)
+
+
+def run_button_loop(button_sensor, delay, callback, stop_event, reporter=None):
     while True:
-        value = button_sensor.read()
-        
-        if value not in [button_sensor.DOOR_CLOSED, button_sensor.DOOR_OPEN]:
-            value = button_sensor.INVALID_VALUE
-            
-        callback(value)
+        button_step(button_sensor, callback, reporter)
         
         if stop_event.is_set():
             break
         
         time.sleep(delay)
+
+
+def run_button_edge_loop(button_sensor, debounce, heartbeat, callback, stop_event):
+    """Interrupt-driven variant: `callback(value, timestamp)` only on debounced edges and heartbeats."""
+    run_level_edge_loop(button_sensor, [button_sensor.DOOR_CLOSED, button_sensor.DOOR_OPEN], debounce, heartbeat, callback, stop_event)
@@ -0,0 +1,68 @@
+import time
+
+
+class ChangeReporter:
+    """Decides which polled values of a binary sensor are worth sending.
+
+    A new value only becomes the reported state after `debounce_reads`
+    consecutive identical reads. The state is reported when it changes and,
+    if `heartbeat` > 0, again every `heartbeat` seconds so the server can tell
+    a quiet sensor from a dead one. With change_only=False every read is
+    reported (the old polling behaviour).
+    """
+
+    def __init__(self, change_only=True, heartbeat=60.0, debounce_reads=1):
+        self.change_only = change_only
+        self.heartbeat = heartbeat
+        self.debounce_reads = max(1, debounce_reads)
+        self.state = None
+        self.candidate = None
+        self.candidate_reads = 0
+        self.last_report = None
+        self.reported = 0
+        self.suppressed = 0
+
+    def update(self, value, now=None):
+        """Feed one read; returns True if `self.state` should be sent now."""
+        if not self.change_only:
+            self.state = value
+            self.reported += 1
+            return True
+
+        if now is None:
+            now = time.monotonic()
+
+        if value == self.state:
+            self.candidate = None
+            self.candidate_reads = 0
+        else:
+            if value == self.candidate:
+                self.candidate_reads += 1
+            else:
+                self.candidate = value
+                self.candidate_reads = 1
+            # The first read after start is taken as the initial state right away.
+            if self.state is None or self.candidate_reads >= self.debounce_reads:
+                self.state = value
+                self.candidate = None
+                self.candidate_reads = 0
+                self.last_report = now
+                self.reported += 1
+                return True
+
+        if self.heartbeat > 0 and now - self.last_report >= self.heartbeat:
+            self.last_report = now
+            self.reported += 1
+            return True
+
+        self.suppressed += 1
+        return False
+
+    @classmethod
+    def from_config(cls, config, debounce_key):
+        """Build from [SENSOR_CONFIG] CHANGE_ONLY / HEARTBEAT_INTERVAL / `debounce_key`."""
+        return cls(
+            change_only=config.get_value("SENSOR_CONFIG", "CHANGE_ONLY", False, bool),
+            heartbeat=config.get_value("SENSOR_CONFIG", "HEARTBEAT_INTERVAL", 60.0, float),
+            debounce_reads=config.get_value("SENSOR_CONFIG", debounce_key, 1, int),
+        )
@@ -1,3 +1,4 @@
+import threading
 import time
 import random
 
@@ -16,86 +17,210 @@ class DHT:
     DHTLIB_INVALID_VALUE = -999
 
     DHT11_WAKEUP = 0.020
-    DHTLIB_TIMEOUT = 0.0001
+    # A whole frame (response + 40 bits) takes ~5 ms; give up after this much silence.
+    CAPTURE_WINDOW_NS = 10_000_000
+    # Edges in a full frame: host release + response (3) + 40 bits x 2 + trailing low
+    MAX_EDGES = 90
+    # '0' is ~26-28 us high, '1' ~70 us; used when a frame has no spread to adapt to.
+    BIT_THRESHOLD_NS = 50_000
+    MIN_SPREAD_NS = 20_000
 
-    def __init__(self, gpio_pin, simulate=False):
+    # DHT11 delivers at most one fresh sample per second.
+    MIN_INTERVAL = 1.0
+
+    # Plausible range (DHT11 and DHT22); anything outside is a bad read.
+    HUMIDITY_RANGE = (0.0, 100.0)
+    TEMPERATURE_RANGE = (-40.0, 80.0)
+
+    def __init__(self, gpio_pin, simulate=False, retries=2, retry_backoff=0.1):
         self.gpio_pin = gpio_pin
         self.simulate = simulate
         self.humidity = self.DHTLIB_INVALID_VALUE
         self.temperature = self.DHTLIB_INVALID_VALUE
         self.bits = [0, 0, 0, 0, 0]
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.last_edges = []
+        self.lock = threading.Lock()
+        self.cached = None
+        self.cached_at = None
+
+        self.reads = 0
+        self.successes = 0
+        self.attempts = 0
+        self.failures = {self.DHTLIB_ERROR_CHECKSUM: 0, self.DHTLIB_ERROR_TIMEOUT: 0}
 
         if not simulate:
             GPIO.setup(self.gpio_pin, GPIO.OUT)
             GPIO.output(self.gpio_pin, GPIO.HIGH)
             time.sleep(0.2)
 
-    def _read_sensor(self):
-        mask = 0x80
-        idx = 0
+    def _capture(self):
+        """Send the start signal and record (level, perf_counter_ns) at every edge.
+
+        Nothing is timed while capturing; the loop only notes level changes, so
+        a preempted iteration shifts one timestamp instead of aborting the read.
+        """
+        pin = self.gpio_pin
+        read = GPIO.input
+        clock = time.perf_counter_ns
+
+        GPIO.setup(pin, GPIO.OUT)
+        GPIO.output(pin, GPIO.LOW)
+        time.sleep(self.DHT11_WAKEUP)
+        GPIO.output(pin, GPIO.HIGH)
+        GPIO.setup(pin, GPIO.IN)
+
+        last = read(pin)
+        now = clock()
+        edges = [(last, now)]
+        deadline = now + self.CAPTURE_WINDOW_NS
+        while len(edges) < self.MAX_EDGES:
+            level = read(pin)
+            now = clock()
+            if level != last:
+                edges.append((level, now))
+                last = level
+            elif now > deadline:
+                break
+
+        GPIO.setup(pin, GPIO.OUT)
+        GPIO.output(pin, GPIO.HIGH)
+        return edges
+
+    def _decode(self, edges):
+        """Classify the recorded high pulses into 40 bits and verify the checksum."""
+        highs = [
+            edges[i + 1][1] - edges[i][1]
+            for i in range(len(edges) - 1)
+            if edges[i][0] == 1
+        ]
+        # Data bits are the last 40 complete high pulses; earlier ones are the
+        # host release and the sensor's 80 us response.
+        if len(highs) < 40:
+            return self.DHTLIB_ERROR_TIMEOUT
+        highs = highs[-40:]
+
+        shortest, longest = min(highs), max(highs)
+        if longest - shortest >= self.MIN_SPREAD_NS:
+            threshold = (shortest + longest) // 2
+        else:
+            threshold = self.BIT_THRESHOLD_NS
+
         self.bits = [0, 0, 0, 0, 0]
+        for i, width in enumerate(highs):
+            if width > threshold:
+                self.bits[i // 8] |= 0x80 >> (i % 8)
+
+        if self.bits[4] != (self.bits[0] + self.bits[1] + self.bits[2] + self.bits[3]) & 0xFF:
+            return self.DHTLIB_ERROR_CHECKSUM
+        return self.DHTLIB_OK
 
+    def _read_sensor(self):
         if self.simulate:
             self.humidity = round(random.uniform(30.0, 70.0), 1)
             self.temperature = round(random.uniform(20.0, 30.0), 1)
             return self.DHTLIB_OK
 
         try:
-            GPIO.setup(self.gpio_pin, GPIO.OUT)
-            GPIO.output(self.gpio_pin, GPIO.LOW)
-            time.sleep(self.DHT11_WAKEUP)
-            GPIO.output(self.gpio_pin, GPIO.HIGH)
-            GPIO.setup(self.gpio_pin, GPIO.IN)
-
-            t0 = time.time()
-            while GPIO.input(self.gpio_pin) == 0:
-                if (time.time() - t0) > self.DHTLIB_TIMEOUT:
-                    return self.DHTLIB_ERROR_TIMEOUT
-
-            t0 = time.time()
-            while GPIO.input(self.gpio_pin) == 1:
-                if (time.time() - t0) > self.DHTLIB_TIMEOUT:
-                    return self.DHTLIB_ERROR_TIMEOUT
-
-            for i in range(40):
-                t0 = time.time()
-                while GPIO.input(self.gpio_pin) == 0:
-                    if (time.time() - t0) > self.DHTLIB_TIMEOUT:
-                        return self.DHTLIB_ERROR_TIMEOUT
-                t0 = time.time()
-                while GPIO.input(self.gpio_pin) == 1:
-                    if (time.time() - t0) > self.DHTLIB_TIMEOUT:
-                        return self.DHTLIB_ERROR_TIMEOUT
-                if (time.time() - t0) > 0.00005:
-                    self.bits[idx] |= mask
-                mask >>= 1
-                if mask == 0:
-                    mask = 0x80
-                    idx += 1
-
-            GPIO.setup(self.gpio_pin, GPIO.OUT)
-            GPIO.output(self.gpio_pin, GPIO.HIGH)
-            return self.DHTLIB_OK
-
+            self.last_edges = self._capture()
         except Exception:
             return self.DHTLIB_ERROR_TIMEOUT
+        code = self._decode(self.last_edges)
+        if code == self.DHTLIB_OK:
+            self.humidity = self.bits[0]
+            self.temperature = self.bits[2] + self.bits[3] * 0.1
+        return code
 
     def read(self):
-        code = self._read_sensor()
+        """Read with up to `retries` retries, backing off but staying inside MIN_INTERVAL."""
+        self.reads += 1
+        started = time.monotonic()
+        backoff = self.retry_backoff
+        attempt = 0
+        while True:
+            self.attempts += 1
+            code = self._read_sensor()
+            if code == self.DHTLIB_OK:
+                self.successes += 1
+                return self.humidity, self.temperature, code
 
-        if code != self.DHTLIB_OK:
-            self.humidity = self.DHTLIB_INVALID_VALUE
-            self.temperature = self.DHTLIB_INVALID_VALUE
-            return self.humidity, self.temperature, code
+            self.failures[code] = self.failures.get(code, 0) + 1
+            attempt += 1
+            if attempt > self.retries or time.monotonic() - started + backoff >= self.MIN_INTERVAL:
+                break
+            time.sleep(backoff)
+            backoff *= 2
 
-        if not self.simulate:
-            self.humidity = self.bits[0]
-            self.temperature = self.bits[2] + self.bits[3] * 0.1
-            sumChk = (self.bits[0] + self.bits[1] + self.bits[2] + self.bits[3]) & 0xFF
-            if self.bits[4] != sumChk:
-                return self.humidity, self.temperature, self.DHTLIB_ERROR_CHECKSUM
+        self.humidity = self.DHTLIB_INVALID_VALUE
+        self.temperature = self.DHTLIB_INVALID_VALUE
+        return self.humidity, self.temperature, code
+
+    def read_cached(self):
+        """read(), but never more often than MIN_INTERVAL: callers inside it share the last result."""
+        with self.lock:
+            now = time.monotonic()
+            if self.cached is None or now - self.cached_at >= self.MIN_INTERVAL:
+                self.cached = self.read()
+                self.cached_at = time.monotonic()
+            return self.cached
+
+    def is_valid(self, humidity, temperature, code):
+        return (
+            code == self.DHTLIB_OK
+            and self.HUMIDITY_RANGE[0] <= humidity <= self.HUMIDITY_RANGE[1]
+            and self.TEMPERATURE_RANGE[0] <= temperature <= self.TEMPERATURE_RANGE[1]
+        )
+
+    def get_stats(self):
+        return {
+            "reads": self.reads,
+            "attempts": self.attempts,
+            "success_rate": self.successes / self.reads if self.reads else 0.0,
+            "attempt_success_rate": self.successes / self.attempts if self.attempts else 0.0,
+            "checksum_errors": self.failures.get(self.DHTLIB_ERROR_CHECKSUM, 0),
+            "timeouts": self.failures.get(self.DHTLIB_ERROR_TIMEOUT, 0),
+        }
+
+
+def dht_waveform(data, jitter_us=0.0, rng=None):
+    """Pulses [(level, duration_us), ...] a DHT sends for the 5 bytes in `data`.
+
+    Meant for MockGPIO.load_waveform; `jitter_us` adds uniform noise to every
+    pulse to imitate a loaded system.
+    """
+    rng = rng or random.Random()
 
-        return self.humidity, self.temperature, self.DHTLIB_OK
+    def pulse(level, us):
+        return level, max(1.0, us + rng.uniform(-jitter_us, jitter_us))
+
+    pulses = [pulse(1, 30), pulse(0, 80), pulse(1, 80)]
+    for byte in data:
+        for bit in range(7, -1, -1):
+            pulses.append(pulse(0, 50))
+            pulses.append(pulse(1, 70 if byte >> bit & 1 else 27))
+    pulses.append(pulse(0, 50))
+    return pulses
+
+
+def edges_to_waveform(edges):
+    """Turn a capture (DHT.last_edges) back into pulses, to replay a recorded read."""
+    return [
+        (edges[i][0], (edges[i + 1][1] - edges[i][1]) / 1000.0)
+        for i in range(len(edges) - 1)
+    ]
+
+
+def waveform_to_edges(pulses, start_ns=0):
+    """Edges as DHT._capture records them for `pulses`, to feed DHT._decode without the GPIO."""
+    edges = []
+    now = start_ns
+    for level, us in pulses:
+        edges.append((level, round(now)))
+        now += us * 1000
+    # After the last pulse the line is pulled back up
+    edges.append((1 - pulses[-1][0], round(now)))
+    return edges
 
 
 def parseCheckCode(code):
@@ -109,10 +234,23 @@ def parseCheckCode(code):
         return "DHTLIB_INVALID_VALUE"
 
 
-def run_dht_loop(sensor, delay, callback, stop_event):
-    while True:
-        humidity, temperature, code = sensor.read()
+def dht_step(sensor, callback, validator=None):
+    """One read; with a ReadingValidator failed reads are dropped or replaced by the held value."""
+    humidity, temperature, code = sensor.read_cached()
+    if validator is None:
         callback(humidity, temperature, parseCheckCode(code))
+        return
+
+    result = validator.check((humidity, temperature) if sensor.is_valid(humidity, temperature, code) else None)
+    if result is None:
+        return
+    (humidity, temperature), quality = result
+    callback(humidity, temperature, parseCheckCode(code), quality)
+
+
+def run_dht_loop(sensor, delay, callback, stop_event, validator=None):
+    while True:
+        dht_step(sensor, callback, validator)
         
         if stop_event.is_set():
             break
@@ -0,0 +1,69 @@
+"""Batch decoding of MPU6050 DMP FIFO packets with NumPy.
+
+NumPy is optional: without it HAVE_NUMPY is False and callers keep using the
+per-packet MPU6050.DMP_get_* methods.
+"""
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+DMP_PACKET_SIZE = 42
+QUAT_LSB = 16384.0
+# DMP accel LSB per g, as used by MPU6050.DMP_get_linear_accel
+ACCEL_LSB = 8192.0
+
+
+def decode_dmp_packets(data, packet_size=DMP_PACKET_SIZE):
+    """Decode N DMP packets in one pass.
+
+    `data` is an (N x packet_size) uint8 array or the raw FIFO bytes of N
+    whole packets. Returns a dict of float64 arrays, one row per packet,
+    holding what the per-packet MPU6050 methods compute:
+
+      quaternion      N x 4  w, x, y, z (DMP_get_quaternion)
+      accel, gyro     N x 3  raw int16 values (DMP_get_acceleration_int16 / DMP_get_gyro_int16)
+      gravity         N x 3  unit vector (DMP_get_gravity)
+      linear_accel    N x 3  accel LSB (DMP_get_linear_accel)
+      roll_pitch_yaw  N x 3  degrees (DMP_get_euler_roll_pitch_yaw)
+    """
+    if np is None:
+        raise RuntimeError("decode_dmp_packets needs numpy")
+
+    if isinstance(data, np.ndarray):
+        raw = np.ascontiguousarray(data, dtype=np.uint8).reshape(-1)
+    else:
+        raw = np.frombuffer(data, dtype=np.uint8)
+    # Every value is a big-endian int16 at an even offset, so view the packets as words
+    words = raw.view('>i2').reshape(-1, packet_size // 2)
+
+    quat = words[:, 0:8:2] / QUAT_LSB        # bytes 0, 4, 8, 12
+    gyro = words[:, 8:14:2].astype(np.float64)   # bytes 16, 20, 24
+    accel = words[:, 14:20:2].astype(np.float64)  # bytes 28, 32, 36
+    w, x, y, z = quat.T
+
+    gravity = np.empty_like(accel)
+    gravity[:, 0] = 2.0 * (x * z - w * y)
+    gravity[:, 1] = 2.0 * (w * x + y * z)
+    gravity[:, 2] = w * w - x * x - y * y + z * z
+    gx, gy, gz = gravity.T
+
+    linear_accel = accel - gravity * ACCEL_LSB
+
+    # atan(a / b) with b = sqrt(...) >= 0 is atan2(a, b), which also copes with b == 0
+    roll_pitch_yaw = np.empty_like(accel)
+    roll_pitch_yaw[:, 0] = np.arctan2(gy, np.sqrt(gx * gx + gz * gz))
+    roll_pitch_yaw[:, 1] = np.arctan2(gx, np.sqrt(gy * gy + gz * gz))
+    roll_pitch_yaw[:, 2] = np.arctan2(2 * x * y - 2 * w * z, 2 * w * w + 2 * x * x - 1)
+    np.degrees(roll_pitch_yaw, out=roll_pitch_yaw)
+
+    return {
+        "quaternion": quat,
+        "accel": accel,
+        "gyro": gyro,
+        "gravity": gravity,
+        "linear_accel": linear_accel,
+        "roll_pitch_yaw": roll_pitch_yaw,
+    }
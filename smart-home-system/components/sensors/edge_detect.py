@@ -0,0 +1,148 @@
+import threading
+import time
+
+try:
+    import RPi.GPIO as GPIO  # type: ignore
+    RUNNING_ON_PI = True
+except ImportError:
+    from mock_rpi import GPIO
+    RUNNING_ON_PI = False
+
+
+class EdgeWatcher:
+    """Calls `on_settled(timestamp)` once the pins are quiet for `debounce` s after an edge.
+
+    Edges come from GPIO.add_event_detect, so nothing is polled. A burst of
+    bounces is collapsed into a single call, and `timestamp` is the wall-clock
+    time (time.time()) of the first edge of the burst, i.e. interrupt time.
+    `on_settled` runs on the watcher's own thread, never on the GPIO callback
+    thread, so it may read pins or drive rows without blocking other edges.
+
+    With `mute_while_settling`, edges that `on_settled` causes itself (a
+    keypad scan toggling the rows) are dropped: from the start of the call
+    until `debounce` s after it returns. A real change in that window is not
+    lost: if the pin levels then differ from those before the call, it counts
+    as a new edge.
+    """
+
+    def __init__(self, pins, on_settled, debounce=0.03, edge=None, bouncetime_ms=None, mute_while_settling=False):
+        self.pins = list(pins)
+        self.on_settled = on_settled
+        self.debounce = debounce
+        self.edge = GPIO.BOTH if edge is None else edge
+        self.bouncetime_ms = bouncetime_ms
+        self.mute_while_settling = mute_while_settling
+        self.muted = False
+        self.cond = threading.Condition()
+        self.first_edge = None
+        self.deadline = 0.0
+        self.running = False
+        self.edges = 0
+        self.settled = 0
+        self.muted_edges = 0
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+        for pin in self.pins:
+            if self.bouncetime_ms:
+                GPIO.add_event_detect(pin, self.edge, callback=self._on_edge, bouncetime=self.bouncetime_ms)
+            else:
+                GPIO.add_event_detect(pin, self.edge, callback=self._on_edge)
+
+    def stop(self):
+        for pin in self.pins:
+            GPIO.remove_event_detect(pin)
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def _on_edge(self, channel):
+        now = time.time()
+        with self.cond:
+            if self.muted:
+                self.muted_edges += 1
+                return
+            self.edges += 1
+            if self.first_edge is None:
+                self.first_edge = now
+            self.deadline = time.monotonic() + self.debounce
+            self.cond.notify()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.running and self.first_edge is None:
+                    self.cond.wait()
+                # Every new edge pushes the deadline out; wait until they stop.
+                while self.running and time.monotonic() < self.deadline:
+                    self.cond.wait(self.deadline - time.monotonic())
+                if not self.running:
+                    return
+                timestamp = self.first_edge
+                self.first_edge = None
+                self.settled += 1
+                self.muted = self.mute_while_settling
+            levels = self._levels() if self.mute_while_settling else None
+            try:
+                self.on_settled(timestamp)
+            except Exception as e:
+                print(f"[EDGE] Greška u obradi ivice na pinovima {self.pins}: {e}")
+            if self.mute_while_settling:
+                self._unmute(levels)
+
+    def _levels(self):
+        return [GPIO.input(pin) for pin in self.pins]
+
+    def _unmute(self, levels):
+        # Let the edges on_settled caused arrive and be dropped, then compare
+        # against the levels before it ran to catch a change that was dropped too.
+        with self.cond:
+            end = time.monotonic() + self.debounce
+            while self.running and time.monotonic() < end:
+                self.cond.wait(end - time.monotonic())
+            if not self.running:
+                return
+        changed = self._levels() != levels
+        with self.cond:
+            self.muted = False
+            if changed and self.first_edge is None:
+                self.first_edge = time.time()
+                self.deadline = time.monotonic() + self.debounce
+
+
+def run_level_edge_loop(sensor, valid_values, debounce, heartbeat, callback, stop_event, bouncetime_ms=None):
+    """Edge-driven replacement for the polling loops of single-pin sensors.
+
+    `callback(value, timestamp)` gets the level once at start, then on every
+    debounced change, plus every `heartbeat` s (0 = never) with the current state.
+    """
+    state = {"value": None}
+    lock = threading.Lock()
+
+    def read_value():
+        value = sensor.read()
+        return value if value in valid_values else sensor.INVALID_VALUE
+
+    def on_settled(timestamp):
+        value = read_value()
+        with lock:
+            if value == state["value"]:
+                return
+            state["value"] = value
+        callback(value, timestamp)
+
+    watcher = EdgeWatcher([sensor.gpio_pin], on_settled, debounce=debounce, bouncetime_ms=bouncetime_ms)
+    watcher.start()
+    on_settled(time.time())
+
+    while not stop_event.wait(heartbeat if heartbeat > 0 else None):
+        with lock:
+            value = state["value"]
+        callback(value, time.time())
+
+    watcher.stop()
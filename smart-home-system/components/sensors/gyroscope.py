@@ -1,3 +1,5 @@
+import math
+import threading
 import time
 try:
     import MPU6050 # type: ignore
@@ -5,50 +7,401 @@ try:
 except ImportError:
     RUNNING_ON_PI = False
 
+try:
+    import RPi.GPIO as GPIO  # type: ignore
+except ImportError:
+    from mock_rpi import GPIO
+
 import random
 
+from components.sensors.dmp_batch import HAVE_NUMPY, decode_dmp_packets
+from components.sensors.MPU6050_cal import apply_offsets
+
 class Gyroscope:
     INVALID_VALUE = None
+    # Register scale: accel stays at +-2 g, dmp_initialize sets the gyro to +-2000 deg/s
+    ACCEL_LSB = 16384.0
+    GYRO_LSB = 16.4
 
-    def __init__(self, simulate=False):
+    def __init__(self, simulate=False, offsets=None):
+        """`offsets` are the calibrated X/Y/Z accel and X/Y/Z gyro offsets from MPU6050_cal, or None."""
         self.simulate = simulate
+        self.offsets = offsets
         self.accel = [0.0, 0.0, 0.0]
         self.gyro = [0.0, 0.0, 0.0]
 
         if not simulate:
             self.mpu = MPU6050.MPU6050()
             self.mpu.dmp_initialize()
+            # dmp_initialize resets the chip, which drops any offsets written before it
+            if offsets is not None:
+                apply_offsets(self.mpu, offsets)
         else:
             self.mpu = None
 
     def read(self):
         if self.simulate:
-            self.accel = [round(random.uniform(-1, 1), 2) for _ in range(3)]
-            self.gyro = [round(random.uniform(-250, 250), 2) for _ in range(3)]
+            # At rest: ~1 g on z plus noise; test_gsg_movement_alarm covers tampering
+            self.accel = [round(random.uniform(-0.05, 0.05), 2) for _ in range(2)]
+            self.accel.append(round(1.0 + random.uniform(-0.05, 0.05), 2))
+            self.gyro = [round(random.uniform(-2, 2), 2) for _ in range(3)]
         else:
             try:
-                raw_accel = self.mpu.get_acceleration()
-                raw_gyro = self.mpu.get_rotation()
-                self.accel = [v / 16384.0 for v in raw_accel]
-                self.gyro = [v / 131.0 for v in raw_gyro]
+                # One burst for accel+temp+gyro, so both come from the same sample
+                ax, ay, az, _, gx, gy, gz = self.mpu.get_motion_raw()
+                self.accel = [ax / self.ACCEL_LSB, ay / self.ACCEL_LSB, az / self.ACCEL_LSB]
+                self.gyro = [gx / self.GYRO_LSB, gy / self.GYRO_LSB, gz / self.GYRO_LSB]
             except Exception:
                 self.accel = [0.0, 0.0, 0.0]
                 self.gyro = [0.0, 0.0, 0.0]
         return self.accel, self.gyro
 
 
-def run_gyro_loop(sensor, delay, callback, stop_event):
-    while True:
-        accel, gyro = sensor.read()
-        payload = {
-            "accel_x": accel[0],
-            "accel_y": accel[1],
-            "accel_z": accel[2],
-            "gyro_x": gyro[0],
-            "gyro_y": gyro[1],
-            "gyro_z": gyro[2]
+class DMPStream:
+    """Interrupt-driven DMP pipeline for a real MPU6050.
+
+    While the sensor is still only the chip's motion interrupt (MOT_THR /
+    MOT_DUR) is enabled and the thread sleeps on the INT pin, taking one
+    register sample every `heartbeat` s so window summaries keep coming. A
+    motion interrupt switches to streaming: the FIFO is reset, the DMP
+    interrupt is enabled and every complete packet is drained at the DMP's
+    own rate and turned into quaternion, gravity and linear acceleration.
+    Streaming ends `active_hold` s after the last motion interrupt.
+    """
+
+    # INT_ENABLE / INT_STATUS bits
+    INT_MOT = 0x40
+    INT_FIFO_OFLOW = 0x10
+    INT_DMP = 0x02
+    FIFO_SIZE = 1024
+    # Accel high-pass filter at 5 Hz, so gravity alone never trips the motion interrupt
+    DHPF_5HZ = 0x01
+    # DMP packet scaling: accel in LSB per g, gyro in LSB per deg/s (the same full scale as
+    # Gyroscope.read, so heartbeats and packets feed the aggregator in the same units)
+    ACCEL_LSB = 8192.0
+    GYRO_LSB = Gyroscope.GYRO_LSB
+    # Below this many packets per drain the per-packet path is faster than NumPy
+    BATCH_MIN_PACKETS = 8
+
+    def __init__(self, sensor, int_pin, motion_threshold=20, motion_duration=5, active_hold=2.0, heartbeat=1.0):
+        self.sensor = sensor
+        self.mpu = sensor.mpu
+        self.int_pin = int_pin
+        self.motion_threshold = motion_threshold
+        self.motion_duration = motion_duration
+        self.active_hold = active_hold
+        self.heartbeat = heartbeat
+        self.packet_size = 42
+        self.wake = threading.Event()
+        self.int_at = 0.0
+        self.motion_at = 0.0  # int_at of the motion interrupt that started streaming
+        self.streaming = False
+        self.quaternion = None
+        self.gravity = None
+        self.linear_accel = None
+
+        self.interrupts = 0
+        self.activations = 0
+        self.packets = 0
+        self.overflows = 0
+        self.heartbeats = 0
+        self.i2c_errors = 0
+        self.wake_latency_ms = None  # motion interrupt -> first processed packet, last activation
+
+    def start(self):
+        self.mpu.set_motion_detection_threshold(self.motion_threshold)
+        self.mpu.set_motion_detection_duration(self.motion_duration)
+        self.mpu.set_DHPF_mode(self.DHPF_5HZ)
+        self.packet_size = self.mpu.DMP_get_FIFO_packet_size() or self.packet_size
+        self.mpu.set_DMP_enabled(True)
+        self.mpu.set_int_enable(self.INT_MOT)
+        self.mpu.get_int_status()
+        GPIO.setup(self.int_pin, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+        GPIO.add_event_detect(self.int_pin, GPIO.RISING, callback=self._on_int)
+
+    def stop(self):
+        GPIO.remove_event_detect(self.int_pin)
+        self.mpu.set_int_enable(0)
+        self.mpu.set_DMP_enabled(False)
+
+    def _on_int(self, channel):
+        self.interrupts += 1
+        self.int_at = time.monotonic()
+        self.wake.set()
+
+    def _go_idle(self):
+        self.streaming = False
+        self.mpu.set_int_enable(self.INT_MOT)
+
+    def _go_streaming(self):
+        self.streaming = True
+        self.activations += 1
+        self.wake_latency_ms = None
+        # Only INT_MOT is enabled while idle, so this wake was the motion interrupt;
+        # once INT_DMP is on, every data interrupt overwrites int_at
+        self.motion_at = self.int_at
+        self.mpu.reset_FIFO()
+        self.mpu.set_int_enable(self.INT_MOT | self.INT_DMP)
+
+    def _process(self, packet):
+        mpu = self.mpu
+        quat = mpu.DMP_get_quaternion(packet)
+        gravity = mpu.DMP_get_gravity(quat)
+        accel = mpu.DMP_get_acceleration_int16(packet)
+        linear = mpu.DMP_get_linear_accel(accel, gravity)
+        gyro = mpu.DMP_get_gyro_int16(packet)
+        self.quaternion, self.gravity, self.linear_accel = quat, gravity, linear
+        return {
+            "accel_x": accel.x / self.ACCEL_LSB,
+            "accel_y": accel.y / self.ACCEL_LSB,
+            "accel_z": accel.z / self.ACCEL_LSB,
+            "gyro_x": gyro.x / self.GYRO_LSB,
+            "gyro_y": gyro.y / self.GYRO_LSB,
+            "gyro_z": gyro.z / self.GYRO_LSB,
+            "lin_accel_x": linear.x / self.ACCEL_LSB,
+            "lin_accel_y": linear.y / self.ACCEL_LSB,
+            "lin_accel_z": linear.z / self.ACCEL_LSB,
         }
+
+    def _process_batch(self, data):
+        decoded = decode_dmp_packets(data, self.packet_size)
+        quat, gravity, linear = decoded["quaternion"][-1], decoded["gravity"][-1], decoded["linear_accel"][-1]
+        self.quaternion = MPU6050.Q(*quat.tolist())
+        self.gravity = MPU6050.V(*gravity.tolist())
+        self.linear_accel = MPU6050.V(*linear.tolist())
+        accel = (decoded["accel"] / self.ACCEL_LSB).tolist()
+        gyro = (decoded["gyro"] / self.GYRO_LSB).tolist()
+        linear = (decoded["linear_accel"] / self.ACCEL_LSB).tolist()
+        return [
+            {
+                "accel_x": a[0], "accel_y": a[1], "accel_z": a[2],
+                "gyro_x": g[0], "gyro_y": g[1], "gyro_z": g[2],
+                "lin_accel_x": l[0], "lin_accel_y": l[1], "lin_accel_z": l[2],
+            }
+            for a, g, l in zip(accel, gyro, linear)
+        ]
+
+    def drain(self):
+        """All complete packets in the FIFO, as samples (oldest first)."""
+        count = self.mpu.get_FIFO_count()
+        if count >= self.FIFO_SIZE:
+            self.overflows += 1
+            self.mpu.reset_FIFO()
+            return []
+        usable = count - count % self.packet_size
+        if not usable:
+            return []
+        data = self.mpu.get_FIFO_bytes(usable)
+        if HAVE_NUMPY and usable // self.packet_size >= self.BATCH_MIN_PACKETS:
+            samples = self._process_batch(data)
+        else:
+            samples = [self._process(data[i:i + self.packet_size]) for i in range(0, usable, self.packet_size)]
+        self.packets += len(samples)
+        if self.wake_latency_ms is None:
+            self.wake_latency_ms = (time.monotonic() - self.motion_at) * 1000.0
+        return samples
+
+    def _recover(self):
+        """After an I2C error: drop back to idle with an empty FIFO, if the bus lets us."""
+        self.streaming = False
+        try:
+            self.mpu.reset_FIFO()
+            self.mpu.set_int_enable(self.INT_MOT)
+            self.mpu.get_int_status()
+        except OSError:
+            pass
+
+    def run(self, on_sample, stop_event):
+        """Deliver samples to `on_sample(payload)` until stop_event is set.
+
+        An I2C error (OSError, e.g. errno 121) costs one iteration, not the
+        thread: it is counted in i2c_errors, the stream drops back to idle
+        and tries again after `heartbeat` s. start() is retried the same way.
+        """
+        started = False
+        active_until = 0.0
+        try:
+            while not stop_event.is_set():
+                try:
+                    if not started:
+                        self.start()
+                        started = True
+                    if self.streaming and time.monotonic() >= active_until:
+                        self._go_idle()
+
+                    # Streaming: the DMP interrupt comes every few ms, the timeout only covers a missed edge
+                    woke = self.wake.wait(0.05 if self.streaming else self.heartbeat)
+                    self.wake.clear()
+                    if not woke and not self.streaming:
+                        self.heartbeats += 1
+                        accel, gyro = self.sensor.read()
+                        on_sample(_sample_payload(accel, gyro))
+                        continue
+
+                    status = self.mpu.get_int_status()  # reading clears it
+                    if status & self.INT_MOT:
+                        if not self.streaming:
+                            self._go_streaming()
+                        active_until = time.monotonic() + self.active_hold
+                    if not self.streaming:
+                        continue
+                    if status & self.INT_FIFO_OFLOW:
+                        self.overflows += 1
+                        self.mpu.reset_FIFO()
+                        continue
+                    for sample in self.drain():
+                        on_sample(sample)
+                except OSError as e:
+                    self.i2c_errors += 1
+                    print(f"[GSG] I2C greška: {e}")
+                    if started:
+                        self._recover()
+                    stop_event.wait(self.heartbeat)
+        finally:
+            if started:
+                try:
+                    self.stop()
+                except OSError as e:
+                    print(f"[GSG] I2C greška pri zaustavljanju: {e}")
+
+    def get_stats(self):
+        return {
+            "interrupts": self.interrupts,
+            "activations": self.activations,
+            "packets": self.packets,
+            "overflows": self.overflows,
+            "heartbeats": self.heartbeats,
+            "i2c_errors": self.i2c_errors,
+            "streaming": self.streaming,
+            "wake_latency_ms": self.wake_latency_ms,
+        }
+
+
+class GyroAggregator:
+    """Reduces gyroscope samples to one summary per window.
+
+    The summary carries per-axis min/max/mean/RMS and the peak (and lowest)
+    acceleration magnitude. Samples whose magnitude leaves
+    [tamper_low, tamper_high] g are handed back immediately, so the server's
+    tamper check still sees every suspicious movement.
+    """
+
+    AXES = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+    def __init__(self, window, tamper_low=0.5, tamper_high=1.5):
+        self.window = window
+        self.tamper_low = tamper_low
+        self.tamper_high = tamper_high
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self.started = now
+        self.count = 0
+        self.min = [math.inf] * len(self.AXES)
+        self.max = [-math.inf] * len(self.AXES)
+        self.sum = [0.0] * len(self.AXES)
+        self.sumsq = [0.0] * len(self.AXES)
+        self.peak_magnitude = 0.0
+        self.min_magnitude = math.inf
+
+    def add(self, sample, now=None):
+        """Add one sample; returns (tamper_sample or None, summary or None)."""
+        if now is None:
+            now = time.monotonic()
+
+        for i, axis in enumerate(self.AXES):
+            v = sample[axis]
+            if v < self.min[i]:
+                self.min[i] = v
+            if v > self.max[i]:
+                self.max[i] = v
+            self.sum[i] += v
+            self.sumsq[i] += v * v
+        self.count += 1
+
+        ax, ay, az = sample["accel_x"], sample["accel_y"], sample["accel_z"]
+        magnitude = math.sqrt(ax * ax + ay * ay + az * az)
+        if magnitude > self.peak_magnitude:
+            self.peak_magnitude = magnitude
+        if magnitude < self.min_magnitude:
+            self.min_magnitude = magnitude
+
+        tamper = sample if magnitude > self.tamper_high or magnitude < self.tamper_low else None
+        summary = self.flush(now) if now - self.started >= self.window else None
+        return tamper, summary
+
+    def flush(self, now=None):
+        """Summary of the current window (None if it is empty); starts a new window."""
+        if now is None:
+            now = time.monotonic()
+        if not self.count:
+            self._reset(now)
+            return None
+
+        n = self.count
+        summary = {"window_s": round(now - self.started, 3), "samples": n}
+        for i, axis in enumerate(self.AXES):
+            summary[f"{axis}_min"] = round(self.min[i], 4)
+            summary[f"{axis}_max"] = round(self.max[i], 4)
+            summary[f"{axis}_mean"] = round(self.sum[i] / n, 4)
+            summary[f"{axis}_rms"] = round(math.sqrt(self.sumsq[i] / n), 4)
+        summary["peak_magnitude"] = round(self.peak_magnitude, 4)
+        summary["min_magnitude"] = round(self.min_magnitude, 4)
+        self._reset(now)
+        return summary
+
+
+def gyro_step(sensor, callback, aggregator=None, summary_callback=None):
+    """Read one sample.
+
+    Without an aggregator every sample goes to `callback`. With one, only
+    tamper samples go to `callback` and window summaries to `summary_callback`.
+    """
+    accel, gyro = sensor.read()
+    _handle_sample(_sample_payload(accel, gyro), callback, aggregator, summary_callback)
+
+
+def _sample_payload(accel, gyro):
+    return {
+        "accel_x": accel[0],
+        "accel_y": accel[1],
+        "accel_z": accel[2],
+        "gyro_x": gyro[0],
+        "gyro_y": gyro[1],
+        "gyro_z": gyro[2]
+    }
+
+
+def _handle_sample(payload, callback, aggregator, summary_callback):
+    if aggregator is None:
         callback(payload)
+    else:
+        tamper, summary = aggregator.add(payload)
+        if tamper is not None:
+            callback(tamper)
+        if summary is not None:
+            summary_callback(summary)
+
+
+def flush_gyro(aggregator, summary_callback):
+    """Send the partial window left when the sensor stops."""
+    if aggregator is not None:
+        summary = aggregator.flush()
+        if summary is not None:
+            summary_callback(summary)
+
+
+def run_gyro_loop(sensor, delay, callback, stop_event, aggregator=None, summary_callback=None):
+    while True:
+        gyro_step(sensor, callback, aggregator, summary_callback)
         if stop_event.is_set():
             break
         time.sleep(delay)
+
+    flush_gyro(aggregator, summary_callback)
+
+
+def run_dmp_loop(stream, callback, stop_event, aggregator=None, summary_callback=None):
+    """Streaming counterpart of run_gyro_loop, driven by a DMPStream."""
+    stream.run(lambda payload: _handle_sample(payload, callback, aggregator, summary_callback), stop_event)
+    flush_gyro(aggregator, summary_callback)
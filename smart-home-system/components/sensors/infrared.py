@@ -1,6 +1,7 @@
-import time
+import queue
 import random
-from datetime import datetime
+import threading
+import time
 
 try:
     import RPi.GPIO as GPIO # type: ignore
@@ -8,103 +9,222 @@ except ImportError:
     from mock_rpi import GPIO
 
 
+class NECDecoder:
+    """NEC protocol state machine fed with edge timestamps (perf_counter_ns).
+
+    Edges alternate mark/space, so only the time between them is needed; the
+    state says which one just ended. A frame is a 9 ms leader mark, a 4.5 ms
+    space and 32 bits (562 us mark, then a 562 us space for 0 or 1687 us for
+    1). A held key sends a repeat code instead: 9 ms mark, 2.25 ms space and a
+    562 us mark, every ~108 ms. Bits are kept in arrival order, as the old
+    decoder did, so e.g. address 0x00/0xFF + command 0x22/0xDD is 0x00FF22DD.
+    """
+
+    LEADER_MARK_US = 9000
+    LEADER_SPACE_US = 4500
+    REPEAT_SPACE_US = 2250
+    BIT_MARK_US = 562
+    ONE_SPACE_US = 1687
+    # Relative tolerance on leader/repeat/mark widths; bits are split at the midpoint
+    TOLERANCE = 0.3
+    # No gap inside a frame is longer than the leader mark; anything longer starts over
+    FRAME_TIMEOUT_US = 12000
+    # A repeat code belongs to the previous frame only if it follows within this time
+    REPEAT_WINDOW_US = 130000
+
+    IDLE, LEADER_SPACE, BIT_MARK, BIT_SPACE, REPEAT_MARK = range(5)
+
+    def __init__(self):
+        self.state = self.IDLE
+        self.last_edge = None
+        self.code = 0
+        self.bits = 0
+        self.last_code = None
+        self.last_seen = None  # perf_counter_ns of the last frame/repeat of last_code
+
+        self.frames = 0
+        self.repeats = 0
+        self.errors = 0
+
+    def _near(self, duration, expected):
+        return abs(duration - expected) <= expected * self.TOLERANCE
+
+    def _fail(self):
+        self.errors += 1
+        self.state = self.IDLE
+
+    def feed(self, t_ns):
+        """Process one edge; returns ("frame", code), ("repeat", code) or None."""
+        last, self.last_edge = self.last_edge, t_ns
+        if last is None:
+            return None
+        duration = (t_ns - last) / 1000.0
+        if duration > self.FRAME_TIMEOUT_US:
+            if self.state != self.IDLE:
+                self._fail()
+            return None
+
+        state = self.state
+        if state == self.IDLE:
+            if self._near(duration, self.LEADER_MARK_US):
+                self.state = self.LEADER_SPACE
+
+        elif state == self.LEADER_SPACE:
+            if self._near(duration, self.LEADER_SPACE_US):
+                self.state = self.BIT_MARK
+                self.code = 0
+                self.bits = 0
+            elif self._near(duration, self.REPEAT_SPACE_US):
+                self.state = self.REPEAT_MARK
+            else:
+                self._fail()
+
+        elif state == self.REPEAT_MARK:
+            self.state = self.IDLE
+            if not self._near(duration, self.BIT_MARK_US):
+                self.errors += 1
+            elif self.last_code is not None and (t_ns - self.last_seen) / 1000.0 <= self.REPEAT_WINDOW_US:
+                self.repeats += 1
+                self.last_seen = t_ns
+                return "repeat", self.last_code
+
+        elif state == self.BIT_MARK:
+            if self._near(duration, self.BIT_MARK_US):
+                self.state = self.BIT_SPACE
+            else:
+                self._fail()
+
+        elif state == self.BIT_SPACE:
+            if duration > self.ONE_SPACE_US * (1 + self.TOLERANCE) or duration < self.BIT_MARK_US * (1 - self.TOLERANCE):
+                self._fail()
+                return None
+            bit = 1 if duration > (self.BIT_MARK_US + self.ONE_SPACE_US) / 2 else 0
+            self.code = (self.code << 1) | bit
+            self.bits += 1
+            if self.bits < 32:
+                self.state = self.BIT_MARK
+                return None
+
+            # The trailing stop mark is left to IDLE, which ignores it.
+            self.state = self.IDLE
+            if ((self.code >> 8) ^ self.code) & 0xFF != 0xFF:
+                self.errors += 1
+                return None
+            self.frames += 1
+            self.last_code = self.code
+            self.last_seen = t_ns
+            return "frame", self.code
+
+        return None
+
+
 class IRReceiver:
 
     INVALID_VALUE = "INVALID"
 
-    BUTTONS = [
-        0x300ff22dd, 0x300ffc23d, 0x300ff629d, 0x300ffa857,
-        0x300ff9867, 0x300ffb04f, 0x300ff6897, 0x300ff02fd,
-        0x300ff30cf, 0x300ff18e7, 0x300ff7a85, 0x300ff10ef,
-        0x300ff38c7, 0x300ff5aa5, 0x300ff42bd, 0x300ff4ab5,
-        0x300ff52ad
-    ]
-
-    BUTTON_NAMES = [
-        "LEFT", "RIGHT", "UP", "DOWN",
-        "2", "3", "1", "OK",
-        "4", "5", "6", "7",
-        "8", "9", "*", "0", "#"
-    ]
+    BUTTONS = {
+        0x00FF22DD: "LEFT",
+        0x00FFC23D: "RIGHT",
+        0x00FF629D: "UP",
+        0x00FFA857: "DOWN",
+        0x00FF9867: "2",
+        0x00FFB04F: "3",
+        0x00FF6897: "1",
+        0x00FF02FD: "OK",
+        0x00FF30CF: "4",
+        0x00FF18E7: "5",
+        0x00FF7A85: "6",
+        0x00FF10EF: "7",
+        0x00FF38C7: "8",
+        0x00FF5AA5: "9",
+        0x00FF42BD: "*",
+        0x00FF4AB5: "0",
+        0x00FF52AD: "#",
+    }
+
+    BUTTON_NAMES = list(BUTTONS.values())
 
     def __init__(self, gpio_pin, simulate=False):
         self.gpio_pin = gpio_pin
         self.simulate = simulate
+        self.decoder = NECDecoder()
+        self.keys = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+
+        self.presses = 0
+        self.unknown = 0
+        self.held = 0  # frames of a held key that were not reported again
 
         if not simulate:
             GPIO.setup(self.gpio_pin, GPIO.IN)
 
-    def _get_binary(self):
-        num1s = 0
-        binary = 1
-        command = []
-        previousValue = 0
-        value = GPIO.input(self.gpio_pin)
-
-        while value:
-            time.sleep(0.0001)
-            value = GPIO.input(self.gpio_pin)
-
-        startTime = datetime.now()
-
-        while True:
-            if previousValue != value:
-                now = datetime.now()
-                pulseTime = now - startTime
-                startTime = now
-                command.append((previousValue, pulseTime.microseconds))
-
-            if value:
-                num1s += 1
-            else:
-                num1s = 0
-
-            if num1s > 10000:
-                break
-
-            previousValue = value
-            value = GPIO.input(self.gpio_pin)
-
-        for (typ, tme) in command:
-            if typ == 1:
-                if tme > 1000:
-                    binary = binary * 10 + 1
-                else:
-                    binary *= 10
-
-        if len(str(binary)) > 34:
-            binary = int(str(binary)[:34])
-
-        return binary
-
-    def _convert_hex(self, binaryValue):
-        tmp = int(str(binaryValue), 2)
-        return hex(tmp)
-
-    def read(self):
+    def start(self):
+        """Decode from GPIO edge callbacks; nothing runs while the remote is quiet."""
+        if self.started:
+            return
+        self.started = True
+        GPIO.add_event_detect(self.gpio_pin, GPIO.BOTH, callback=self._on_edge)
+
+    def stop(self):
+        if self.started:
+            GPIO.remove_event_detect(self.gpio_pin)
+            self.started = False
+
+    def _on_edge(self, channel):
+        t_ns = time.perf_counter_ns()
+        with self.lock:
+            last_code, last_seen = self.decoder.last_code, self.decoder.last_seen
+            event = self.decoder.feed(t_ns)
+        if event is None or event[0] == "repeat":
+            return
+
+        code = event[1]
+        # Some remotes resend the whole frame instead of repeat codes while a key is held
+        if code == last_code and (t_ns - last_seen) / 1000.0 <= NECDecoder.REPEAT_WINDOW_US:
+            self.held += 1
+            return
+        name = self.BUTTONS.get(code)
+        if name is None:
+            self.unknown += 1
+            return
+        self.presses += 1
+        self.keys.put(name)
+
+    def read(self, timeout=None):
+        """Next pressed key (once per press, however long it is held), or None on timeout."""
         if self.simulate:
             return random.choice(self.BUTTON_NAMES + [None])
 
+        self.start()
         try:
-            inData = self._convert_hex(self._get_binary())
-
-            for i in range(len(self.BUTTONS)):
-                if hex(self.BUTTONS[i]) == inData:
-                    return self.BUTTON_NAMES[i]
+            return self.keys.get(timeout=timeout)
+        except queue.Empty:
+            return None
 
-            return self.INVALID_VALUE
+    def get_stats(self):
+        return {
+            "frames": self.decoder.frames,
+            "repeats": self.decoder.repeats,
+            "errors": self.decoder.errors,
+            "presses": self.presses,
+            "held": self.held,
+            "unknown": self.unknown,
+        }
 
-        except:
-            return self.INVALID_VALUE
 
 def run_ir_loop(sensor, delay, callback, stop_event):
+    """Simulated remotes are polled every `delay` s; a real receiver blocks on decoded keys."""
     while True:
-        value = sensor.read()
+        value = sensor.read() if sensor.simulate else sensor.read(timeout=0.5)
 
         if value and value != sensor.INVALID_VALUE:
             callback(value)
-            
+
         if stop_event.is_set():
             break
 
-        time.sleep(delay)
+        if sensor.simulate:
+            time.sleep(delay)
+
+    sensor.stop()
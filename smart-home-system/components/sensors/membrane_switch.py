@@ -9,6 +9,8 @@ except ImportError:
     from mock_rpi import GPIO
     RUNNING_ON_PI = False
 
+from components.sensors.edge_detect import EdgeWatcher
+
 
 class MembraneSwitch:
     INVALID_VALUE = None
@@ -54,15 +56,53 @@ class MembraneSwitch:
 
         return None
 
+    def scan_from_idle(self):
+        """Scan while idling with every row HIGH (edge mode), then return to idle."""
+        for pin in self.row_pins:
+            GPIO.output(pin, GPIO.LOW)
+        key = self.read()
+        for pin in self.row_pins:
+            GPIO.output(pin, GPIO.HIGH)
+        return key
+
+
+def membrane_step(keypad, callback):
+    value = keypad.read()
+
+    if value is not None:
+        callback(value)
+
 
 def run_membrane_loop(keypad, delay, callback, stop_event):
     while True:
-        value = keypad.read()
-
-        if value is not None:
-            callback(value)
+        membrane_step(keypad, callback)
 
         if stop_event.is_set():
             break
 
         time.sleep(delay)
+
+
+def run_membrane_edge_loop(keypad, debounce, callback, stop_event):
+    """Interrupt-driven variant: all rows idle HIGH, so any key press raises its column.
+
+    The matrix is only scanned after a debounced column edge and
+    `callback(key, timestamp)` is called once per press. The column edges
+    the scan itself causes while a key is held are muted in the watcher, so
+    a held key does not keep the keypad rescanning.
+    """
+    state = {"key": None}
+
+    def on_settled(timestamp):
+        key = keypad.scan_from_idle()
+        # Another key's edge while one is held scans the same key again; report each press once.
+        if key is not None and key != state["key"]:
+            callback(key, timestamp)
+        state["key"] = key
+
+    for pin in keypad.row_pins:
+        GPIO.output(pin, GPIO.HIGH)
+    watcher = EdgeWatcher(keypad.col_pins, on_settled, debounce=debounce, mute_while_settling=True)
+    watcher.start()
+    stop_event.wait()
+    watcher.stop()
@@ -1,6 +1,8 @@
 import random
 import time
 
+from components.sensors.edge_detect import run_level_edge_loop
+
 try:
     import RPi.GPIO as GPIO  # type: ignore
     RUNNING_ON_PI = True
@@ -28,12 +30,23 @@ class PIR:
             self.value = GPIO.input(self.gpio_pin)
         return self.value
 
-def run_motion_loop(sensor, delay, callback, stop_event):
+def motion_step(sensor, callback, reporter=None):
+    """One poll; with a ChangeReporter only transitions and heartbeats are sent."""
+    value = sensor.read()
+    if value not in [sensor.NO_MOTION, sensor.MOTION]:
+        value = sensor.INVALID_VALUE
+    if reporter is None or reporter.update(value):
+        callback(value if reporter is None else reporter.state)
+
+
+def run_motion_loop(sensor, delay, callback, stop_event, reporter=None):
     while True:
-        value = sensor.read()
-        if value not in [sensor.NO_MOTION, sensor.MOTION]:
-            value = sensor.INVALID_VALUE
-        callback(value)
+        motion_step(sensor, callback, reporter)
         if stop_event.is_set():
             break
         time.sleep(delay)
+
+
+def run_motion_edge_loop(sensor, debounce, heartbeat, callback, stop_event):
+    """Interrupt-driven variant: `callback(value, timestamp)` only on debounced edges and heartbeats."""
+    run_level_edge_loop(sensor, [sensor.NO_MOTION, sensor.MOTION], debounce, heartbeat, callback, stop_event)
@@ -1,4 +1,5 @@
 import random
+import statistics
 import time
 
 try:
@@ -8,14 +9,39 @@ except ImportError:
     from mock_rpi import GPIO
     RUNNING_ON_PI = False
 
+
 class UDS:
     INVALID_DISTANCE = -1.0
+    # HC-SR04 measuring range (cm)
+    MIN_DISTANCE = 2.0
+    MAX_DISTANCE = 400.0
+    SPEED_OF_SOUND = 34300.0  # cm/s
+    # Longer than the round trip at MAX_DISTANCE (23.3 ms), shorter than the
+    # 38 ms pulse the HC-SR04 gives when nothing echoes back.
+    ECHO_TIMEOUT_NS = 25_000_000
+    # Datasheet: at least 60 ms between pings so the previous echo has died out.
+    PING_SPACING = 0.06
+
+    AGGREGATES = ("median", "trimmed_mean")
 
-    def __init__(self, trigger_pin, echo_pin, simulate=False):
+    def __init__(self, trigger_pin, echo_pin, simulate=False, burst=1, aggregate="median", trim=0.2,
+                 ping_spacing=PING_SPACING):
+        if aggregate not in self.AGGREGATES:
+            raise ValueError(f"Nepoznata agregacija '{aggregate}' (dozvoljeno: {', '.join(self.AGGREGATES)})")
         self.trigger_pin = trigger_pin
         self.echo_pin = echo_pin
         self.simulate = simulate
+        self.burst = max(1, burst)
+        self.aggregate = aggregate
+        self.trim = trim
+        self.ping_spacing = ping_spacing
         self.last_distance = self.INVALID_DISTANCE
+        # Median absolute deviation of the last burst (cm); None for single pings.
+        self.last_spread = None
+
+        self.reads = 0
+        self.pings = 0
+        self.failed_pings = 0
 
         if not simulate:
             GPIO.setup(trigger_pin, GPIO.OUT)
@@ -23,46 +49,169 @@ class UDS:
             GPIO.output(trigger_pin, GPIO.LOW)
             time.sleep(0.2)
 
+    def _ping(self):
+        """One trigger/echo cycle; returns the distance in cm or None."""
+        self.pings += 1
+        GPIO.output(self.trigger_pin, False)
+        time.sleep(0.0002)
+        GPIO.output(self.trigger_pin, True)
+        time.sleep(0.00001)
+        GPIO.output(self.trigger_pin, False)
+
+        start = time.perf_counter_ns()
+        pulse_start = start
+        while GPIO.input(self.echo_pin) == 0:
+            pulse_start = time.perf_counter_ns()
+            if pulse_start - start > self.ECHO_TIMEOUT_NS:
+                self.failed_pings += 1
+                return None
+
+        pulse_end = pulse_start
+        while GPIO.input(self.echo_pin) == 1:
+            pulse_end = time.perf_counter_ns()
+            if pulse_end - pulse_start > self.ECHO_TIMEOUT_NS:
+                self.failed_pings += 1
+                return None
+
+        distance = (pulse_end - pulse_start) * self.SPEED_OF_SOUND / 2e9
+        if not self.is_valid(distance):
+            self.failed_pings += 1
+            return None
+        return distance
+
     def read(self):
+        """Single ping, or with burst > 1 the median/trimmed mean of `burst` pings.
+
+        A burst needs more than half of its pings to come back, otherwise the
+        read is INVALID_DISTANCE. The spread of the burst is left in last_spread.
+        """
+        self.reads += 1
         if self.simulate:
             self.last_distance = round(random.uniform(5.0, 200.0), 2)
+            self.last_spread = None
             return self.last_distance
 
         try:
-            GPIO.output(self.trigger_pin, False)
-            time.sleep(0.0002)
-            GPIO.output(self.trigger_pin, True)
-            time.sleep(0.00001)
-            GPIO.output(self.trigger_pin, False)
-
-            pulse_start = time.time()
-            pulse_end = time.time()
-
-            timeout_start = time.time()
-            while GPIO.input(self.echo_pin) == 0:
-                if time.time() - timeout_start > 0.02:
-                    return self.INVALID_DISTANCE
-                pulse_start = time.time()
-
-            timeout_start = time.time()
-            while GPIO.input(self.echo_pin) == 1:
-                if time.time() - timeout_start > 0.02:
-                    return self.INVALID_DISTANCE
-                pulse_end = time.time()
-
-            pulse_duration = pulse_end - pulse_start
-            distance = (pulse_duration * 34300) / 2
-            self.last_distance = round(distance, 2)
+            if self.burst == 1:
+                distance = self._ping()
+                spread = None
+            else:
+                samples = []
+                next_ping = time.monotonic()
+                for _ in range(self.burst):
+                    delay = next_ping - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_ping = time.monotonic() + self.ping_spacing
+                    distance = self._ping()
+                    if distance is not None:
+                        samples.append(distance)
+                if len(samples) * 2 <= self.burst:
+                    distance, spread = None, None
+                else:
+                    distance, spread = aggregate_burst(samples, self.aggregate, self.trim)
+                    spread = round(spread, 2)
+
+            if distance is None:
+                self.last_distance = self.INVALID_DISTANCE
+                self.last_spread = None
+            else:
+                self.last_distance = round(distance, 2)
+                self.last_spread = spread
             return self.last_distance
 
         except Exception:
             self.last_distance = self.INVALID_DISTANCE
+            self.last_spread = None
             return self.last_distance
 
-def run_ultrasonic_loop(sensor, delay, callback, stop_event):
-    while True:
-        distance = sensor.read()
+    def is_valid(self, distance):
+        return self.MIN_DISTANCE <= distance <= self.MAX_DISTANCE
+
+    def get_stats(self):
+        return {
+            "reads": self.reads,
+            "pings": self.pings,
+            "failed_pings": self.failed_pings,
+            "last_spread": self.last_spread,
+        }
+
+
+def aggregate_burst(samples, method="median", trim=0.2):
+    """Combine one burst of distances; returns (distance, spread).
+
+    "median" takes the middle sample; "trimmed_mean" drops `trim` of the
+    samples at each end (at least one once there are three) and averages the
+    rest. The spread is the median
+    absolute deviation from the result: a single stray echo does not move it,
+    a burst that disagrees with itself does.
+    """
+    ordered = sorted(samples)
+    if method == "median":
+        value = statistics.median(ordered)
+    else:
+        cut = int(len(ordered) * trim)
+        if trim > 0 and len(ordered) >= 3:
+            # int(3 * 0.2) is 0: without this a short burst would trim nothing
+            cut = max(1, cut)
+        kept = ordered[cut:len(ordered) - cut] or ordered
+        value = statistics.fmean(kept)
+    spread = statistics.median(abs(s - value) for s in ordered)
+    return value, spread
+
+
+def echo_waveform(distance_cm, delay_us=250):
+    """Echo pin pulses for a target at `distance_cm`, for MockGPIO.load_waveform.
+
+    The HC-SR04 raises the echo line ~250 us after the trigger (its 8-cycle
+    burst) and holds it high for the round trip. None means no echo: the
+    module then drops the line after 38 ms.
+    """
+    if distance_cm is None:
+        return [(GPIO.LOW, delay_us), (GPIO.HIGH, 38000)]
+    return [(GPIO.LOW, delay_us), (GPIO.HIGH, 2e6 * distance_cm / UDS.SPEED_OF_SOUND)]
+
+
+class EchoModel:
+    """Noisy HC-SR04 echoes for MockGPIO.attach_echo.
+
+    Every call is one ping at `distance` cm with gaussian noise (`noise_cm`).
+    With probability `outlier_rate` the echo comes from somewhere else in the
+    range (multipath, a passing object) and with `dropout_rate` nothing comes
+    back at all.
+    """
+
+    def __init__(self, distance, noise_cm=0.5, outlier_rate=0.0, dropout_rate=0.0, rng=None):
+        self.distance = distance
+        self.noise_cm = noise_cm
+        self.outlier_rate = outlier_rate
+        self.dropout_rate = dropout_rate
+        self.rng = rng or random.Random()
+
+    def __call__(self):
+        roll = self.rng.random()
+        if roll < self.dropout_rate:
+            return echo_waveform(None)
+        if roll < self.dropout_rate + self.outlier_rate:
+            return echo_waveform(self.rng.uniform(UDS.MIN_DISTANCE, UDS.MAX_DISTANCE))
+        return echo_waveform(max(UDS.MIN_DISTANCE, self.rng.gauss(self.distance, self.noise_cm)))
+
+
+def ultrasonic_step(sensor, callback, validator=None):
+    """One read; with a ReadingValidator failed reads are dropped or replaced by the held value."""
+    distance = sensor.read()
+    if validator is None:
         callback(distance)
+        return
+
+    result = validator.check(distance if sensor.is_valid(distance) else None)
+    if result is not None:
+        callback(*result)
+
+
+def run_ultrasonic_loop(sensor, delay, callback, stop_event, validator=None):
+    while True:
+        ultrasonic_step(sensor, callback, validator)
         
         if stop_event.is_set():
             break
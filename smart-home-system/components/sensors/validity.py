@@ -0,0 +1,69 @@
+import time
+
+QUALITY_GOOD = "good"
+QUALITY_HELD = "held"
+
+MODE_SUPPRESS = "suppress"
+MODE_HOLD = "hold"
+
+
+class ReadingValidator:
+    """Keeps failed reads (-999, -1.0, out-of-range values) away from the server.
+
+    check() gets the reading, or None when the read failed. A good reading is
+    passed through and remembered. A failed one is dropped (suppress) or, in
+    hold mode, replaced by the last good reading tagged QUALITY_HELD for at
+    most `max_hold` seconds; after that it is dropped as well.
+    """
+
+    def __init__(self, name, mode=MODE_SUPPRESS, max_hold=60.0):
+        if mode not in (MODE_SUPPRESS, MODE_HOLD):
+            raise ValueError(f"Nepoznat režim '{mode}' za {name}")
+        self.name = name
+        self.mode = mode
+        self.max_hold = max_hold
+        self.last_good = None
+        self.last_good_at = None
+
+        self.good = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.held = 0
+        self.suppressed = 0
+
+    def check(self, reading, now=None):
+        """Return (reading, quality) to send, or None to send nothing."""
+        if now is None:
+            now = time.monotonic()
+
+        if reading is not None:
+            self.good += 1
+            self.consecutive_errors = 0
+            self.last_good = reading
+            self.last_good_at = now
+            return reading, QUALITY_GOOD
+
+        self.errors += 1
+        self.consecutive_errors += 1
+        if self.mode == MODE_HOLD and self.last_good is not None and now - self.last_good_at <= self.max_hold:
+            self.held += 1
+            return self.last_good, QUALITY_HELD
+        self.suppressed += 1
+        return None
+
+    def get_stats(self):
+        return {
+            "good": self.good,
+            "errors": self.errors,
+            "consecutive_errors": self.consecutive_errors,
+            "held": self.held,
+            "suppressed": self.suppressed,
+        }
+
+    @classmethod
+    def from_config(cls, config, name, mode_key, default_mode):
+        return cls(
+            name,
+            mode=config.get_value("SENSOR_CONFIG", mode_key, default_mode).strip().lower(),
+            max_hold=config.get_value("SENSOR_CONFIG", "HOLD_MAX_AGE", 60.0, float),
+        )
@@ -1,9 +1,14 @@
+import os
 from configparser import ConfigParser
+from pathlib import Path
 
 class Config:
     def __init__(self, config_file='smart-home-system\pi1_config.ini'):
+        self.config_file = config_file
         self.config = ConfigParser()
         self.config.read(config_file, encoding='utf-8')
+        # Relative paths in the ini are resolved against smart-home-system/
+        self.base_dir = Path(config_file).resolve().parent.parent
 
     def is_simulated(self, device):
         try:
@@ -29,9 +34,26 @@ class Config:
             "port": self.config.getint("MQTT", "PORT"),
             "base_topic": self.config.get("MQTT", "BASE_TOPIC"),
             "batch_size": self.config.getint("MQTT", "BATCH_SIZE"),
-            "send_interval": self.config.getint("MQTT", "SEND_INTERVAL")
+            "send_interval": self.config.getint("MQTT", "SEND_INTERVAL"),
+            "batch_mode": self.config.get("MQTT", "BATCH_MODE", fallback="per_sensor").strip().lower(),
+            "batch_topic": self.config.get("MQTT", "BATCH_TOPIC", fallback=None),
+            "payload_format": self.config.get("MQTT", "PAYLOAD_FORMAT", fallback="json").strip().lower(),
+            "low_latency_interval": self.config.getfloat("MQTT", "LOW_LATENCY_INTERVAL", fallback=0.25),
+            "priorities": dict(self.config.items("MQTT_PRIORITY")) if self.config.has_section("MQTT_PRIORITY") else {},
+            "capacity": self.config.getint("MQTT", "QUEUE_CAPACITY", fallback=1000),
+            "drop_policies": dict(self.config.items("MQTT_DROP_POLICY")) if self.config.has_section("MQTT_DROP_POLICY") else {},
+            "diagnostics_interval": self.config.getfloat("MQTT", "DIAGNOSTICS_INTERVAL", fallback=30.0),
+            "store_path": self._resolve_path(self.config.get("MQTT", "STORE_PATH", fallback="")),
+            "store_max_rows": self.config.getint("MQTT", "STORE_MAX_ROWS", fallback=100000),
+            "drain_rate": self.config.getfloat("MQTT", "DRAIN_RATE", fallback=200.0),
         }
         
+    def _resolve_path(self, value):
+        value = value.strip()
+        if not value:
+            return None
+        return str(self.base_dir / value)
+
     def get_value(self, section, key, default=None, value_type=str):
         try:
             if value_type == int:
@@ -44,3 +66,54 @@ class Config:
                 return self.config.get(section, key)
         except:
             return default
+
+    def set_values(self, section, values):
+        """Write `values` into [section] of the ini file, keeping its comments and order.
+
+        Existing keys are updated in place, new ones go at the end of the
+        section, and a missing section is appended to the file.
+        """
+        path = Path(self.config_file)
+        lines = path.read_text(encoding='utf-8').splitlines() if path.exists() else []
+        pending = {str(key): str(value) for key, value in values.items()}
+
+        def insert_pending(out):
+            # After the section's last non-blank line, so blank separators stay in place
+            end = len(out)
+            while end > 0 and not out[end - 1].strip():
+                end -= 1
+            out[end:end] = [f"{key} = {value}" for key, value in pending.items()]
+            pending.clear()
+
+        out = []
+        in_section = found = False
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith('[') and stripped.endswith(']'):
+                if in_section:
+                    insert_pending(out)
+                in_section = stripped[1:-1].strip() == section
+                found = found or in_section
+            elif in_section and '=' in stripped and not stripped.startswith(('#', ';')):
+                key = stripped.split('=', 1)[0].strip()
+                match = next((name for name in pending if name.lower() == key.lower()), None)
+                if match is not None:
+                    line = f"{key} = {pending.pop(match)}"
+            out.append(line)
+
+        if in_section:
+            insert_pending(out)
+        if not found:
+            if out and out[-1].strip():
+                out.append("")
+            out.append(f"[{section}]")
+            insert_pending(out)
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text("\n".join(out) + "\n", encoding='utf-8')
+        os.replace(tmp_path, path)
+
+        if not self.config.has_section(section):
+            self.config.add_section(section)
+        for key, value in values.items():
+            self.config.set(section, str(key), str(value))
@@ -1,3 +1,38 @@
+import time
+from bisect import bisect_right
+
+
+class VirtualClock:
+    """Stand-in for the `time` functions of a sensor module, for deterministic replays.
+
+    Patch it over a module's `time` (e.g. components.sensors.dht.time) and set
+    it as MockGPIO.clock: sleeps then take no real time, and every input()
+    advances the clock by `input_ns`, the cost of one pin read on the Pi. A
+    bit-banged reader sees a waveform exactly as recorded, whatever the host
+    is doing.
+    """
+
+    def __init__(self, input_ns=1000, start_s=1000.0):
+        self.now_ns = int(start_s * 1e9)
+        self.input_ns = input_ns
+
+    def perf_counter_ns(self):
+        return self.now_ns
+
+    def perf_counter(self):
+        return self.now_ns / 1e9
+
+    def monotonic(self):
+        return self.now_ns / 1e9
+
+    def time(self):
+        return self.now_ns / 1e9
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now_ns += int(seconds * 1e9)
+
+
 class MockGPIO:
     BCM = 'BCM'
     OUT = 'OUT'
@@ -5,11 +40,22 @@ class MockGPIO:
     HIGH = 1
     LOW = 0
     PUD_UP = 'PUD_UP'
+    PUD_DOWN = 'PUD_DOWN'
+    RISING = 'RISING'
+    FALLING = 'FALLING'
+    BOTH = 'BOTH'
 
     def __init__(self):
         self.mode = None
         self.pins = {}
         self.warnings = True
+        self.events = {}  # pin -> {"edge", "callbacks", "bouncetime", "last", "detected"}
+        self.waveforms = {}  # pin -> {"levels", "ends_ns", "start"}
+        self.echoes = {}  # trigger pin -> (echo pin, model)
+        self.clock = None  # VirtualClock for waveform playback; None = real time
+
+    def _now_ns(self):
+        return self.clock.now_ns if self.clock is not None else time.perf_counter_ns()
 
     def setmode(self, mode):
         self.mode = mode
@@ -25,19 +71,124 @@ class MockGPIO:
             "pull": pull_up_down,
         }
         print(f"[MOCK GPIO] setup(pin={pin}, dir={direction}, pud={pull_up_down})")
+        waveform = self.waveforms.get(pin)
+        if waveform is not None:
+            if direction == self.IN and waveform["start"] is None:
+                waveform["start"] = self._now_ns()
+            elif direction == self.OUT and waveform["start"] is not None:
+                # The reader took the line back: the recording is over.
+                del self.waveforms[pin]
+
+    def load_waveform(self, pin, pulses):
+        """Arm `pulses` [(level, duration_us), ...] on `pin`.
+
+        Playback starts when the pin is next set up as an input, so bit-banged
+        readers (e.g. the DHT) see the recorded edges: in real time, or on
+        `clock` when one is set. Once the
+        pulses run out the pin idles at the opposite of the last level, until
+        the pin is set up as an output again.
+        """
+        ends_ns = []
+        total = 0
+        for _, duration_us in pulses:
+            total += int(duration_us * 1000)
+            ends_ns.append(total)
+        idle = self.HIGH if not pulses or pulses[-1][0] == self.LOW else self.LOW
+        self.waveforms[pin] = {
+            "levels": [level for level, _ in pulses] + [idle],
+            "ends_ns": ends_ns,
+            "start": None,
+        }
 
     def input(self, pin):
+        if self.clock is not None:
+            self.clock.now_ns += self.clock.input_ns
+        waveform = self.waveforms.get(pin)
+        if waveform is not None and waveform["start"] is not None:
+            # Waveform pins are read in tight loops; no logging here.
+            elapsed = self._now_ns() - waveform["start"]
+            return waveform["levels"][bisect_right(waveform["ends_ns"], elapsed)]
         val = self.pins.get(pin, {}).get("value", self.LOW)
         print(f"[MOCK GPIO] input(pin={pin}) -> {val}")
         return val
 
+    def attach_echo(self, trigger_pin, echo_pin, model):
+        """Answer every trigger pulse on `trigger_pin` with a waveform on `echo_pin`.
+
+        `model()` returns the pulses (as for load_waveform) of one echo; they
+        start playing on the falling edge of the trigger, like an HC-SR04.
+        """
+        self.echoes[trigger_pin] = (echo_pin, model)
+
     def output(self, pin, value):
+        old = self.pins[pin]["value"] if pin in self.pins else None
         if pin in self.pins:
             self.pins[pin]["value"] = value
         print(f"[MOCK GPIO] output(pin={pin}, value={value})")
+        echo = self.echoes.get(pin)
+        if echo is not None and old and not value:
+            echo_pin, model = echo
+            self.load_waveform(echo_pin, model())
+            self.waveforms[echo_pin]["start"] = self._now_ns()
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        if pin in self.events:
+            raise RuntimeError(f"Conflicting edge detection already enabled for pin {pin}")
+        self.events[pin] = {
+            "edge": edge,
+            "callbacks": [callback] if callback else [],
+            "bouncetime": bouncetime,
+            "last": None,
+            "detected": False,
+        }
+        print(f"[MOCK GPIO] add_event_detect(pin={pin}, edge={edge}, bouncetime={bouncetime})")
+
+    def add_event_callback(self, pin, callback):
+        if pin not in self.events:
+            raise RuntimeError(f"Add event detection using add_event_detect first (pin {pin})")
+        self.events[pin]["callbacks"].append(callback)
+
+    def remove_event_detect(self, pin):
+        self.events.pop(pin, None)
+        print(f"[MOCK GPIO] remove_event_detect(pin={pin})")
+
+    def event_detected(self, pin):
+        event = self.events.get(pin)
+        if event is None or not event["detected"]:
+            return False
+        event["detected"] = False
+        return True
+
+    def inject_edge(self, pin, value):
+        """Drive an input pin to `value` and fire edge callbacks like the real library.
+
+        Callbacks run in the caller's thread; edges inside `bouncetime` ms of the
+        previous one are ignored, as RPi.GPIO does.
+        """
+        pin_state = self.pins.setdefault(pin, {"dir": self.IN, "value": self.LOW, "pull": None})
+        old = pin_state["value"]
+        pin_state["value"] = value
+        event = self.events.get(pin)
+        if event is None or old == value:
+            return
+
+        edge = self.RISING if value == self.HIGH else self.FALLING
+        if event["edge"] not in (edge, self.BOTH):
+            return
+
+        now = time.monotonic()
+        if event["bouncetime"] and event["last"] is not None and (now - event["last"]) * 1000 < event["bouncetime"]:
+            return
+        event["last"] = now
+        event["detected"] = True
+        for callback in list(event["callbacks"]):
+            callback(pin)
 
     def cleanup(self):
         print("[MOCK GPIO] cleanup()")
         self.pins.clear()
+        self.events.clear()
+        self.waveforms.clear()
+        self.echoes.clear()
 
 GPIO = MockGPIO()
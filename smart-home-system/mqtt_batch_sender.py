@@ -1,45 +1,379 @@
 import json
 import time
 import threading
-from queue import Queue, Empty
+from collections import deque
 import paho.mqtt.client as mqtt
 
+import payload_codec
+from mqtt_store import OfflineStore
+
+
+class _Lane:
+    """FIFO of (enqueued_at, payload) flushed once the oldest item hits max_delay."""
+
+    def __init__(self, name, max_delay):
+        self.name = name
+        self.max_delay = max_delay
+        self.items = deque()  # (enqueued_at, payload)
+        self.sent = 0
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+
+    def deadline(self):
+        return self.items[0][0] + self.max_delay
+
+    def take(self, batch_size, now):
+        """Up to `batch_size` (enqueued_at, payload) items, oldest first."""
+        batch = []
+        while self.items and len(batch) < batch_size:
+            item = self.items.popleft()
+            delay = now - item[0]
+            self.delay_total += delay
+            if delay > self.delay_max:
+                self.delay_max = delay
+            batch.append(item)
+        self.sent += len(batch)
+        return batch
+
+    def stats(self):
+        return {
+            "queued": len(self.items),
+            "sent": self.sent,
+            "avg_delay_ms": self.delay_total / self.sent * 1000.0 if self.sent else 0.0,
+            "max_delay_ms": self.delay_max * 1000.0,
+        }
+
+
 class MQTTBatchSender:
-    def __init__(self, broker, port, base_topic, batch_size, send_interval):
-        self.queue = Queue()
+    # per_sensor: one MQTT message per reading on <base_topic>/<sensor_type>
+    # frame:      one MQTT message per batch, a JSON array of readings on batch_topic
+    MODE_PER_SENSOR = "per_sensor"
+    MODE_FRAME = "frame"
+
+    # Priority lanes, in flush order. immediate is sent as soon as it is
+    # enqueued, low_latency within low_latency_interval, bulk within send_interval.
+    LANE_IMMEDIATE = "immediate"
+    LANE_LOW_LATENCY = "low_latency"
+    LANE_BULK = "bulk"
+    LANES = (LANE_IMMEDIATE, LANE_LOW_LATENCY, LANE_BULK)
+
+    # Used for sensor types not listed in [MQTT_PRIORITY]; everything else is bulk.
+    DEFAULT_PRIORITIES = {
+        "door_button": LANE_IMMEDIATE,
+        "door_membrane": LANE_IMMEDIATE,
+        "door_motion": LANE_IMMEDIATE,
+        "door_distance": LANE_LOW_LATENCY,
+        "kitchen_button": LANE_LOW_LATENCY,
+        "bedroom_ir": LANE_LOW_LATENCY,
+    }
+
+    # A reading of the key type takes the queued readings of the listed types
+    # along, ahead of itself, whatever lane they wait in: backend.detect_direction
+    # reads the distances already received when a motion event arrives.
+    FLUSH_BEFORE = {
+        "door_motion": ("door_distance",),
+    }
+
+    # What to give up when the queue is at capacity (see _make_room):
+    # drop_oldest - the oldest queued reading goes first
+    # keep_latest - a new reading replaces the queued one of the same sensor type
+    # never       - never dropped, may exceed capacity
+    DROP_OLDEST = "drop_oldest"
+    KEEP_LATEST = "keep_latest"
+    NEVER_DROP = "never"
+    DROP_POLICIES = (DROP_OLDEST, KEEP_LATEST, NEVER_DROP)
+
+    # Used for sensor types not listed in [MQTT_DROP_POLICY]; everything else is drop_oldest.
+    DEFAULT_DROP_POLICIES = {
+        "door_button": NEVER_DROP,
+        "door_membrane": NEVER_DROP,
+        "door_motion": NEVER_DROP,
+        "door_light": KEEP_LATEST,
+        "door_buzzer": KEEP_LATEST,
+        "display_4sd": KEEP_LATEST,
+        "rgb_led": KEEP_LATEST,
+        "lcd_message": KEEP_LATEST,
+        "kitchen_dht_humidity": KEEP_LATEST,
+        "kitchen_dht_temperature": KEEP_LATEST,
+        "bedroom_dht_humidity": KEEP_LATEST,
+        "bedroom_dht_temperature": KEEP_LATEST,
+        "master_dht_humidity": KEEP_LATEST,
+        "master_dht_temperature": KEEP_LATEST,
+    }
+
+    def __init__(self, broker, port, base_topic, batch_size, send_interval,
+                 batch_mode=MODE_PER_SENSOR, batch_topic=None,
+                 payload_format=payload_codec.FORMAT_JSON,
+                 priorities=None, low_latency_interval=0.25,
+                 capacity=1000, drop_policies=None, diagnostics_interval=30.0,
+                 diagnostics_topic=None, store_path=None, store_max_rows=100000,
+                 drain_rate=200.0):
+        if batch_mode not in (self.MODE_PER_SENSOR, self.MODE_FRAME):
+            raise ValueError(f"Nepoznat BATCH_MODE '{batch_mode}'")
+        if payload_format not in (payload_codec.FORMAT_JSON, payload_codec.FORMAT_BINARY):
+            raise ValueError(f"Nepoznat PAYLOAD_FORMAT '{payload_format}'")
+
         self.batch_size = batch_size
         self.send_interval = send_interval
         self.base_topic = base_topic
+        self.batch_mode = batch_mode
+        # smart_home/PI1/sensor -> smart_home/PI1/batch
+        self.batch_topic = batch_topic or f"{base_topic.rsplit('/', 1)[0]}/batch"
+        self.payload_format = payload_format
         self.running = True
 
+        self.priorities = dict(self.DEFAULT_PRIORITIES)
+        for sensor_type, lane in (priorities or {}).items():
+            if lane not in self.LANES:
+                raise ValueError(f"Nepoznat prioritet '{lane}' za '{sensor_type}'")
+            self.priorities[sensor_type] = lane
+
+        self.drop_policies = dict(self.DEFAULT_DROP_POLICIES)
+        for sensor_type, policy in (drop_policies or {}).items():
+            if policy not in self.DROP_POLICIES:
+                raise ValueError(f"Nepoznata drop politika '{policy}' za '{sensor_type}'")
+            self.drop_policies[sensor_type] = policy
+
+        self.capacity = capacity
+        self.queued = 0
+        self.dropped = {}  # sensor_type -> count
+
+        # smart_home/PI1/sensor -> smart_home/PI1/diagnostics
+        self.diagnostics_topic = diagnostics_topic or f"{base_topic.rsplit('/', 1)[0]}/diagnostics"
+        self.diagnostics_interval = diagnostics_interval
+        self.diagnostics_sources = {}
+        self.next_diagnostics = time.monotonic() + diagnostics_interval
+
+        self.lanes = {
+            self.LANE_IMMEDIATE: _Lane(self.LANE_IMMEDIATE, 0.0),
+            self.LANE_LOW_LATENCY: _Lane(self.LANE_LOW_LATENCY, low_latency_interval),
+            self.LANE_BULK: _Lane(self.LANE_BULK, send_interval),
+        }
+        self.cond = threading.Condition()
+
+        # Readings that cannot be published (broker down) are kept here and
+        # drained oldest-first at drain_rate readings/s after reconnecting.
+        self.store = OfflineStore(store_path, store_max_rows) if store_path else None
+        self.drain_rate = drain_rate
+        self.stop_event = threading.Event()
+        self.connected = threading.Event()
+        self.last_publish = None
+
+        # connect_async + loop_start keep retrying in the background, so a
+        # broker that is down at startup no longer stops the controller.
         self.client = mqtt.Client()
-        self.client.connect(broker, port, 60)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.reconnect_delay_set(1, 30)
+        self.client.connect_async(broker, port, 60)
         self.client.loop_start()
 
         self.thread = threading.Thread(target=self._daemon, daemon=True)
         self.thread.start()
+        if self.store is not None:
+            self.drain_thread = threading.Thread(target=self._drain_daemon, daemon=True)
+            self.drain_thread.start()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print("[MQTT] Povezan na broker")
+            self.connected.set()
+        else:
+            print(f"[MQTT] Povezivanje odbijeno (code {rc})")
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected.clear()
+        if rc != 0:
+            print(f"[MQTT] Veza prekinuta (code {rc}), merenja idu u lokalni bafer")
 
     def enqueue(self, payload: dict):
-        self.queue.put(payload)
+        sensor_type = payload.get("sensor_type")
+        lane = self.lanes[self.priorities.get(sensor_type, self.LANE_BULK)]
+        with self.cond:
+            if self.queued >= self.capacity and not self._make_room(sensor_type):
+                self._count_drop(sensor_type)
+                return
+            was_empty = not lane.items
+            if sensor_type in self.FLUSH_BEFORE:
+                self._pull_into(lane, self.FLUSH_BEFORE[sensor_type])
+            lane.items.append((time.monotonic(), payload))
+            self.queued += 1
+            # Wake the sender only if this changes the next deadline or fills a batch.
+            if was_empty or len(lane.items) >= self.batch_size:
+                self.cond.notify()
 
-    def _daemon(self):
-        batch = []
-        last_send = time.time()
+    def _pull_into(self, target, sensor_types):
+        """Move queued readings of `sensor_types` from the other lanes to the end of `target`."""
+        for lane in self.lanes.values():
+            if lane is target:
+                continue
+            moved = [item for item in lane.items if item[1].get("sensor_type") in sensor_types]
+            if moved:
+                lane.items = deque(item for item in lane.items if item[1].get("sensor_type") not in sensor_types)
+                target.items.extend(moved)
+
+    def _policy(self, sensor_type):
+        return self.drop_policies.get(sensor_type, self.DROP_OLDEST)
+
+    def _count_drop(self, sensor_type):
+        self.dropped[sensor_type] = self.dropped.get(sensor_type, 0) + 1
+
+    def _evict(self, lane, index):
+        _, victim = lane.items[index]
+        del lane.items[index]
+        self.queued -= 1
+        self._count_drop(victim.get("sensor_type"))
+
+    def _make_room(self, sensor_type):
+        """Free one slot for a new reading; False means the new reading is dropped."""
+        policy = self._policy(sensor_type)
 
+        if policy == self.KEEP_LATEST:
+            for lane in self.lanes.values():
+                for i, (_, queued) in enumerate(lane.items):
+                    if queued.get("sensor_type") == sensor_type:
+                        self._evict(lane, i)
+                        return True
+
+        # Oldest droppable reading, starting from the least urgent lane
+        for name in reversed(self.LANES):
+            lane = self.lanes[name]
+            for i, (_, queued) in enumerate(lane.items):
+                if self._policy(queued.get("sensor_type")) != self.NEVER_DROP:
+                    self._evict(lane, i)
+                    return True
+
+        # Only never-drop readings are queued
+        return policy == self.NEVER_DROP
+
+    def get_stats(self):
+        with self.cond:
+            stats = {
+                "queued": self.queued,
+                "capacity": self.capacity,
+                "dropped": dict(self.dropped),
+                "dropped_total": sum(self.dropped.values()),
+                "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            }
+        if self.store is not None:
+            stats["store"] = self.store.get_stats()
+        return stats
+
+    def _due_lanes(self, now):
+        return [
+            lane for lane in self.lanes.values()
+            if lane.items and (len(lane.items) >= self.batch_size or lane.deadline() <= now)
+        ]
+
+    def _daemon(self):
         while self.running:
+            with self.cond:
+                while True:
+                    now = time.monotonic()
+                    due = self._due_lanes(now)
+                    diagnostics_due = now >= self.next_diagnostics
+                    if due or diagnostics_due or not self.running:
+                        break
+                    deadlines = [lane.deadline() for lane in self.lanes.values() if lane.items]
+                    deadlines.append(self.next_diagnostics)
+                    self.cond.wait(min(deadlines) - now)
+
+                batches = [lane.take(self.batch_size, now) for lane in due]
+                self.queued -= sum(len(batch) for batch in batches)
+
+            for batch in batches:
+                self._send(batch)
+
+            if diagnostics_due:
+                self.next_diagnostics = now + self.diagnostics_interval
+                if self.connected.is_set():
+                    self._publish_diagnostics()
+
+    def _drain_daemon(self):
+        while not self.stop_event.is_set():
+            if not self.connected.wait(timeout=1.0):
+                continue
+            chunk = self.store.peek(self.batch_size)
+            if chunk is None:
+                self.stop_event.wait(1.0)
+                continue
+            last_id, batch = chunk
+            # The server stores these but must not act on them as live events
+            for payload in batch:
+                payload["replayed"] = True
+            if not self._publish(batch):
+                self.stop_event.wait(1.0)
+                continue
+            self.store.commit(last_id)
+            self.stop_event.wait(len(batch) / self.drain_rate)
+
+    def _send(self, items):
+        batch = [payload for _, payload in items]
+        if self.connected.is_set() and self._publish(batch):
+            return
+        if self.store is not None:
+            # The server timestamps on arrival; keep the time the reading was taken,
+            # i.e. its (monotonic) enqueue time on the wall clock.
+            offset = time.time() - time.monotonic()
+            for enqueued_at, payload in items:
+                payload.setdefault("ts", enqueued_at + offset)
+            self.store.append(batch)
+            return
+        with self.cond:
+            for payload in batch:
+                self._count_drop(payload.get("sensor_type"))
+
+    def close(self, timeout=5.0):
+        """Stop the sender, flushing whatever is still queued (to the store if offline)."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.stop_event.set()
+        self.thread.join(timeout)
+        if self.store is not None:
+            self.drain_thread.join(timeout)
+
+        with self.cond:
+            now = time.monotonic()
+            batches = [lane.take(len(lane.items), now) for lane in self.lanes.values() if lane.items]
+            self.queued = 0
+        for batch in batches:
+            self._send(batch)
+
+        if self.last_publish is not None and self.connected.is_set():
             try:
-                item = self.queue.get(timeout=1)
-                batch.append(item)
-            except Empty:
-                pass
-
-            now = time.time()
-            if (
-                len(batch) >= self.batch_size or
-                (batch and now - last_send >= self.send_interval)
-            ):
-                for payload in batch:
-                    topic = f"{self.base_topic}/{payload['sensor_type']}"
-                    self.client.publish(topic, json.dumps(payload))
-                batch.clear()
-                last_send = now
+                self.last_publish.wait_for_publish(timeout)
+            except (RuntimeError, ValueError) as e:
+                print(f"[MQTT] Nisu poslata sva merenja pre gašenja: {e}")
+        self.client.disconnect()
+        self.client.loop_stop()
+        if self.store is not None:
+            self.store.close()
+
+    def add_diagnostics(self, name, get_stats):
+        """Include `get_stats()` under `name` in every diagnostics message."""
+        self.diagnostics_sources[name] = get_stats
+
+    def _publish_diagnostics(self):
+        # Counters are cumulative since start; always JSON so any tool can read them.
+        stats = self.get_stats()
+        for name, get_stats in list(self.diagnostics_sources.items()):
+            stats[name] = get_stats()
+        self.client.publish(self.diagnostics_topic, json.dumps(stats))
+
+    def _publish(self, batch):
+        """Publish one batch; False if paho refused any message (e.g. not connected)."""
+        if self.batch_mode == self.MODE_FRAME:
+            messages = [(self.batch_topic, payload_codec.dumps(batch, self.payload_format))]
+        else:
+            messages = [
+                (f"{self.base_topic}/{payload['sensor_type']}", payload_codec.dumps(payload, self.payload_format))
+                for payload in batch
+            ]
+
+        for topic, data in messages:
+            info = self.client.publish(topic, data)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return False
+            self.last_publish = info
+        return True
@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class OfflineStore:
+    """SQLite store-and-forward buffer for readings that could not be published.
+
+    Rows are appended one transaction per batch and read back oldest-first.
+    The database runs in WAL mode with synchronous=NORMAL, so a commit is only
+    an append to the WAL file; the SD card sees an fsync when SQLite
+    checkpoints (every ~1000 pages) rather than on every batch. When the store
+    holds more than `max_rows` readings the oldest ones are evicted.
+    """
+
+    def __init__(self, path, max_rows=100000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS readings (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)"
+        )
+        self.db.commit()
+
+        self.pending = self.db.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        self.stored = 0
+        self.drained = 0
+        self.evicted = 0
+        if self.pending:
+            print(f"[STORE] {self.pending} neposlatih merenja u {self.path}")
+
+    def append(self, batch):
+        if not batch:
+            return
+        with self.lock:
+            self.db.executemany(
+                "INSERT INTO readings (payload) VALUES (?)",
+                [(json.dumps(payload),) for payload in batch],
+            )
+            self.pending += len(batch)
+            self.stored += len(batch)
+            overflow = self.pending - self.max_rows
+            if overflow > 0:
+                self.db.execute(
+                    "DELETE FROM readings WHERE id IN (SELECT id FROM readings ORDER BY id LIMIT ?)",
+                    (overflow,),
+                )
+                self.pending -= overflow
+                self.evicted += overflow
+            self.db.commit()
+
+    def peek(self, limit):
+        """Return (last_id, payloads) for the oldest `limit` readings, or None if empty."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, payload FROM readings ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        if not rows:
+            return None
+        return rows[-1][0], [json.loads(payload) for _, payload in rows]
+
+    def commit(self, last_id):
+        """Forget every reading up to and including `last_id` (after it was published)."""
+        with self.lock:
+            removed = self.db.execute("DELETE FROM readings WHERE id <= ?", (last_id,)).rowcount
+            self.db.commit()
+            self.pending -= removed
+            self.drained += removed
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "stored": self.stored,
+                "drained": self.drained,
+                "evicted": self.evicted,
+            }
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
@@ -0,0 +1,254 @@
+"""Compact binary wire format for sensor readings (shared by the Pis and the server).
+
+A frame carries one or more readings and is recognised by its first byte:
+JSON payloads always start with '{' or '[', binary frames with MAGIC. The
+server therefore accepts both formats on every topic without configuration.
+
+Frame layout (little endian):
+    B  MAGIC
+    B  VERSION
+    B  len(pi_id)        + pi_id (utf-8)
+    B  len(device_name)  + device_name (utf-8)
+    B  1 if the frame is a batch (decodes to a list), 0 for a single reading
+    H  reading count
+    readings...
+
+Reading layout:
+    B  sensor type id from SENSOR_TYPES (INLINE_TYPE: B len + utf-8 name follows)
+    B  flags: bit0 simulated, bit1 extras present, bits 4-7 value kind
+    .. value (see KIND_*)
+    [H len + JSON object of extra keys, when bit1 is set]
+"""
+import json
+import struct
+
+MAGIC = 0xB5
+VERSION = 1
+
+# Append-only: ids are the position in this tuple and must never be reused.
+SENSOR_TYPES = (
+    "door_button",
+    "door_motion",
+    "door_distance",
+    "door_membrane",
+    "door_light",
+    "door_buzzer",
+    "kitchen_button",
+    "kitchen_dht_humidity",
+    "kitchen_dht_temperature",
+    "gyroscope",
+    "display_4sd",
+    "bedroom_dht_humidity",
+    "bedroom_dht_temperature",
+    "master_dht_humidity",
+    "master_dht_temperature",
+    "bedroom_ir",
+    "rgb_led",
+    "lcd_message",
+    "gyroscope_window",
+)
+SENSOR_TYPE_IDS = {name: i for i, name in enumerate(SENSOR_TYPES)}
+INLINE_TYPE = 0xFF
+
+KIND_NONE = 0
+KIND_FLOAT = 1    # d
+KIND_INT = 2      # i
+KIND_BOOL = 3     # B
+KIND_STR = 4      # H len + utf-8
+KIND_GYRO = 5     # 6 x f, keys GYRO_KEYS
+KIND_JSON = 6     # H len + JSON
+
+GYRO_KEYS = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+_GYRO_KEYSET = frozenset(GYRO_KEYS)
+
+STANDARD_KEYS = ("pi_id", "device_name", "sensor_type", "simulated", "value")
+
+_HEADER = struct.Struct("<BB")
+_COUNT = struct.Struct("<BH")
+_READING = struct.Struct("<BB")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_F64 = struct.Struct("<d")
+_I32 = struct.Struct("<i")
+_GYRO = struct.Struct("<6f")
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+
+
+def is_binary(raw: bytes):
+    return len(raw) > 0 and raw[0] == MAGIC
+
+
+def _pack_str8(out, s):
+    data = s.encode()
+    if len(data) > 0xFF:
+        raise ValueError(f"'{s[:16]}...' is too long for the binary header")
+    out += _U8.pack(len(data))
+    out += data
+
+
+def _pack_str16(out, data: bytes):
+    out += _U16.pack(len(data))
+    out += data
+
+
+def _value_kind(value):
+    if value is None:
+        return KIND_NONE
+    if isinstance(value, bool):
+        return KIND_BOOL
+    if isinstance(value, int):
+        return KIND_INT if -2**31 <= value < 2**31 else KIND_JSON
+    if isinstance(value, float):
+        return KIND_FLOAT
+    if isinstance(value, str):
+        return KIND_STR
+    if isinstance(value, dict) and value.keys() == _GYRO_KEYSET:
+        for v in value.values():
+            if type(v) is not float and type(v) is not int:
+                return KIND_JSON
+        return KIND_GYRO
+    return KIND_JSON
+
+
+def _encode_reading(out, reading, pi_id, device_name):
+    sensor_type = reading["sensor_type"]
+    type_id = SENSOR_TYPE_IDS.get(sensor_type, INLINE_TYPE)
+
+    extras = {k: v for k, v in reading.items() if k not in STANDARD_KEYS}
+    if reading.get("pi_id") != pi_id:
+        extras["pi_id"] = reading.get("pi_id")
+    if reading.get("device_name") != device_name:
+        extras["device_name"] = reading.get("device_name")
+
+    value = reading.get("value")
+    kind = _value_kind(value)
+    flags = (1 if reading.get("simulated") else 0) | (2 if extras else 0) | (kind << 4)
+
+    out += _READING.pack(type_id, flags)
+    if type_id == INLINE_TYPE:
+        _pack_str8(out, sensor_type)
+
+    if kind == KIND_FLOAT:
+        out += _F64.pack(value)
+    elif kind == KIND_INT:
+        out += _I32.pack(value)
+    elif kind == KIND_BOOL:
+        out += _U8.pack(1 if value else 0)
+    elif kind == KIND_STR:
+        _pack_str16(out, value.encode())
+    elif kind == KIND_GYRO:
+        out += _GYRO.pack(*(value[k] for k in GYRO_KEYS))
+    elif kind == KIND_JSON:
+        _pack_str16(out, json.dumps(value, separators=(",", ":")).encode())
+
+    if extras:
+        _pack_str16(out, json.dumps(extras, separators=(",", ":")).encode())
+
+
+def encode(obj):
+    """Encode one reading dict, or a list of them, into a binary frame."""
+    is_batch = isinstance(obj, list)
+    readings = obj if is_batch else [obj]
+    if not readings:
+        raise ValueError("Cannot encode an empty batch")
+
+    pi_id = readings[0].get("pi_id") or ""
+    device_name = readings[0].get("device_name") or ""
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION))
+    _pack_str8(out, pi_id)
+    _pack_str8(out, device_name)
+    out += _COUNT.pack(1 if is_batch else 0, len(readings))
+    for reading in readings:
+        _encode_reading(out, reading, pi_id, device_name)
+    return bytes(out)
+
+
+def _float32_to_py(v):
+    # float32 carries ~7 significant digits; trim the binary noise so that
+    # e.g. 0.12 decodes as 0.12 and not 0.11999999731779099.
+    return float(f"{v:.7g}")
+
+
+def decode(raw: bytes):
+    """Decode a binary frame back into a reading dict (or a list for batches)."""
+    view = memoryview(raw)
+    magic, version = _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary sensor frame")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary frame version {version}")
+    pos = _HEADER.size
+
+    n = view[pos]
+    pi_id = bytes(view[pos + 1:pos + 1 + n]).decode()
+    pos += 1 + n
+    n = view[pos]
+    device_name = bytes(view[pos + 1:pos + 1 + n]).decode()
+    pos += 1 + n
+    is_batch, count = _COUNT.unpack_from(view, pos)
+    pos += _COUNT.size
+
+    readings = []
+    for _ in range(count):
+        type_id, flags = _READING.unpack_from(view, pos)
+        pos += _READING.size
+        if type_id == INLINE_TYPE:
+            n = view[pos]
+            sensor_type = bytes(view[pos + 1:pos + 1 + n]).decode()
+            pos += 1 + n
+        else:
+            sensor_type = SENSOR_TYPES[type_id]
+
+        kind = flags >> 4
+        if kind == KIND_NONE:
+            value = None
+        elif kind == KIND_FLOAT:
+            value = _F64.unpack_from(view, pos)[0]
+            pos += _F64.size
+        elif kind == KIND_INT:
+            value = _I32.unpack_from(view, pos)[0]
+            pos += _I32.size
+        elif kind == KIND_BOOL:
+            value = bool(view[pos])
+            pos += 1
+        elif kind in (KIND_STR, KIND_JSON):
+            n = _U16.unpack_from(view, pos)[0]
+            text = bytes(view[pos + 2:pos + 2 + n]).decode()
+            pos += 2 + n
+            value = text if kind == KIND_STR else json.loads(text)
+        elif kind == KIND_GYRO:
+            value = dict(zip(GYRO_KEYS, map(_float32_to_py, _GYRO.unpack_from(view, pos))))
+            pos += _GYRO.size
+        else:
+            raise ValueError(f"Unknown value kind {kind}")
+
+        reading = {
+            "pi_id": pi_id,
+            "device_name": device_name,
+            "sensor_type": sensor_type,
+            "simulated": bool(flags & 1),
+            "value": value,
+        }
+        if flags & 2:
+            n = _U16.unpack_from(view, pos)[0]
+            reading.update(json.loads(bytes(view[pos + 2:pos + 2 + n]).decode()))
+            pos += 2 + n
+        readings.append(reading)
+
+    return readings if is_batch else readings[0]
+
+
+def dumps(obj, payload_format=FORMAT_JSON):
+    if payload_format == FORMAT_BINARY:
+        return encode(obj)
+    return json.dumps(obj)
+
+
+def loads(raw: bytes):
+    """Decode either wire format; JSON and binary are told apart by the first byte."""
+    if is_binary(raw):
+        return decode(raw)
+    return json.loads(raw.decode())
@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _Job:
+    def __init__(self, name, period, fn, blocking, on_stop):
+        self.name = name
+        self.period = period
+        self.fn = fn
+        self.blocking = blocking
+        self.on_stop = on_stop
+        self.deadline = 0.0
+        self.future = None
+
+        self.started = 0
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0      # deadline reached while the previous run was still going
+        self.missed = 0        # whole periods skipped because the scheduler fell behind
+        self.jitter_total = 0.0
+        self.jitter_max = 0.0
+        self.duration_total = 0.0
+        self.duration_max = 0.0
+
+    def stats(self):
+        return {
+            "period_s": self.period,
+            "blocking": self.blocking,
+            "runs": self.runs,
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "missed": self.missed,
+            "avg_jitter_ms": self.jitter_total / self.started * 1000.0 if self.started else 0.0,
+            "max_jitter_ms": self.jitter_max * 1000.0,
+            "avg_duration_ms": self.duration_total / self.runs * 1000.0 if self.runs else 0.0,
+            "max_duration_ms": self.duration_max * 1000.0,
+        }
+
+
+class SensorScheduler:
+    """Runs every sensor read on one thread, at fixed periods on monotonic deadlines.
+
+    Deadlines advance by exactly `period` (no drift from the time the read
+    itself takes). Non-blocking reads run inline, one after another, so they
+    never touch GPIO/I2C at the same time. Blocking reads (DHT, UDS) are handed
+    to a small worker pool; if one is still running when its next deadline
+    comes, that slot is counted as an overrun and skipped instead of piling up.
+    """
+
+    def __init__(self, stop_event, workers=2):
+        self.stop_event = stop_event
+        self.jobs = {}
+        self.heap = []
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sensor-io")
+
+    def add(self, name, period, fn, blocking=False, on_stop=None):
+        """Call `fn()` every `period` s; `on_stop()` runs once when the scheduler stops."""
+        job = _Job(name, period, fn, blocking, on_stop)
+        job.deadline = time.monotonic()
+        with self.lock:
+            self.jobs[name] = job
+            heapq.heappush(self.heap, (job.deadline, next(self.seq), job))
+        return job
+
+    def run(self):
+        """Scheduler loop; returns (after stop hooks) once stop_event is set."""
+        while not self.stop_event.is_set():
+            with self.lock:
+                if not self.heap:
+                    deadline, job = None, None
+                else:
+                    deadline, _, job = self.heap[0]
+            if job is None:
+                self.stop_event.wait(0.5)
+                continue
+
+            delay = deadline - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+
+            with self.lock:
+                heapq.heappop(self.heap)
+            now = time.monotonic()
+            self._dispatch(job, now - deadline)
+
+            # Fixed-rate: the next slot is one period after the previous deadline;
+            # slots already in the past are skipped and counted.
+            next_deadline = deadline + job.period
+            if next_deadline <= now:
+                skipped = int((now - next_deadline) // job.period) + 1
+                job.missed += skipped
+                next_deadline += skipped * job.period
+            job.deadline = next_deadline
+            with self.lock:
+                heapq.heappush(self.heap, (next_deadline, next(self.seq), job))
+
+        self._shutdown()
+
+    def _dispatch(self, job, jitter):
+        if job.blocking:
+            if job.future is not None and not job.future.done():
+                job.overruns += 1
+                return
+            self._record_jitter(job, jitter)
+            job.future = self.pool.submit(self._execute, job)
+        else:
+            self._record_jitter(job, jitter)
+            self._execute(job)
+
+    def _record_jitter(self, job, jitter):
+        job.started += 1
+        job.jitter_total += jitter
+        if jitter > job.jitter_max:
+            job.jitter_max = jitter
+
+    def _execute(self, job):
+        start = time.monotonic()
+        try:
+            job.fn()
+        except Exception as e:
+            job.errors += 1
+            print(f"[SCHEDULER] {job.name} failed: {e}")
+            traceback.print_exc()
+        duration = time.monotonic() - start
+        job.runs += 1
+        job.duration_total += duration
+        if duration > job.duration_max:
+            job.duration_max = duration
+
+    def _shutdown(self):
+        self.pool.shutdown(wait=True)
+        for job in list(self.jobs.values()):
+            if job.on_stop is not None:
+                try:
+                    job.on_stop()
+                except Exception as e:
+                    print(f"[SCHEDULER] {job.name} stop hook failed: {e}")
+
+    def get_stats(self):
+        return {name: job.stats() for name, job in self.jobs.items()}
@@ -3,6 +3,8 @@ from flask_cors import CORS
 import json
 
 from influx_client import get_last, get_alarm_events, get_people_count_series
+from influx_writer import get_write_stats
+from mqtt_client import dispatcher, sender_diagnostics
 
 from backend import (
     init_mqtt_and_loops,
@@ -20,7 +22,9 @@ from backend import (
     COLORS,
     handle_ir_mqtt,
     activate_alarm,
-    people_count
+    people_count,
+    handlers,
+    tamper_detectors,
 )
 
 app = Flask(__name__)
@@ -29,7 +33,15 @@ init_mqtt_and_loops()
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "running"})
+    return jsonify({
+        "status": "running",
+        "influx_writer": get_write_stats(),
+        "ingest": dispatcher.get_timings(),
+        "routes": handlers.get_stats(),
+        "replayed_skipped": handlers.skipped_replayed,
+        "senders": sender_diagnostics,
+        "tamper": {pi_id: detector.get_stats() for pi_id, detector in tamper_detectors.items()},
+    })
 
 # ---------- UI Routes ----------
 
@@ -1,11 +1,12 @@
-from mqtt_client import start_mqtt
+from mqtt_client import start_mqtt, dispatcher
 from influx_writer import write_sensor_data
+from handler_registry import HandlerRegistry
+from tamper_detector import TamperDetector, AXES as GYRO_AXES
 
 import paho.mqtt.client as mqtt
 import threading
 import json
 import time
-import math
 from collections import deque
 
 # ========== GLOBAL STATE (shared sa app.py preko importa) ==========
@@ -14,7 +15,13 @@ door_light_state = {"on": False}
 
 light_timers = {}
 distance_history = {}
+# Burst readings whose spread (cm) is above this are too noisy for detect_direction
+MAX_DISTANCE_SPREAD = 5.0
 door_open_start = {}
+# Last state per (sensor_type, pi_id) of inputs that act only on 0 -> 1; the Pis
+# also send releases, repeats and heartbeats of an unchanged state
+input_state = {}
+tamper_detectors = {}  # {pi_id: TamperDetector}, fed by gyroscope samples and window summaries
 door_button_timers = {}
 
 security_state = {
@@ -245,167 +252,202 @@ def stopwatch_loop(pi_id, stop_event):
                     )
         time.sleep(1)
 
-# ========== MQTT CALLBACK – SENZORI I KOMANDE ==========
+# ========== MQTT HANDLERI – SENZORI I KOMANDE ==========
+# Rute se registruju deklarativno; handlers.dispatch dobija već dekodiran
+# IngestRecord od mqtt_client.dispatcher i bira handler po (category, sensor_type).
 
-def on_cmd_message(client, userdata, msg):
-    """Centralni MQTT handler: senzori + komande."""
-    try:
-        topic_parts = msg.topic.split("/")
-        if len(topic_parts) < 4:
-            return
+handlers = HandlerRegistry()
 
-        pi_id, category, device = topic_parts[1], topic_parts[2], topic_parts[3]
-        payload = json.loads(msg.payload.decode())
 
-        # Door motion
-        if category == "sensor" and payload.get("sensor_type") == "door_motion" and payload.get("value") == 1.0:
-            print(str(people_count) + " " + security_state["mode"] + "\n")
-            if pi_id == "PI1":
-                turn_light_for_10s(pi_id)
-            
-            detect_direction(pi_id)
-            if people_count == 0 and security_state["mode"] != "DISARMED":
-                activate_alarm()
-
-        # Door distance
-        if category == "sensor" and payload.get("sensor_type") == "door_distance":
-            value = payload.get("value")
-            distance_history.setdefault(pi_id, deque(maxlen=20)).append((time.time(), value))
-
-        # Door button
-        if category == "sensor" and payload.get("sensor_type") == "door_button":
-            value = payload.get("value")
-
-            if value == 1.0:
-                door_open_start[pi_id] = time.time()
-
-                old_timer = door_button_timers.get(pi_id)
-                if old_timer:
-                    old_timer.cancel()
-
-                def check_door_still_open():
-                    if pi_id in door_open_start:
-                        if security_state["mode"] == "ARMED":
-                            print("[SECURITY] Door opened. Starting entry delay...")
-                            security_state["mode"] = "ENTRY_DELAY"
-                            global entry_timer
-                            entry_timer = threading.Timer(10.0, activate_alarm)
-                            entry_timer.start()
-                        elif security_state["mode"] != "DISARMED":
-                            activate_alarm()
-                        else:
-                            activate_alarm()
-
-                t = threading.Timer(5.0, check_door_still_open)
-                door_button_timers[pi_id] = t
-                t.start()
+def is_rising_edge(record):
+    key = (record.sensor_type, record.pi_id)
+    active = record.payload.get("value") == 1.0
+    was_active = input_state.get(key, False)
+    input_state[key] = active
+    return active and not was_active
 
-            else:
-                door_open_start.pop(pi_id, None)
-                timer = door_button_timers.get(pi_id)
-                if timer:
-                    timer.cancel()
-                    door_button_timers.pop(pi_id, None)
-
-        # Kitchen button (BTN)
-        if category == "sensor" and payload.get("sensor_type") == "kitchen_button":
-            print("KITCHEN BUTTON " + str(pi_id))
-            with stopwatch_lock:
-                if stopwatch_state["blink"]:
-                    stopwatch_state["blink"] = False
-                    command_client.publish(
-                        f"smart_home/{pi_id}/cmd/4sd",
-                        json.dumps({"value": "0000", "blink": False}),
-                    )
-                elif stopwatch_state["running"]:
-                    stopwatch_state["time_sec"] += stopwatch_state["add_sec"]
-
-        # Door membrane (PIN)
-        if category == "sensor" and payload.get("sensor_type") == "door_membrane":
-            global entered_pin
-            print("DOOR MEMBRANE " + str(pi_id))
-            key = payload.get("value")
-
-            if key is None:
-                return
-
-            entered_pin += str(key)
-
-            if len(entered_pin) == 4:
-                print(f"[SECURITY] Entered PIN: {entered_pin}")
-                if entered_pin == VALID_PIN:
-                    print("[SECURITY] Correct PIN")
-                    if security_state["mode"] in ["ARMING", "ARMED", "ENTRY_DELAY", "ALARM"]:
-                        disarm_system()
-                    else:
-                        arm_system()
+
+@handlers.route("sensor", "door_motion")
+def handle_door_motion(record):
+    if not is_rising_edge(record):
+        return
+
+    pi_id = record.pi_id
+    print(str(people_count) + " " + security_state["mode"] + "\n")
+    if pi_id == "PI1":
+        turn_light_for_10s(pi_id)
+
+    detect_direction(pi_id)
+    if people_count == 0 and security_state["mode"] != "DISARMED":
+        activate_alarm()
+
+
+@handlers.route("sensor", "door_distance")
+def handle_door_distance(record):
+    value = record.payload.get("value")
+    spread = record.payload.get("spread")
+    if spread is not None and spread > MAX_DISTANCE_SPREAD:
+        return
+    distance_history.setdefault(record.pi_id, deque(maxlen=20)).append((time.time(), value))
+
+
+@handlers.route("sensor", "door_button")
+def handle_door_button(record):
+    pi_id = record.pi_id
+    value = record.payload.get("value")
+
+    if value == 1.0:
+        # Repeats and heartbeats while the door stays open keep the original timer
+        if pi_id in door_open_start:
+            return
+        door_open_start[pi_id] = time.time()
+
+        old_timer = door_button_timers.get(pi_id)
+        if old_timer:
+            old_timer.cancel()
+
+        def check_door_still_open():
+            global entry_timer
+            if pi_id in door_open_start:
+                if security_state["mode"] == "ARMED":
+                    print("[SECURITY] Door opened. Starting entry delay...")
+                    security_state["mode"] = "ENTRY_DELAY"
+                    entry_timer = threading.Timer(10.0, activate_alarm)
+                    entry_timer.start()
+                elif security_state["mode"] != "DISARMED":
+                    activate_alarm()
                 else:
-                    print("[SECURITY] Incorrect PIN")
                     activate_alarm()
 
-                entered_pin = ""
+        t = threading.Timer(5.0, check_door_still_open)
+        door_button_timers[pi_id] = t
+        t.start()
 
-        # GSG movement
-        if category == "sensor" and payload.get("sensor_type") == "gyroscope":
-            ax = payload.get("accel_x", 0)
-            ay = payload.get("accel_y", 0)
-            az = payload.get("accel_z", 0)
-            magnitude = math.sqrt(ax * ax + ay * ay + az * az)
-            if magnitude > 1.5 or magnitude < 0.5:
-                if security_state["mode"] == "ARMED":
-                    activate_alarm("Icon movement detected")
+    else:
+        door_open_start.pop(pi_id, None)
+        timer = door_button_timers.get(pi_id)
+        if timer:
+            timer.cancel()
+            door_button_timers.pop(pi_id, None)
 
-        # DHT sensors
-        if category == "sensor" and payload.get("sensor_type", "").endswith(("_dht_humidity", "_dht_temperature")):
-            sensor_type = payload.get("sensor_type")
-            value = payload.get("value")
-            room = sensor_type.replace("_dht_humidity", "").replace("_dht_temperature", "")
-            
-            dht_data.setdefault(pi_id, {}).setdefault(
-                room, {"humidity": None, "temperature": None}
+
+@handlers.route("sensor", "kitchen_button")
+def handle_kitchen_button(record):
+    """Kitchen button (BTN) adds time to / acknowledges the 4SD stopwatch."""
+    if not is_rising_edge(record):
+        return
+    pi_id = record.pi_id
+    print("KITCHEN BUTTON " + str(pi_id))
+    with stopwatch_lock:
+        if stopwatch_state["blink"]:
+            stopwatch_state["blink"] = False
+            command_client.publish(
+                f"smart_home/{pi_id}/cmd/4sd",
+                json.dumps({"value": "0000", "blink": False}),
             )
-            
-            if sensor_type.endswith("_humidity"):
-                dht_data[pi_id][room]["humidity"] = value
+        elif stopwatch_state["running"]:
+            stopwatch_state["time_sec"] += stopwatch_state["add_sec"]
+
+
+@handlers.route("sensor", "door_membrane")
+def handle_door_membrane(record):
+    global entered_pin
+    print("DOOR MEMBRANE " + str(record.pi_id))
+    key = record.payload.get("value")
+
+    if key is None:
+        return
+
+    entered_pin += str(key)
+
+    if len(entered_pin) == 4:
+        print(f"[SECURITY] Entered PIN: {entered_pin}")
+        if entered_pin == VALID_PIN:
+            print("[SECURITY] Correct PIN")
+            if security_state["mode"] in ["ARMING", "ARMED", "ENTRY_DELAY", "ALARM"]:
+                disarm_system()
             else:
-                dht_data[pi_id][room]["temperature"] = value
-                
-            global is_lcd_cycle_running
-            if not is_lcd_cycle_running:
-                is_lcd_cycle_running = True
-                start_lcd_cycle()
-
-        # IR receiver
-        if category == "sensor" and payload.get("sensor_type") == "bedroom_ir":
-            button_value = payload.get("value")
-            handle_ir_mqtt(pi_id, IR_TO_COLOR.get(button_value))
-
-        # Commands (door_light, door_buzzer)
-        if category == "cmd":
-            action = payload.get("action")
-            if device in ["door_light", "door_buzzer"]:
-                val = 1.0 if action == "on" else 0.0
-                write_influx(pi_id, device, val)
-
-    except Exception as e:
-        print(f"[CMD ERROR] {e}")
-        import traceback
-        traceback.print_exc()
+                arm_system()
+        else:
+            print("[SECURITY] Incorrect PIN")
+            activate_alarm()
+
+        entered_pin = ""
+
+
+def check_tamper(pi_id, sample, t, weight=1, spread=None):
+    detector = tamper_detectors.get(pi_id)
+    if detector is None:
+        detector = tamper_detectors[pi_id] = TamperDetector()
+    # The detector keeps learning while disarmed, so it is warm once the system is armed
+    if detector.update(sample, t, weight, spread) and security_state["mode"] == "ARMED":
+        activate_alarm("Icon movement detected")
+
+
+@handlers.route("sensor", "gyroscope")
+def handle_gyroscope(record):
+    # The Pi sends the six axes as the reading's value
+    sample = record.payload.get("value")
+    if not isinstance(sample, dict):
+        return
+    check_tamper(record.pi_id, sample, record.received_at)
+
+
+@handlers.route("sensor", "gyroscope_window")
+def handle_gyroscope_window(record):
+    """With GSG_WINDOW set the Pi sends per-window means plus only the outlier samples."""
+    summary = record.payload.get("value")
+    if not isinstance(summary, dict):
+        return
+    sample = {axis: summary.get(f"{axis}_mean", 0.0) for axis in GYRO_AXES}
+    spread = summary.get("peak_magnitude", 0.0) - summary.get("min_magnitude", 0.0)
+    check_tamper(record.pi_id, sample, record.received_at, weight=summary.get("samples", 1), spread=spread)
+
+
+@handlers.route("sensor", suffix=("_dht_humidity", "_dht_temperature"))
+def handle_dht(record):
+    """Collects DHT readings for the LCD rotation."""
+    global is_lcd_cycle_running
+
+    pi_id = record.pi_id
+    sensor_type = record.sensor_type
+    value = record.payload.get("value")
+    room = sensor_type.replace("_dht_humidity", "").replace("_dht_temperature", "")
+
+    dht_data.setdefault(pi_id, {}).setdefault(
+        room, {"humidity": None, "temperature": None}
+    )
+
+    if sensor_type.endswith("_humidity"):
+        dht_data[pi_id][room]["humidity"] = value
+    else:
+        dht_data[pi_id][room]["temperature"] = value
+
+    if not is_lcd_cycle_running:
+        is_lcd_cycle_running = True
+        start_lcd_cycle()
+
+
+@handlers.route("sensor", "bedroom_ir")
+def handle_ir(record):
+    button_value = record.payload.get("value")
+    handle_ir_mqtt(record.pi_id, IR_TO_COLOR.get(button_value))
+
+
+@handlers.route("cmd", "door_light")
+@handlers.route("cmd", "door_buzzer")
+def handle_actuator_command(record):
+    """Persist actuator state for commands (door_light, door_buzzer)."""
+    action = record.payload.get("action")
+    val = 1.0 if action == "on" else 0.0
+    write_influx(record.pi_id, record.device, val)
 
 # ========== INIT ==========
 
 def init_mqtt_and_loops():
-    mqtt_thread = threading.Thread(target=start_mqtt, daemon=True)
-    mqtt_thread.start()
-    print("MQTT sensor listener started")
-
-    cmd_listener = mqtt.Client(client_id="flask_cmd_listener")
-    cmd_listener.on_message = on_cmd_message
-    cmd_listener.connect("localhost", 1883, 60)
-    cmd_listener.subscribe("smart_home/+/cmd/#")
-    cmd_listener.subscribe("smart_home/+/sensor/#")
-    cmd_listener.loop_start()
-    print("Command listener started")
+    dispatcher.register("handlers", handlers.dispatch, categories=("sensor", "cmd"))
+    start_mqtt()
+    print("MQTT ingest listener started")
 
     stop_event = threading.Event()
     threading.Thread(
@@ -0,0 +1,71 @@
+"""Microbenchmark: line_protocol.encode_sensor_payload vs. the old Point path.
+
+Run from the server directory:  python bench_line_protocol.py
+"""
+import timeit
+
+from influxdb_client import Point, WritePrecision
+
+from line_protocol import encode_sensor_payload
+
+
+def point_line(payload: dict, timestamp_ns=None):
+    """The original write_sensor_data Point chain, serialized."""
+    point = (
+        Point(payload["sensor_type"])
+        .tag("pi_id", payload["pi_id"])
+        .tag("device_name", payload["device_name"])
+        .tag("simulated", str(payload["simulated"]))
+    )
+    if payload.get("quality") is not None:
+        point = point.tag("quality", payload["quality"])
+    if timestamp_ns is not None:
+        point = point.time(timestamp_ns, WritePrecision.NS)
+    value = payload["value"]
+    if isinstance(value, (int, float)):
+        point = point.field("value_num", float(value))
+    elif isinstance(value, bool):
+        point = point.field("value_bool", value)
+    else:
+        point = point.field("value_str", str(value))
+    return point.to_line_protocol()
+
+
+SAMPLES = [
+    {"pi_id": "PI1", "device_name": "SmartDoor", "sensor_type": "door_button", "simulated": True, "value": 0},
+    {"pi_id": "PI1", "device_name": "SmartDoor", "sensor_type": "door_distance", "simulated": True, "value": 123.45},
+    {"pi_id": "PI1", "device_name": "SmartDoor", "sensor_type": "door_distance", "simulated": False, "value": 98.7,
+     "quality": "held"},
+    {"pi_id": "PI2", "device_name": "KitchenController", "sensor_type": "kitchen_dht_temperature", "simulated": False, "value": 23.0},
+    {"pi_id": "PI2", "device_name": "KitchenController", "sensor_type": "door_motion", "simulated": False, "value": True},
+    {"pi_id": "PI2", "device_name": "KitchenController", "sensor_type": "display_4sd", "simulated": True, "value": "0130"},
+    {"pi_id": "PI1", "device_name": "SmartDoor", "sensor_type": "door_membrane", "simulated": True, "value": "#"},
+    {"pi_id": "PI3", "device_name": "RoomController", "sensor_type": "lcd_message", "simulated": True, "value": 'Bedroo T:22.0C\nH:45.0%'},
+    {"pi_id": "PI2", "device_name": "KitchenController", "sensor_type": "gyroscope", "simulated": True,
+     "value": {"accel_x": 0.1, "accel_y": -0.2, "accel_z": 0.98, "gyro_x": 1.5, "gyro_y": -3.0, "gyro_z": 0.0}},
+    {"pi_id": "SERVER", "device_name": "Security System", "sensor_type": "alarm event", "simulated": False, "value": 'a "quoted" \\ path'},
+    {"pi_id": "PI1", "device_name": "SmartDoor", "sensor_type": "door_distance", "simulated": True, "value": 1e21},
+    {"pi_id": "PI1", "device_name": "SmartDoor", "sensor_type": "door_distance", "simulated": True, "value": float("nan")},
+]
+
+
+def check_identical():
+    for timestamp_ns in (None, 1700000000123456789):
+        for payload in SAMPLES:
+            expected = point_line(payload, timestamp_ns)
+            actual = encode_sensor_payload(payload, timestamp_ns)
+            if (actual or "") != expected:
+                raise AssertionError(f"mismatch for {payload!r}:\n  point:   {expected!r}\n  encoder: {actual!r}")
+    print(f"byte-identical on {len(SAMPLES)} payloads, with and without timestamp")
+
+
+def bench(number=20000):
+    for name, fn in (("Point", point_line), ("encoder", encode_sensor_payload)):
+        t = timeit.timeit(lambda: [fn(p) for p in SAMPLES], number=number)
+        per_point = t / (number * len(SAMPLES)) * 1e6
+        print(f"{name:8s} {per_point:7.2f} us/point")
+
+
+if __name__ == "__main__":
+    check_identical()
+    bench()
@@ -0,0 +1,204 @@
+"""Replay gyroscope streams through TamperDetector and the old fixed threshold.
+
+Each stream is replayed twice: raw, as the server gets it with GSG_WINDOW = 0,
+and windowed, as with the default GSG_WINDOW = 2.0 (the Pi's GyroAggregator
+sends one summary per window plus only the samples outside [0.5, 1.5] g).
+Reported per stream and detector:
+
+  false alarms  alarm onsets outside labelled tamper episodes, per hour
+                (a sensor left displaced after tampering is still an episode)
+  fp time       share of normal time spent in alarm
+  detected      tamper episodes alarmed before they end (+ 2 s)
+  latency       mean / max time from episode start to the alarm
+
+Without arguments synthetic 10 Hz streams are generated. Recordings are CSV
+files with a header t,accel_x,accel_y,accel_z,gyro_x,gyro_y,gyro_z[,tamper]
+(t in s, accel in g, gyro in deg/s, tamper 0/1).
+
+Run from the server directory:  python bench_tamper_detector.py [recording.csv ...]
+"""
+import csv
+import math
+import os
+import random
+import sys
+
+from tamper_detector import AXES, TamperDetector
+
+# GyroAggregator lives with the PI2 code in smart-home-system/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from components.sensors.gyroscope import GyroAggregator  # noqa: E402
+
+RATE = 10.0   # GSG_DELAY = 0.1
+WINDOW = 2.0  # GSG_WINDOW
+GRACE = 2.0   # an alarm this long after an episode still counts as detecting it
+
+
+def _rotate_x(vector, degrees):
+    c, s = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    x, y, z = vector
+    return [x, c * y - s * z, s * y + c * z]
+
+
+class StreamBuilder:
+    """Builds a labelled 10 Hz stream of a sensor at rest plus disturbances."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.rows = []
+        self.tilt = 0.0
+
+    def _row(self, accel, gyro, tamper):
+        t = len(self.rows) / RATE
+        noisy_accel = [a + self.rng.gauss(0.0, 0.01) for a in accel]
+        noisy_gyro = [g + self.rng.gauss(0.0, 0.5) for g in gyro]
+        self.rows.append((t, noisy_accel + noisy_gyro, tamper))
+
+    def rest(self, seconds, knock_every=None):
+        """Still sensor; optional single-sample knocks (+0.7 g, not tamper).
+
+        Rest away from the original orientation is labelled tamper: the
+        sensor has been displaced.
+        """
+        displaced = abs(self.tilt) > 1.0
+        for i in range(int(seconds * RATE)):
+            accel = _rotate_x([0.0, 0.0, 1.0], self.tilt)
+            if knock_every and i and i % int(knock_every * RATE) == 0:
+                accel = [accel[0], accel[1], accel[2] + 0.7]
+            self._row(accel, [0.0, 0.0, 0.0], displaced)
+        return self
+
+    def slow_tilt(self, seconds, degrees):
+        """Turned slowly: the magnitude stays at 1 g the whole time."""
+        steps = int(seconds * RATE)
+        rate = degrees / seconds
+        for _ in range(steps):
+            self.tilt += degrees / steps
+            self._row(_rotate_x([0.0, 0.0, 1.0], self.tilt), [rate, 0.0, 0.0], True)
+        return self
+
+    def shake(self, seconds, amplitude, frequency=3.0):
+        """Shaken along z by +-amplitude g."""
+        for i in range(int(seconds * RATE)):
+            extra = amplitude * math.sin(2 * math.pi * frequency * i / RATE + 0.3)
+            accel = _rotate_x([0.0, 0.0, 1.0 + extra], self.tilt)
+            self._row(accel, [self.rng.gauss(0.0, 5.0) for _ in range(3)], True)
+        return self
+
+    def lift(self, seconds, degrees):
+        """Picked up, carried and put down turned by `degrees`."""
+        steps = int(seconds * RATE)
+        for i in range(steps):
+            self.tilt += degrees / steps
+            swing = 0.4 * math.sin(math.pi * i / steps)
+            accel = _rotate_x([0.1 * self.rng.uniform(-1, 1), 0.0, 1.0 + swing], self.tilt)
+            self._row(accel, [degrees / seconds * 3, self.rng.gauss(0.0, 20.0), 0.0], True)
+        return self
+
+
+def synthetic_streams():
+    return {
+        "rest 30 min, knock/2 min": StreamBuilder(1).rest(1800, knock_every=120).rows,
+        "slow tilt 20 deg / 60 s": StreamBuilder(2).rest(120).slow_tilt(60, 20).rest(60).rows,
+        "gentle shake +-0.3 g": StreamBuilder(3).rest(120).shake(5, 0.3).rest(60).rows,
+        "lift and turn 45 deg": StreamBuilder(4).rest(120).lift(4, 45).rest(30).rows,
+    }
+
+
+def load_recording(path):
+    rows = []
+    with open(path, newline="") as f:
+        for record in csv.DictReader(f):
+            rows.append((float(record["t"]), [float(record[axis]) for axis in AXES],
+                         record.get("tamper", "0").strip() in ("1", "true", "True")))
+    return rows
+
+
+def windowed(rows):
+    """What the server receives with GSG_WINDOW: (t, sample, weight) for outliers and summaries."""
+    aggregator = GyroAggregator(WINDOW)
+    aggregator._reset(rows[0][0])
+    for t, values, _ in rows:
+        tamper, summary = aggregator.add(dict(zip(AXES, values)), now=t)
+        if tamper is not None:
+            yield t, tamper, 1, None
+        if summary is not None:
+            yield (t, {axis: summary[f"{axis}_mean"] for axis in AXES}, summary["samples"],
+                   summary["peak_magnitude"] - summary["min_magnitude"])
+
+
+def raw(rows):
+    for t, values, _ in rows:
+        yield t, dict(zip(AXES, values)), 1, None
+
+
+class FixedThreshold:
+    """The old handle_gyroscope check, per message."""
+
+    def update(self, sample, t, weight=1, spread=None):
+        magnitude = math.sqrt(sum(sample[axis] ** 2 for axis in AXES[:3]))
+        return magnitude > 1.5 or magnitude < 0.5
+
+
+def episodes(rows):
+    spans, start = [], None
+    for t, _, tamper in rows:
+        if tamper and start is None:
+            start = t
+        elif not tamper and start is not None:
+            spans.append((start, t))
+            start = None
+    if start is not None:
+        spans.append((start, rows[-1][0]))
+    return spans
+
+
+def evaluate(rows, messages, detector):
+    spans = episodes(rows)
+
+    def in_episode(t):
+        return any(start <= t <= end + GRACE for start, end in spans)
+
+    alarm_times, false_alarms = [], 0
+    normal_time = alarm_normal_time = 0.0
+    previous_t, previous_alarm = None, False
+    for t, sample, weight, spread in messages:
+        alarm = detector.update(sample, t, weight, spread)
+        if previous_t is not None and not in_episode(previous_t):
+            normal_time += t - previous_t
+            if previous_alarm:
+                alarm_normal_time += t - previous_t
+        if alarm and not previous_alarm:
+            if in_episode(t):
+                alarm_times.append(t)
+            else:
+                false_alarms += 1
+        previous_t, previous_alarm = t, alarm
+
+    latencies = []
+    for start, end in spans:
+        hits = [t for t in alarm_times if start <= t <= end + GRACE]
+        if hits:
+            latencies.append(hits[0] - start)
+    hours = normal_time / 3600.0
+    return {
+        "false_per_h": false_alarms / hours if hours else 0.0,
+        "fp_time": alarm_normal_time / normal_time if normal_time else 0.0,
+        "detected": f"{len(latencies)}/{len(spans)}",
+        "latency": (f"{sum(latencies) / len(latencies):.1f} / {max(latencies):.1f} s" if latencies else "-"),
+    }
+
+
+def main(paths):
+    streams = {os.path.basename(path): load_recording(path) for path in paths} or synthetic_streams()
+    print(f"{'stream':<28} {'input':<9} {'detector':<9} {'false/h':>8} {'fp time':>8} {'detected':>9}  latency (mean / max)")
+    for name, rows in streams.items():
+        for mode, replay in (("raw", raw), ("windowed", windowed)):
+            for label, detector in (("fixed", FixedThreshold()), ("stream", TamperDetector())):
+                result = evaluate(rows, replay(rows), detector)
+                print(f"{name:<28} {mode:<9} {label:<9} {result['false_per_h']:>8.1f} {result['fp_time']:>8.2%} "
+                      f"{result['detected']:>9}  {result['latency']}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,9 +1,25 @@
+from pathlib import Path
+
 INFLUX_URL = "http://localhost:8086"
 INFLUX_TOKEN = "TOKEN"
 INFLUX_ORG = "iot"
 INFLUX_BUCKET = "iot_sensors"
 
+# Async write pipeline (influx_writer.InfluxBatchWriter)
+INFLUX_BATCH_SIZE = 500          # flush when this many points are buffered
+INFLUX_FLUSH_INTERVAL = 1.0      # ...or when the oldest buffered point is this old (s)
+INFLUX_MAX_QUEUE = 20000         # hard cap on buffered points
+INFLUX_MAX_RETRIES = 5
+INFLUX_RETRY_BACKOFF = 0.5       # first retry delay (s), doubled on every attempt
+INFLUX_RETRY_BACKOFF_MAX = 10.0
+
+# On-disk spool for batches InfluxDB could not take (influx_spool.WriteSpool)
+INFLUX_SPOOL_DIR = Path(__file__).resolve().parent / "spool"
+INFLUX_SPOOL_SEGMENT_SIZE = 8 * 1024 * 1024
+INFLUX_SPOOL_MAX_BYTES = 512 * 1024 * 1024
+INFLUX_SPOOL_REPLAY_RATE = 5000  # points/s replayed once InfluxDB is back
+
 # MQTT_BROKER = "192.168.107.106"
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
-MQTT_TOPIC = "smart_home/#"
\ No newline at end of file
+MQTT_TOPIC = "smart_home/#"
@@ -0,0 +1,124 @@
+import re
+import threading
+import time
+import traceback
+from bisect import bisect_left
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+RESOLVE_CACHE_MAX = 4096
+
+
+class RouteStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms, failed):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if failed:
+            self.errors += 1
+
+    def as_dict(self):
+        labels = [str(b) for b in LATENCY_BUCKETS_MS] + ["+Inf"]
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "histogram_ms": dict(zip(labels, self.buckets)),
+        }
+
+
+class HandlerRegistry:
+    """Routes IngestRecords to handlers by (category, name) in O(1).
+
+    `name` is the payload's sensor_type, or the topic device for messages that
+    carry none (commands). Exact routes are a dict lookup. Suffix and regex
+    routes are compiled when registered and the handler list resolved for each
+    name is memoized, so patterns run once per distinct sensor type rather
+    than once per message.
+
+    Readings a Pi replays from its offline store (payload "replayed") are
+    old news: they still reach InfluxDB through the persistence consumer,
+    but only routes registered with replayed=True see them here.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.exact = {}        # (category, name) -> [(route_id, fn)]
+        self.patterns = {}     # category -> [(compiled regex, route_id, fn)]
+        self.resolved = {}     # (category, name) -> [(route_id, fn)]
+        self.stats = {}        # route_id -> RouteStats
+        self.replay_routes = set()  # (route_id, fn) that also handle replayed readings
+        self.skipped_replayed = 0
+
+    def route(self, category, name=None, suffix=None, pattern=None, replayed=False):
+        """Decorator registering `fn(record)` for an exact name, a suffix or a regex."""
+        def decorator(fn):
+            self.add_route(fn, category, name=name, suffix=suffix, pattern=pattern, replayed=replayed)
+            return fn
+        return decorator
+
+    def add_route(self, fn, category, name=None, suffix=None, pattern=None, replayed=False):
+        if sum(x is not None for x in (name, suffix, pattern)) != 1:
+            raise ValueError("Exactly one of name, suffix or pattern is required")
+
+        with self.lock:
+            if name is not None:
+                route_id = f"{category}:{name}"
+                self.exact.setdefault((category, name), []).append((route_id, fn))
+            else:
+                if suffix is not None:
+                    suffixes = (suffix,) if isinstance(suffix, str) else tuple(suffix)
+                    regex = "(?:" + "|".join(re.escape(s) for s in suffixes) + ")$"
+                    route_id = f"{category}:*{'|'.join(suffixes)}"
+                else:
+                    regex = pattern
+                    route_id = f"{category}:/{pattern}/"
+                self.patterns.setdefault(category, []).append((re.compile(regex), route_id, fn))
+            self.stats.setdefault(route_id, RouteStats())
+            if replayed:
+                self.replay_routes.add((route_id, fn))
+            self.resolved.clear()
+
+    def _resolve(self, category, name):
+        key = (category, name)
+        handlers = self.resolved.get(key)
+        if handlers is not None:
+            return handlers
+
+        handlers = list(self.exact.get(key, ()))
+        if isinstance(name, str):
+            for regex, route_id, fn in self.patterns.get(category, ()):
+                if regex.search(name):
+                    handlers.append((route_id, fn))
+        with self.lock:
+            if len(self.resolved) >= RESOLVE_CACHE_MAX:
+                self.resolved.clear()
+            self.resolved[key] = handlers
+        return handlers
+
+    def dispatch(self, record):
+        name = record.sensor_type if record.sensor_type is not None else record.device
+        replayed = record.payload.get("replayed", False)
+        for route_id, fn in self._resolve(record.category, name):
+            if replayed and (route_id, fn) not in self.replay_routes:
+                self.skipped_replayed += 1
+                continue
+            start = time.perf_counter()
+            failed = False
+            try:
+                fn(record)
+            except Exception as e:
+                failed = True
+                print(f"[HANDLER] {route_id} failed: {e}")
+                traceback.print_exc()
+            self.stats[route_id].observe((time.perf_counter() - start) * 1000.0, failed)
+
+    def get_stats(self):
+        return {route_id: s.as_dict() for route_id, s in self.stats.items()}
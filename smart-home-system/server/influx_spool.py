@@ -0,0 +1,240 @@
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+
+class SpoolSegment:
+    """One preallocated, memory-mapped, append-only segment file.
+
+    Frames are `<length, point count, crc32>` followed by the payload. The
+    file is zero-filled on creation, so a zero length marks the end of data;
+    a frame with a bad checksum (torn write) is treated as the end as well.
+    """
+
+    HEADER = struct.Struct("<III")
+
+    def __init__(self, path, size=None):
+        self.path = Path(path)
+        if size is not None:
+            with open(self.path, "wb") as f:
+                f.truncate(size)
+        self.file = open(self.path, "r+b")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.mm = mmap.mmap(self.file.fileno(), self.size)
+        self.write_offset = 0
+        self.frames = 0
+        if size is None:
+            self._recover()
+
+    def _recover(self):
+        offset = 0
+        while True:
+            frame = self.read_at(offset)
+            if frame is None:
+                break
+            offset = frame[2]
+            self.frames += 1
+        self.write_offset = offset
+
+    def fits(self, payload_len):
+        return self.write_offset + self.HEADER.size + payload_len <= self.size
+
+    def append(self, payload: bytes, count: int):
+        end = self.write_offset + self.HEADER.size + len(payload)
+        self.mm[self.write_offset + self.HEADER.size:end] = payload
+        # Header goes in last so a crash mid-copy never exposes a half frame.
+        self.mm[self.write_offset:self.write_offset + self.HEADER.size] = self.HEADER.pack(
+            len(payload), count, zlib.crc32(payload)
+        )
+        self.mm.flush()
+        self.write_offset = end
+        self.frames += 1
+
+    def read_at(self, offset):
+        """Return (payload, count, next_offset) or None at the end of data."""
+        if offset + self.HEADER.size > self.size:
+            return None
+        length, count, crc = self.HEADER.unpack_from(self.mm, offset)
+        start = offset + self.HEADER.size
+        if length == 0 or start + length > self.size:
+            return None
+        payload = bytes(self.mm[start:start + length])
+        if zlib.crc32(payload) != crc:
+            return None
+        return payload, count, start + length
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class WriteSpool:
+    """Write-ahead spool of line-protocol batches that could not reach InfluxDB.
+
+    Batches are appended to the newest segment and read back oldest-first. The
+    read position is kept in a small cursor file, so a restart resumes where
+    the replay stopped. Segments are rotated at `segment_size`; when the total
+    would exceed `max_bytes`, the oldest segment is discarded.
+    """
+
+    CURSOR_FILE = "cursor"
+
+    def __init__(self, directory, segment_size, max_bytes):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.has_data = threading.Event()
+
+        self.segments = {}
+        for path in sorted(self.dir.glob("segment-*.log")):
+            seq = int(path.stem.split("-")[1])
+            self.segments[seq] = SpoolSegment(path)
+
+        self.read_seq, self.read_offset = self._load_cursor()
+        if not self.segments:
+            self._new_segment(self.read_seq, self.segment_size)
+        if self.read_seq not in self.segments:
+            self.read_seq, self.read_offset = min(self.segments), 0
+
+        self.stats = {
+            "spooled": 0,
+            "replayed": 0,
+            "dropped_disk": 0,
+            "pending": self._count_pending(),
+        }
+        if self.stats["pending"]:
+            self.has_data.set()
+
+    # ----- cursor -----
+
+    def _load_cursor(self):
+        try:
+            seq, offset = (self.dir / self.CURSOR_FILE).read_text().split()
+            return int(seq), int(offset)
+        except (OSError, ValueError):
+            return (min(self.segments) if self.segments else 1), 0
+
+    def _save_cursor(self):
+        tmp = self.dir / (self.CURSOR_FILE + ".tmp")
+        tmp.write_text(f"{self.read_seq} {self.read_offset}")
+        os.replace(tmp, self.dir / self.CURSOR_FILE)
+
+    def _count_pending(self):
+        pending = 0
+        for seq in sorted(self.segments):
+            if seq < self.read_seq:
+                continue
+            offset = self.read_offset if seq == self.read_seq else 0
+            segment = self.segments[seq]
+            while True:
+                frame = segment.read_at(offset)
+                if frame is None:
+                    break
+                pending += frame[1]
+                offset = frame[2]
+        return pending
+
+    # ----- segments -----
+
+    def _segment_path(self, seq):
+        return self.dir / f"segment-{seq:08d}.log"
+
+    def _new_segment(self, seq, size):
+        self.segments[seq] = SpoolSegment(self._segment_path(seq), size)
+        return self.segments[seq]
+
+    def _disk_usage(self):
+        return sum(s.size for s in self.segments.values())
+
+    def _drop_oldest(self):
+        seq = min(self.segments)
+        segment = self.segments.pop(seq)
+        lost = 0
+        offset = self.read_offset if seq == self.read_seq else 0
+        if seq >= self.read_seq:
+            while True:
+                frame = segment.read_at(offset)
+                if frame is None:
+                    break
+                lost += frame[1]
+                offset = frame[2]
+        segment.remove()
+        if seq >= self.read_seq:
+            self.read_seq, self.read_offset = min(self.segments), 0
+            self._save_cursor()
+        self.stats["dropped_disk"] += lost
+        self.stats["pending"] -= lost
+        print(f"[SPOOL] Disk budget exceeded, discarded segment {seq} ({lost} points)")
+
+    # ----- public API -----
+
+    def pending(self):
+        return self.stats["pending"] > 0
+
+    def append(self, lines):
+        if not lines:
+            return
+        payload = "\n".join(lines).encode()
+        with self.lock:
+            seq = max(self.segments)
+            segment = self.segments[seq]
+            if not segment.fits(len(payload)):
+                size = max(self.segment_size, SpoolSegment.HEADER.size * 2 + len(payload))
+                while len(self.segments) > 1 and self._disk_usage() + size > self.max_bytes:
+                    self._drop_oldest()
+                segment = self._new_segment(seq + 1, size)
+            segment.append(payload, len(lines))
+            self.stats["spooled"] += len(lines)
+            self.stats["pending"] += len(lines)
+        self.has_data.set()
+
+    def peek(self):
+        """Return (position, line-protocol text, point count) of the oldest unread batch."""
+        with self.lock:
+            while True:
+                segment = self.segments[self.read_seq]
+                frame = segment.read_at(self.read_offset)
+                if frame is not None:
+                    payload, count, _ = frame
+                    return (self.read_seq, self.read_offset), payload.decode(), count
+                if self.read_seq == max(self.segments):
+                    self.has_data.clear()
+                    return None
+                # Fully replayed and no longer written to
+                self.segments.pop(self.read_seq).remove()
+                self.read_seq, self.read_offset = min(self.segments), 0
+                self._save_cursor()
+
+    def commit(self, position):
+        """Advance past the batch returned by peek() once it has been written."""
+        with self.lock:
+            if position != (self.read_seq, self.read_offset):
+                return  # segment was discarded for disk budget meanwhile
+            frame = self.segments[self.read_seq].read_at(self.read_offset)
+            if frame is None:
+                return
+            self.read_offset = frame[2]
+            self.stats["replayed"] += frame[1]
+            self.stats["pending"] -= frame[1]
+            self._save_cursor()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["segments"] = len(self.segments)
+            stats["disk_bytes"] = self._disk_usage()
+        return stats
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments.values():
+                segment.close()
@@ -1,36 +1,248 @@
-from influxdb_client import InfluxDBClient, Point
+import atexit
+import threading
+import time
+from collections import deque
+
+from influxdb_client import InfluxDBClient
 from influxdb_client.client.write_api import SYNCHRONOUS
-from config import INFLUX_URL, INFLUX_TOKEN, INFLUX_ORG, INFLUX_BUCKET
+from config import (
+    INFLUX_URL,
+    INFLUX_TOKEN,
+    INFLUX_ORG,
+    INFLUX_BUCKET,
+    INFLUX_BATCH_SIZE,
+    INFLUX_FLUSH_INTERVAL,
+    INFLUX_MAX_QUEUE,
+    INFLUX_MAX_RETRIES,
+    INFLUX_RETRY_BACKOFF,
+    INFLUX_RETRY_BACKOFF_MAX,
+    INFLUX_SPOOL_DIR,
+    INFLUX_SPOOL_SEGMENT_SIZE,
+    INFLUX_SPOOL_MAX_BYTES,
+    INFLUX_SPOOL_REPLAY_RATE,
+)
+from influx_spool import WriteSpool
+from line_protocol import encode_sensor_payload
 
+# gzip-compressed request bodies; the client's urllib3 pool keeps the HTTP
+# connection alive between batches, so each flush is one request on a warm socket.
 client = InfluxDBClient(
     url=INFLUX_URL,
     token=INFLUX_TOKEN,
-    org=INFLUX_ORG
+    org=INFLUX_ORG,
+    enable_gzip=True,
 )
 
+# Only the flusher thread calls this, so a blocking write is fine here.
 write_api = client.write_api(write_options=SYNCHRONOUS)
 
+
+class InfluxBatchWriter:
+    """Bounded in-memory write buffer drained by its own flusher thread.
+
+    A batch is written when `batch_size` points are buffered or when the oldest
+    buffered point is `flush_interval` seconds old, whichever comes first.
+
+    With a spool attached, batches that still fail after the retries and points
+    that overflow `max_queue` go to disk instead of being dropped. While the
+    spool holds a backlog, new batches are appended behind it so points reach
+    InfluxDB in order; a replay thread drains it at `replay_rate` points/s.
+    """
+
+    def __init__(self, write_api, bucket, org, batch_size, flush_interval, max_queue,
+                 max_retries, retry_backoff, retry_backoff_max, spool=None, replay_rate=5000):
+        self.write_api = write_api
+        self.bucket = bucket
+        self.org = org
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+        self.spool = spool
+        self.replay_rate = replay_rate
+
+        self.buffer = deque()  # (enqueued_at, record)
+        self.cond = threading.Condition()
+        self.running = True
+        self.in_flight = 0
+
+        self.stats = {
+            "written": 0,
+            "batches": 0,
+            "retries": 0,
+            "dropped_overflow": 0,
+            "dropped_failed": 0,
+        }
+
+        self.thread = threading.Thread(target=self._daemon, daemon=True)
+        self.thread.start()
+
+        if self.spool is not None:
+            self.replay_thread = threading.Thread(target=self._replay_daemon, daemon=True)
+            self.replay_thread.start()
+
+    def enqueue(self, record):
+        with self.cond:
+            if len(self.buffer) >= self.max_queue:
+                if self.spool is not None:
+                    self._spill_oldest()
+                else:
+                    self.buffer.popleft()
+                    self.stats["dropped_overflow"] += 1
+            self.buffer.append((time.monotonic(), record))
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify()
+
+    def _spill_oldest(self):
+        spilled = []
+        while self.buffer and len(spilled) < self.batch_size:
+            spilled.append(self.buffer.popleft()[1])
+        self.spool.append(spilled)
+
+    def queue_depth(self):
+        return len(self.buffer)
+
+    def get_stats(self):
+        with self.cond:
+            stats = dict(self.stats)
+            stats["queue_depth"] = len(self.buffer)
+            stats["in_flight"] = self.in_flight
+        if self.spool is not None:
+            stats["spool"] = self.spool.get_stats()
+        return stats
+
+    def _take_batch(self):
+        batch = []
+        while self.buffer and len(batch) < self.batch_size:
+            batch.append(self.buffer.popleft()[1])
+        self.in_flight = len(batch)
+        return batch
+
+    def _daemon(self):
+        while True:
+            with self.cond:
+                while self.running:
+                    if len(self.buffer) >= self.batch_size:
+                        break
+                    if not self.buffer:
+                        self.cond.wait()
+                        continue
+                    remaining = self.buffer[0][0] + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+
+                if not self.running and not self.buffer:
+                    return
+                batch = self._take_batch()
+
+            if not batch:
+                continue
+            if self.spool is not None and self.spool.pending():
+                self.spool.append(batch)
+                with self.cond:
+                    self.in_flight = 0
+            else:
+                self._write_with_retry(batch)
+
+    def _write_with_retry(self, batch):
+        delay = self.retry_backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=batch)
+                with self.cond:
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.in_flight = 0
+                return True
+            except Exception as e:
+                if attempt == self.max_retries or not self.running:
+                    if self.spool is not None:
+                        print(f"[INFLUX] Spooling batch of {len(batch)} points to disk: {e}")
+                        self.spool.append(batch)
+                        with self.cond:
+                            self.in_flight = 0
+                        return False
+                    print(f"[INFLUX] Dropping batch of {len(batch)} points: {e}")
+                    break
+                print(f"[INFLUX] Write failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                with self.cond:
+                    self.stats["retries"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_backoff_max)
+
+        with self.cond:
+            self.stats["dropped_failed"] += len(batch)
+            self.in_flight = 0
+        return False
+
+    def _replay_daemon(self):
+        delay = self.retry_backoff
+        while self.running:
+            entry = self.spool.peek()
+            if entry is None:
+                self.spool.has_data.wait(1.0)
+                continue
+
+            position, lines, count = entry
+            try:
+                self.write_api.write(bucket=self.bucket, org=self.org, record=lines)
+            except Exception as e:
+                print(f"[SPOOL] Replay failed ({e}), retry in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_backoff_max)
+                continue
+
+            delay = self.retry_backoff
+            self.spool.commit(position)
+            # Rate limit so a large backlog does not swamp a freshly restarted InfluxDB.
+            time.sleep(count / self.replay_rate)
+
+    def close(self, timeout=5.0):
+        """Stop the flusher thread after draining whatever is still buffered."""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join(timeout=timeout)
+        if self.spool is not None:
+            self.spool.has_data.set()
+            self.replay_thread.join(timeout=timeout)
+            self.spool.close()
+
+
+batch_writer = InfluxBatchWriter(
+    write_api,
+    INFLUX_BUCKET,
+    INFLUX_ORG,
+    batch_size=INFLUX_BATCH_SIZE,
+    flush_interval=INFLUX_FLUSH_INTERVAL,
+    max_queue=INFLUX_MAX_QUEUE,
+    max_retries=INFLUX_MAX_RETRIES,
+    retry_backoff=INFLUX_RETRY_BACKOFF,
+    retry_backoff_max=INFLUX_RETRY_BACKOFF_MAX,
+    spool=WriteSpool(INFLUX_SPOOL_DIR, INFLUX_SPOOL_SEGMENT_SIZE, INFLUX_SPOOL_MAX_BYTES),
+    replay_rate=INFLUX_SPOOL_REPLAY_RATE,
+)
+atexit.register(batch_writer.close)
+
+
+def get_write_stats():
+    return batch_writer.get_stats()
+
+
 def write_sensor_data(payload: dict):
-    measurement = payload["sensor_type"]
-
-    point = (
-        Point(measurement)
-        .tag("pi_id", payload["pi_id"])
-        .tag("device_name", payload["device_name"])
-        .tag("simulated", str(payload["simulated"]))
-    )
-
-    value = payload["value"]
-
-    if isinstance(value, (int, float)):
-        point = point.field("value_num", float(value))
-    elif isinstance(value, bool):
-        point = point.field("value_bool", value)
-    else:
-        point = point.field("value_str", str(value))
-
-    write_api.write(
-        bucket=INFLUX_BUCKET,
-        org=INFLUX_ORG,
-        record=point
-    )
+    """Encode an MQTT payload as line protocol and hand it to the flusher (non-blocking).
+
+    Points are timestamped on arrival, so batching and spool replay keep the
+    time the reading was received rather than the time it reached InfluxDB.
+    Readings replayed from a Pi's offline store carry their own `ts` (epoch
+    seconds), which is used instead. A `quality` other than good is written
+    as a tag (see encode_sensor_payload).
+    """
+    ts = payload.get("ts")
+    timestamp_ns = int(ts * 1e9) if isinstance(ts, (int, float)) else time.time_ns()
+    line = encode_sensor_payload(payload, timestamp_ns)
+    if line is not None:
+        batch_writer.enqueue(line)
@@ -0,0 +1,113 @@
+import math
+
+# Escape tables mirror influxdb_client.client.write.point so that the output
+# is byte-identical to Point(...).to_line_protocol().
+_ESCAPE_MEASUREMENT = str.maketrans({
+    ",": r"\,",
+    " ": r"\ ",
+    "\n": r"\n",
+    "\t": r"\t",
+    "\r": r"\r",
+})
+
+_ESCAPE_KEY = str.maketrans({
+    "\\": "\\\\",
+    ",": r"\,",
+    " ": r"\ ",
+    "=": r"\=",
+    "\n": r"\n",
+    "\t": r"\t",
+    "\r": r"\r",
+})
+
+_ESCAPE_STRING = str.maketrans({
+    '"': r"\"",
+    "\\": "\\\\",
+})
+
+PREFIX_CACHE_MAX = 4096
+
+_prefix_cache = {}
+
+
+def _escape_measurement(name):
+    escaped = str(name).translate(_ESCAPE_MEASUREMENT)
+    if escaped.startswith("#"):
+        escaped = "\\" + escaped
+    return escaped
+
+
+def _escape_tag_value(value):
+    escaped = str(value).translate(_ESCAPE_KEY)
+    if escaped.endswith("\\"):
+        escaped += " "
+    return escaped
+
+
+def _build_prefix(measurement, pi_id, device_name, simulated, quality=None):
+    # Tags are emitted sorted by key and empty values are skipped, like Point does.
+    tags = []
+    for key, value in (("device_name", device_name), ("pi_id", pi_id), ("quality", quality),
+                       ("simulated", simulated)):
+        if value is None:
+            continue
+        escaped = _escape_tag_value(value)
+        if escaped:
+            tags.append(f"{key}={escaped}")
+    tag_set = ("," + ",".join(tags)) if tags else ""
+    return f"{_escape_measurement(measurement)}{tag_set} "
+
+
+def get_prefix(measurement, pi_id, device_name, simulated, quality=None):
+    """Return the escaped `measurement,tag=...` prefix (with trailing space), cached."""
+    key = (measurement, pi_id, device_name, simulated, quality)
+    prefix = _prefix_cache.get(key)
+    if prefix is None:
+        if len(_prefix_cache) >= PREFIX_CACHE_MAX:
+            _prefix_cache.clear()
+        prefix = _build_prefix(measurement, pi_id, device_name, simulated, quality)
+        _prefix_cache[key] = prefix
+    return prefix
+
+
+def format_field(value):
+    """Format the value the same way write_sensor_data always has.
+
+    Note that bool is a subclass of int, so True/False land in value_num.
+    Returns None for non-finite floats, which Point silently drops.
+    """
+    if isinstance(value, (int, float)):
+        num = float(value)
+        if not math.isfinite(num):
+            return None
+        s = str(num)
+        if s.endswith(".0"):
+            s = s[:-2]
+        return f"value_num={s}"
+    elif isinstance(value, bool):
+        return f"value_bool={str(value).lower()}"
+    else:
+        return f'value_str="{str(value).translate(_ESCAPE_STRING)}"'
+
+
+def encode_sensor_payload(payload: dict, timestamp_ns=None):
+    """Encode an MQTT sensor payload as one line of InfluxDB line protocol.
+
+    `timestamp_ns` is appended in nanosecond precision when given. Returns None
+    when the point would carry no field (same as an empty Point). A reading
+    the Pi only held over from a failed read carries `quality`, which becomes
+    a tag so it can be told apart from a measured one; good readings have none.
+    """
+    field = format_field(payload["value"])
+    if field is None:
+        return None
+    prefix = get_prefix(
+        payload["sensor_type"],
+        payload["pi_id"],
+        payload["device_name"],
+        str(payload["simulated"]),
+        payload.get("quality"),
+    )
+    if timestamp_ns is None:
+        return prefix + field
+    return f"{prefix}{field} {timestamp_ns}"
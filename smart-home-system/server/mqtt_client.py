@@ -1,30 +1,191 @@
-import json
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import NamedTuple
+
 import paho.mqtt.client as mqtt
 from influx_writer import write_sensor_data
 from config import MQTT_BROKER, MQTT_PORT, MQTT_TOPIC
 
-def on_connect(client, userdata, flags, rc):
-    print(f"[MQTT SENSOR] Connected (code {rc})")
-    client.subscribe(MQTT_TOPIC)
+# payload_codec.py is shared with the Pi controllers one directory up
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+import payload_codec  # noqa: E402
 
-def on_message(client, userdata, msg):
-    try:
-        if "/cmd/" in msg.topic:
-            return
 
-        payload = json.loads(msg.payload.decode())
+class IngestRecord(NamedTuple):
+    """One MQTT message, decoded once and shared by every consumer."""
+    topic: str
+    pi_id: str | None
+    category: str | None   # "sensor" | "cmd" | ...
+    device: str | None
+    sensor_type: str | None
+    payload: dict
+    received_at: float
+
+
+class IngestDispatcher:
+    """Decodes each message once and fans the record out to registered consumers.
+
+    Consumers run in registration order on the paho network thread; one failing
+    consumer does not stop the others. Time spent per consumer is accumulated
+    so the cost of each stage is visible via get_timings().
+
+    Payloads may be JSON or the binary format from payload_codec; the two are
+    told apart by the first byte, so Pis can be switched one at a time.
+
+    Frames published on smart_home/<pi>/batch carry an array of readings;
+    they are split back into one "sensor" record per reading, exactly as if
+    each had arrived on smart_home/<pi>/sensor/<sensor_type>.
+    """
+
+    BATCH_CATEGORY = "batch"
+
+    def __init__(self):
+        self.consumers = []  # (name, fn, categories)
+        self.lock = threading.Lock()
+        self.timings = {}
+        self._init_timing("decode")
+
+    def _init_timing(self, name):
+        self.timings[name] = {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+
+    def register(self, name, fn, categories=None):
+        """Register `fn(record)`; `categories` limits it to e.g. ("sensor",)."""
+        with self.lock:
+            self.consumers.append((name, fn, frozenset(categories) if categories else None))
+            self._init_timing(name)
+
+    def _record_timing(self, name, elapsed, failed=False):
+        t = self.timings[name]
+        elapsed_ms = elapsed * 1000.0
+        t["calls"] += 1
+        t["total_ms"] += elapsed_ms
+        if elapsed_ms > t["max_ms"]:
+            t["max_ms"] = elapsed_ms
+        if failed:
+            t["errors"] += 1
+
+    def decode(self, topic, raw_payload):
+        """Return the list of records carried by one MQTT message."""
+        payload = payload_codec.loads(raw_payload)
+        parts = topic.split("/")
+        received_at = time.time()
+
+        if len(parts) == 3 and parts[2] == self.BATCH_CATEGORY:
+            if not isinstance(payload, list):
+                raise ValueError("batch frame is not an array")
+            records = []
+            for reading in payload:
+                if not isinstance(reading, dict) or "sensor_type" not in reading:
+                    continue
+                sensor_type = reading["sensor_type"]
+                records.append(IngestRecord(
+                    topic=f"{parts[0]}/{parts[1]}/sensor/{sensor_type}",
+                    pi_id=parts[1],
+                    category="sensor",
+                    device=sensor_type,
+                    sensor_type=sensor_type,
+                    payload=reading,
+                    received_at=received_at,
+                ))
+            return records
+
+        if not isinstance(payload, dict):
+            raise ValueError("payload is not a JSON object")
+        return [IngestRecord(
+            topic=topic,
+            pi_id=parts[1] if len(parts) > 1 else None,
+            category=parts[2] if len(parts) > 2 else None,
+            device=parts[3] if len(parts) > 3 else None,
+            sensor_type=payload.get("sensor_type"),
+            payload=payload,
+            received_at=received_at,
+        )]
+
+    def dispatch(self, record):
+        for name, fn, categories in self.consumers:
+            if categories is not None and record.category not in categories:
+                continue
+            start = time.perf_counter()
+            failed = False
+            try:
+                fn(record)
+            except Exception as e:
+                failed = True
+                print(f"[INGEST] {name} failed on {record.topic}: {e}")
+                traceback.print_exc()
+            self._record_timing(name, time.perf_counter() - start, failed)
 
-        if "sensor_type" not in payload:
+    def on_message(self, client, userdata, msg):
+        start = time.perf_counter()
+        try:
+            records = self.decode(msg.topic, msg.payload)
+        except Exception as e:
+            self._record_timing("decode", time.perf_counter() - start, failed=True)
+            print(f"[INGEST] Could not decode {msg.topic}: {e}")
             return
+        self._record_timing("decode", time.perf_counter() - start)
+        for record in records:
+            self.dispatch(record)
 
-        write_sensor_data(payload)
+    def get_timings(self):
+        result = {}
+        for name, t in self.timings.items():
+            result[name] = dict(t)
+            result[name]["avg_ms"] = t["total_ms"] / t["calls"] if t["calls"] else 0.0
+        return result
+
+
+dispatcher = IngestDispatcher()
+
+
+def persist_record(record):
+    if record.category == "cmd" or record.sensor_type is None:
+        return
+    write_sensor_data(record.payload)
+
+
+dispatcher.register("persistence", persist_record)
+
+
+# Last diagnostics frame from each Pi's MQTTBatchSender (smart_home/<pi>/diagnostics)
+sender_diagnostics = {}
+
+
+def persist_diagnostics(record):
+    stats = record.payload
+    sender_diagnostics[record.pi_id] = {"received_at": record.received_at, **stats}
+
+    def write(sensor_type, value):
+        write_sensor_data({
+            "pi_id": record.pi_id,
+            "device_name": "MQTTBatchSender",
+            "sensor_type": sensor_type,
+            "simulated": False,
+            "value": value,
+        })
+
+    # Counters are cumulative since the Pi started; graph them with derivative()
+    write("mqtt_queued", stats.get("queued", 0))
+    write("mqtt_dropped_total", stats.get("dropped_total", 0))
+    for sensor_type, count in stats.get("dropped", {}).items():
+        write(f"mqtt_dropped_{sensor_type}", count)
+
+
+dispatcher.register("diagnostics", persist_diagnostics, categories=("diagnostics",))
+
+
+def on_connect(client, userdata, flags, rc):
+    print(f"[MQTT INGEST] Connected (code {rc})")
+    client.subscribe(MQTT_TOPIC)
 
-    except Exception as e:
-        print(f"[MQTT SENSOR] Error: {e}")
 
 def start_mqtt():
-    client = mqtt.Client(client_id="flask_sensor_listener")
+    client = mqtt.Client(client_id="flask_ingest")
     client.on_connect = on_connect
-    client.on_message = on_message
+    client.on_message = dispatcher.on_message
     client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    client.loop_start()
\ No newline at end of file
+    client.loop_start()
+    return client
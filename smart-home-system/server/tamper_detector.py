@@ -0,0 +1,174 @@
+import math
+from collections import deque
+
+AXES = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+
+class TamperDetector:
+    """Streaming tamper detector for one Pi's gyroscope, O(1) time and memory per sample.
+
+    The baseline is the mean/variance of the acceleration magnitude and the
+    mean acceleration vector (the sensor's rest orientation): exact (Welford)
+    for the first `warmup` samples, an EWMA after that. Only normal samples
+    update it, so a tamper attempt is never learned as the new normal.
+
+    A sample is anomalous when any feature is out of range:
+
+      z-score  |magnitude - mean| / sigma, sigma floored at `min_sigma` g
+      jerk     change of the acceleration vector since the previous sample, or
+               for a window summary its peak-to-min magnitude spread (g)
+      tilt     angle between the sample and the rest orientation (deg); this
+               is what catches slow tampering the magnitude never shows
+      rotation gyro rate magnitude (deg/s)
+
+    `tampering` turns on once `persistence` of the last `window` samples
+    are anomalous, so one knock or bad read is not an alarm, and off again
+    when none are. Window summaries are fed with weight = samples in the
+    window, so the EWMA time constants stay the same with or without
+    GSG_WINDOW on the Pi. A sensor that stays "tampered" for `relearn_s` s
+    (moved on purpose) starts a new warmup at its new position.
+    """
+
+    def __init__(self, warmup=20, alpha=0.02, direction_alpha=0.0005, z_threshold=4.0, min_sigma=0.05,
+                 jerk_threshold=0.3, tilt_threshold=10.0, rotation_threshold=30.0, persistence=3, window=5,
+                 gap_s=10.0, relearn_s=60.0):
+        self.warmup = warmup
+        self.alpha = alpha
+        self.direction_alpha = direction_alpha
+        self.z_threshold = z_threshold
+        self.min_sigma = min_sigma
+        self.jerk_threshold = jerk_threshold
+        self.tilt_threshold = tilt_threshold
+        self.rotation_threshold = rotation_threshold
+        self.persistence = persistence
+        self.gap_s = gap_s
+        self.relearn_s = relearn_s
+
+        self.recent = deque(maxlen=window)
+        self.recent_anomalies = 0
+        self.tampering = False
+        self.tampering_since = None
+        self.previous = None
+        self.last_t = None
+        self._reset_baseline()
+
+        self.samples = 0
+        self.anomalies = 0
+        self.episodes = 0
+        self.relearns = 0
+        self.last_features = None
+
+    def _reset_baseline(self):
+        self.weight = 0.0   # samples in the baseline so far (Welford phase)
+        self.mean = 0.0
+        self.m2 = 0.0       # Welford sum of squared deviations, warmup only
+        self.var = 0.0
+        self.direction = [0.0, 0.0, 0.0]
+
+    @property
+    def warm(self):
+        return self.weight >= self.warmup
+
+    def _learn(self, accel, magnitude, weight):
+        if not self.warm:
+            # Weighted Welford (West): exact mean/variance over the warmup samples
+            self.weight += weight
+            delta = magnitude - self.mean
+            self.mean += delta * weight / self.weight
+            self.m2 += weight * delta * (magnitude - self.mean)
+            self.var = self.m2 / self.weight
+            share = weight / self.weight
+            self.direction = [d + (a - d) * share for d, a in zip(self.direction, accel)]
+            return
+
+        # A window of n samples counts as n EWMA steps
+        alpha = 1.0 - (1.0 - self.alpha) ** weight
+        delta = magnitude - self.mean
+        self.mean += alpha * delta
+        self.var = (1.0 - alpha) * (self.var + alpha * delta * delta)
+        direction_alpha = 1.0 - (1.0 - self.direction_alpha) ** weight
+        self.direction = [d + (a - d) * direction_alpha for d, a in zip(self.direction, accel)]
+
+    def _features(self, accel, gyro, magnitude, spread):
+        sigma = max(math.sqrt(self.var), self.min_sigma)
+        z = abs(magnitude - self.mean) / sigma
+
+        jerk = spread or 0.0
+        if self.previous is not None:
+            jerk = max(jerk, math.sqrt(sum((a - p) * (a - p) for a, p in zip(accel, self.previous))))
+
+        tilt = 0.0
+        norm = math.sqrt(sum(d * d for d in self.direction))
+        if magnitude > 0 and norm > 0:
+            cos = sum(a * d for a, d in zip(accel, self.direction)) / (magnitude * norm)
+            tilt = math.degrees(math.acos(max(-1.0, min(1.0, cos))))
+
+        rotation = math.sqrt(sum(g * g for g in gyro))
+        return {"z": z, "jerk": jerk, "tilt": tilt, "rotation": rotation}
+
+    def update(self, sample, t, weight=1, spread=None):
+        """Feed one sample (dict with AXES keys) received at `t` s; returns whether the Pi is being tampered with.
+
+        A window summary is fed as its mean sample, with `weight` = samples
+        in the window and `spread` = its peak - min magnitude.
+        """
+        accel = [float(sample.get(axis, 0.0)) for axis in AXES[:3]]
+        gyro = [float(sample.get(axis, 0.0)) for axis in AXES[3:]]
+        magnitude = math.sqrt(sum(a * a for a in accel))
+
+        if self.last_t is not None and t - self.last_t > self.gap_s:
+            # After a gap the previous sample says nothing about this one
+            self.previous = None
+            self.recent.clear()
+            self.recent_anomalies = 0
+        self.last_t = t
+        self.samples += 1
+
+        anomalous = False
+        if self.warm:
+            features = self._features(accel, gyro, magnitude, spread)
+            self.last_features = features
+            anomalous = (features["z"] > self.z_threshold
+                         or features["jerk"] > self.jerk_threshold
+                         or features["tilt"] > self.tilt_threshold
+                         or features["rotation"] > self.rotation_threshold)
+        if anomalous:
+            self.anomalies += 1
+        else:
+            self._learn(accel, magnitude, weight)
+        self.previous = accel
+
+        if len(self.recent) == self.recent.maxlen and self.recent[0]:
+            self.recent_anomalies -= 1
+        self.recent.append(anomalous)
+        self.recent_anomalies += anomalous
+
+        if not self.tampering and self.recent_anomalies >= self.persistence:
+            self.tampering = True
+            self.tampering_since = t
+            self.episodes += 1
+        elif self.tampering and self.recent_anomalies == 0:
+            self.tampering = False
+            self.tampering_since = None
+        elif self.tampering and t - self.tampering_since >= self.relearn_s:
+            self.relearns += 1
+            self.tampering = False
+            self.tampering_since = None
+            self.recent.clear()
+            self.recent_anomalies = 0
+            self._reset_baseline()
+
+        return self.tampering
+
+    def get_stats(self):
+        return {
+            "samples": self.samples,
+            "anomalies": self.anomalies,
+            "episodes": self.episodes,
+            "relearns": self.relearns,
+            "tampering": self.tampering,
+            "warm": self.warm,
+            "magnitude_mean": round(self.mean, 4),
+            "magnitude_sigma": round(math.sqrt(self.var), 4),
+            "last_features": {k: round(v, 3) for k, v in self.last_features.items()} if self.last_features else None,
+        }